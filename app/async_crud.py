@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import (
+    COLUMNS,
+    ORDER,
+    export_query,
+    previous_crypto_name,
+    update_values,
+)
+from app.models.model import Transaction
+import app.services.rollups as rollups
+from app.services.pagination import Cursor
+from app.services.transaction_cache import transaction_cache
+
+
+# Rollups are maintained in the same database transaction as the write
+async def record_rollups(db: AsyncSession, rows):
+    candles = rollups.aggregate(rows)
+    if candles:
+        await db.execute(rollups.lock(c["crypto_name"] for c in candles))
+        await db.execute(rollups.upsert(), candles)
+
+
+async def rebuild_rollups(db: AsyncSession, crypto_names, timestamps):
+    for stmt in rollups.rebuild(crypto_names, timestamps):
+        await db.execute(stmt)
+
+
+# Create (INSERT ... RETURNING, one round trip)
+async def create_transaction(
+    db: AsyncSession, crypto_name: str, amount: float, price_usd: float
+):
+    result = await db.execute(
+        insert(Transaction)
+        .values(crypto_name=crypto_name, amount=amount, price_usd=price_usd)
+        .returning(*COLUMNS)
+    )
+    db_transaction = result.first()
+    await record_rollups(db, [db_transaction])
+    await db.commit()
+    return db_transaction
+
+
+# Create Many (one multi-row INSERT)
+async def create_transactions(db: AsyncSession, transactions: List[dict]):
+    if not transactions:
+        return 0
+    result = await db.execute(insert(Transaction).returning(*COLUMNS), transactions)
+    rows = result.all()
+    await record_rollups(db, rows)
+    await db.commit()
+    return len(rows)
+
+
+# Create Many, returning the new ids in input order (multi-row INSERT ... RETURNING)
+async def create_transactions_returning(
+    db: AsyncSession, transactions: List[dict]
+) -> List[int]:
+    if not transactions:
+        return []
+    result = await db.execute(
+        insert(Transaction).returning(*COLUMNS, sort_by_parameter_order=True),
+        transactions,
+    )
+    rows = result.all()
+    await record_rollups(db, rows)
+    await db.commit()
+    return [row.id for row in rows]
+
+
+# Read All
+async def get_transactions(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(*COLUMNS).order_by(*ORDER).offset(skip).limit(limit)
+    )
+    return result.all()
+
+
+# Read Page (keyset: rows strictly after the cursor)
+async def get_transactions_after(
+    db: AsyncSession, cursor: Optional[Cursor] = None, limit: int = 100
+):
+    query = select(*COLUMNS).order_by(*ORDER)
+    if cursor is not None:
+        query = query.filter(tuple_(*ORDER) > tuple_(*cursor))
+    result = await db.execute(query.limit(limit))
+    return result.all()
+
+
+# Export (server-side cursor, yields lists of row tuples)
+async def iter_transaction_rows(
+    db: AsyncSession,
+    crypto_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 1000,
+):
+    query = export_query(crypto_name, start, end)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+# Read One by ID (with updated_at for Last-Modified)
+async def get_transaction_by_id(db: AsyncSession, transaction_id: int):
+    result = await db.execute(
+        select(*COLUMNS, Transaction.updated_at).filter(
+            Transaction.id == transaction_id
+        )
+    )
+    return result.first()
+
+
+# Update (UPDATE ... RETURNING of the provided fields only)
+async def update_transaction(
+    db: AsyncSession,
+    transaction_id: int,
+    crypto_name: str = None,
+    amount: float = None,
+    price_usd: float = None,
+):
+    values = update_values(crypto_name, amount, price_usd)
+    if not values:
+        return await get_transaction_by_id(db, transaction_id)
+
+    result = await db.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction_id)
+        .values(**values, updated_at=func.now())
+        .returning(*COLUMNS, previous_crypto_name(transaction_id))
+    )
+    db_transaction = result.first()
+    if db_transaction is not None:
+        await rebuild_rollups(
+            db,
+            {db_transaction.crypto_name, db_transaction.previous_crypto_name},
+            [db_transaction.timestamp],
+        )
+    await db.commit()
+    transaction_cache.invalidate(transaction_id)
+    return db_transaction
+
+
+# Delete (DELETE ... RETURNING)
+async def delete_transaction(db: AsyncSession, transaction_id: int):
+    result = await db.execute(
+        delete(Transaction).where(Transaction.id == transaction_id).returning(*COLUMNS)
+    )
+    db_transaction = result.first()
+    if db_transaction is not None:
+        await rebuild_rollups(
+            db, [db_transaction.crypto_name], [db_transaction.timestamp]
+        )
+    await db.commit()
+    transaction_cache.invalidate(transaction_id)
+    return db_transaction
+
+
+# Read Rollups (candles for one coin and resolution, oldest first)
+async def get_rollups(
+    db: AsyncSession,
+    crypto_name: str,
+    resolution: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 500,
+):
+    result = await db.scalars(
+        rollups.rollups_query(crypto_name, resolution, start, end, limit)
+    )
+    return result.all()
@@ -1,29 +1,144 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from app.models.model import Transaction
+from app.models.model import LatestPrice, Transaction
+import app.services.rollups as rollups
+from app.services.pagination import Cursor
+from app.services.transaction_cache import transaction_cache
 
+# Stable listing order (backed by ix_transactions_timestamp_id)
+ORDER = (Transaction.timestamp, Transaction.id)
 
-# Create
-def create_transaction(db: Session, crypto_name: str, amount: float, price_usd: float):
-    db_transaction = Transaction(
-        crypto_name=crypto_name, amount=amount, price_usd=price_usd
+# Columns returned by reads, writes and exports (plain rows, no ORM state)
+COLUMNS = (
+    Transaction.id,
+    Transaction.crypto_name,
+    Transaction.amount,
+    Transaction.price_usd,
+    Transaction.timestamp,
+)
+
+
+# The pre-update name, read from the statement snapshot in the same UPDATE
+def previous_crypto_name(transaction_id: int):
+    return (
+        select(Transaction.crypto_name)
+        .where(Transaction.id == transaction_id)
+        .scalar_subquery()
+        .label("previous_crypto_name")
     )
-    db.add(db_transaction)
+
+
+# Fields of an update that were actually provided
+def update_values(crypto_name=None, amount=None, price_usd=None) -> dict:
+    values = {"crypto_name": crypto_name, "amount": amount, "price_usd": price_usd}
+    return {key: value for key, value in values.items() if value is not None}
+
+
+# Rollups are maintained in the same database transaction as the write
+def record_rollups(db: Session, rows):
+    candles = rollups.aggregate(rows)
+    if candles:
+        db.execute(rollups.lock(c["crypto_name"] for c in candles))
+        db.execute(rollups.upsert(), candles)
+
+
+def rebuild_rollups(db: Session, crypto_names, timestamps):
+    for stmt in rollups.rebuild(crypto_names, timestamps):
+        db.execute(stmt)
+
+
+# Create (INSERT ... RETURNING, one round trip)
+def create_transaction(db: Session, crypto_name: str, amount: float, price_usd: float):
+    db_transaction = db.execute(
+        insert(Transaction)
+        .values(crypto_name=crypto_name, amount=amount, price_usd=price_usd)
+        .returning(*COLUMNS)
+    ).first()
+    record_rollups(db, [db_transaction])
     db.commit()
-    db.refresh(db_transaction)
     return db_transaction
 
 
+# Create Many (one multi-row INSERT)
+def create_transactions(db: Session, transactions: List[dict]):
+    if not transactions:
+        return 0
+    rows = db.execute(insert(Transaction).returning(*COLUMNS), transactions).all()
+    record_rollups(db, rows)
+    db.commit()
+    return len(rows)
+
+
+# Create Many, returning the new ids in input order (multi-row INSERT ... RETURNING)
+def create_transactions_returning(db: Session, transactions: List[dict]) -> List[int]:
+    if not transactions:
+        return []
+    rows = db.execute(
+        insert(Transaction).returning(*COLUMNS, sort_by_parameter_order=True),
+        transactions,
+    ).all()
+    record_rollups(db, rows)
+    db.commit()
+    return [row.id for row in rows]
+
+
 # Read All
 def get_transactions(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Transaction).offset(skip).limit(limit).all()
+    return db.execute(select(*COLUMNS).order_by(*ORDER).offset(skip).limit(limit)).all()
 
 
-# Read One by ID
+# Read Page (keyset: rows strictly after the cursor)
+def get_transactions_after(
+    db: Session, cursor: Optional[Cursor] = None, limit: int = 100
+):
+    query = select(*COLUMNS).order_by(*ORDER)
+    if cursor is not None:
+        query = query.filter(tuple_(*ORDER) > tuple_(*cursor))
+    return db.execute(query.limit(limit)).all()
+
+
+# Export query: plain column tuples in the stable order, optionally filtered
+def export_query(
+    crypto_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    query = select(*COLUMNS).order_by(*ORDER)
+    if crypto_name is not None:
+        query = query.filter(Transaction.crypto_name == crypto_name)
+    if start is not None:
+        query = query.filter(Transaction.timestamp >= start)
+    if end is not None:
+        query = query.filter(Transaction.timestamp < end)
+    return query
+
+
+# Export (server-side cursor, yields lists of row tuples)
+def iter_transaction_rows(
+    db: Session,
+    crypto_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 1000,
+):
+    query = export_query(crypto_name, start, end)
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    yield from result.partitions()
+
+
+# Read One by ID (with updated_at for Last-Modified)
 def get_transaction_by_id(db: Session, transaction_id: int):
-    return db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    return db.execute(
+        select(*COLUMNS, Transaction.updated_at).filter(
+            Transaction.id == transaction_id
+        )
+    ).first()
 
 
-# Update
+# Update (UPDATE ... RETURNING of the provided fields only)
 def update_transaction(
     db: Session,
     transaction_id: int,
@@ -31,33 +146,87 @@ def update_transaction(
     amount: float = None,
     price_usd: float = None,
 ):
-    db_transaction = (
-        db.query(Transaction).filter(Transaction.id == transaction_id).first()
-    )
-    if not db_transaction:
-        return None
-
-    # Update fields if values are provided
-    if crypto_name is not None:
-        db_transaction.crypto_name = crypto_name
-    if amount is not None:
-        db_transaction.amount = amount
-    if price_usd is not None:
-        db_transaction.price_usd = price_usd
+    values = update_values(crypto_name, amount, price_usd)
+    if not values:
+        return get_transaction_by_id(db, transaction_id)
 
+    db_transaction = db.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction_id)
+        .values(**values, updated_at=func.now())
+        .returning(*COLUMNS, previous_crypto_name(transaction_id))
+    ).first()
+    if db_transaction is not None:
+        rebuild_rollups(
+            db,
+            {db_transaction.crypto_name, db_transaction.previous_crypto_name},
+            [db_transaction.timestamp],
+        )
     db.commit()
-    db.refresh(db_transaction)
+    transaction_cache.invalidate(transaction_id)
     return db_transaction
 
 
-# Delete
+# Delete (DELETE ... RETURNING)
 def delete_transaction(db: Session, transaction_id: int):
-    db_transaction = (
-        db.query(Transaction).filter(Transaction.id == transaction_id).first()
-    )
-    if not db_transaction:
-        return None
-
-    db.delete(db_transaction)
+    db_transaction = db.execute(
+        delete(Transaction).where(Transaction.id == transaction_id).returning(*COLUMNS)
+    ).first()
+    if db_transaction is not None:
+        rebuild_rollups(db, [db_transaction.crypto_name], [db_transaction.timestamp])
     db.commit()
+    transaction_cache.invalidate(transaction_id)
     return db_transaction
+
+
+# Read Rollups (candles for one coin and resolution, oldest first)
+def get_rollups(
+    db: Session,
+    crypto_name: str,
+    resolution: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 500,
+):
+    return db.scalars(
+        rollups.rollups_query(crypto_name, resolution, start, end, limit)
+    ).all()
+
+
+# Upsert Latest Prices (newest observation per coin/currency wins)
+def upsert_latest_prices(db: Session, observations: List[dict]):
+    latest = {}
+    for row in observations:
+        key = (row["crypto_name"], row["vs_currency"])
+        if key not in latest or row["observed_at"] >= latest[key]["observed_at"]:
+            latest[key] = row
+    if not latest:
+        return 0
+
+    stmt = pg_insert(LatestPrice)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[LatestPrice.crypto_name, LatestPrice.vs_currency],
+            set_={
+                "price": stmt.excluded.price,
+                "observed_at": stmt.excluded.observed_at,
+            },
+            where=stmt.excluded.observed_at >= LatestPrice.observed_at,
+        ),
+        [latest[key] for key in sorted(latest)],
+    )
+    db.commit()
+    return len(latest)
+
+
+# Read Latest Price
+def get_latest_price(db: Session, crypto_name: str, vs_currency: str = "usd"):
+    return db.get(LatestPrice, (crypto_name, vs_currency))
+
+
+# Read Latest Prices observed since a point in time
+def get_latest_prices(db: Session, since: Optional[datetime] = None):
+    query = select(LatestPrice)
+    if since is not None:
+        query = query.where(LatestPrice.observed_at >= since)
+    return db.scalars(query).all()
@@ -1,8 +1,17 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.databases.pool import (
+    ALWAYS,
+    InstrumentedAsyncPool,
+    InstrumentedQueuePool,
+    instrument_pool,
+)
+from app.databases.replicas import PRIMARY, ReadRouter, Target
+from app.databases.timing import instrument_queries
 
 load_dotenv()
 
@@ -12,12 +21,118 @@ db_name = os.getenv("POSTGRES_DB", "default_db")
 db_host = os.getenv("POSTGRES_HOST", "localhost")
 db_port = os.getenv("POSTGRES_PORT", "5432")
 
+# Connection pool (applies to the sync and the async engine separately)
+db_pool_size = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+db_max_overflow = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+db_pool_timeout = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+db_pool_recycle = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
+# always | idle | never; "idle" pings only connections unused for PING_IDLE seconds
+db_pool_pre_ping = os.getenv("POSTGRES_POOL_PRE_PING", "idle").lower()
+db_pool_ping_idle = float(os.getenv("POSTGRES_POOL_PING_IDLE", "30"))
+
+# Serve transaction endpoints through asyncpg (true) or the sync psycopg2 API
+db_async = os.getenv("DB_ASYNC", "true").lower() == "true"
+
+# Optional read replicas: comma-separated SQLAlchemy URLs (psycopg2); the async
+# engine reaches the same hosts through asyncpg. Pool settings are shared
+db_replica_urls = [
+    url.strip()
+    for url in os.getenv("POSTGRES_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+# round_robin | least_connections
+db_replica_strategy = os.getenv("POSTGRES_REPLICA_STRATEGY", "round_robin").lower()
+
 DATABASE_URL = (
     f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 )
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+pool_options = dict(
+    pool_size=db_pool_size,
+    max_overflow=db_max_overflow,
+    pool_timeout=db_pool_timeout,
+    pool_recycle=db_pool_recycle,
+    pool_pre_ping=db_pool_pre_ping == ALWAYS,
+)
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **pool_options)
+instrument_pool(engine, "sync", db_pool_pre_ping, db_pool_ping_idle)
+instrument_queries(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg); only built when enabled so the sync setup does not
+# need the driver installed
+async_engine = (
+    create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncPool, **pool_options
+    )
+    if db_async
+    else None
+)
+if async_engine is not None:
+    instrument_pool(
+        async_engine.sync_engine, "async", db_pool_pre_ping, db_pool_ping_idle
+    )
+    instrument_queries(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if db_async
+    else None
+)
+
+
+# Replica engines get their own pools and per-target pool and query metrics
+def replica_target(name: str, url: str, use_async: bool) -> Target:
+    if use_async:
+        replica_engine = create_async_engine(
+            make_url(url).set(drivername="postgresql+asyncpg"),
+            poolclass=InstrumentedAsyncPool,
+            **pool_options,
+        )
+        sync_engine = replica_engine.sync_engine
+        session_factory = async_sessionmaker(
+            replica_engine, autoflush=False, expire_on_commit=False
+        )
+    else:
+        replica_engine = sync_engine = create_engine(
+            url, poolclass=InstrumentedQueuePool, **pool_options
+        )
+        session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=replica_engine
+        )
+    label = f"{'async' if use_async else 'sync'}_{name}"
+    instrument_pool(sync_engine, label, db_pool_pre_ping, db_pool_ping_idle)
+    instrument_queries(sync_engine, label)
+    return Target(name, replica_engine, session_factory)
+
+
+# Read-only handlers open sessions through these; writes use the primary
+read_router = ReadRouter(
+    Target(PRIMARY, engine, SessionLocal),
+    [
+        replica_target(f"replica{index}", url, use_async=False)
+        for index, url in enumerate(db_replica_urls, 1)
+    ],
+    db_replica_strategy,
+    "sync",
+)
+async_read_router = (
+    ReadRouter(
+        Target(PRIMARY, async_engine, AsyncSessionLocal),
+        [
+            replica_target(f"replica{index}", url, use_async=True)
+            for index, url in enumerate(db_replica_urls, 1)
+        ],
+        db_replica_strategy,
+        "async",
+    )
+    if db_async
+    else None
+)
+
 Base = declarative_base()
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.services.transaction_cache import transaction_cache
+
+load_dotenv()
+
+# Monthly partitions kept ahead of the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# Full months of raw transactions kept before the current one; 0 keeps everything
+TRANSACTION_RETENTION_MONTHS = int(os.getenv("TRANSACTION_RETENTION_MONTHS", "0"))
+# drop | archive (detach and move to ARCHIVE_SCHEMA)
+TRANSACTION_RETENTION_MODE = os.getenv("TRANSACTION_RETENTION_MODE", "archive").lower()
+ARCHIVE_SCHEMA = os.getenv("TRANSACTION_ARCHIVE_SCHEMA", "archive")
+# Seconds between maintenance runs while the app is up; 0 disables them
+PARTITION_MAINTENANCE_INTERVAL = float(
+    os.getenv("PARTITION_MAINTENANCE_INTERVAL", "86400")
+)
+
+DROP = "drop"
+ARCHIVE = "archive"
+
+PARENT = "transactions"
+PARTITION_NAME = re.compile(r"^transactions_(\d{4})_(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month.year:04d}_{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+# Existing monthly partitions, oldest first, as (month, name)
+def list_partitions(connection: Connection):
+    names = connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": PARENT},
+    ).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((date(int(match[1]), int(match[2]), 1), name))
+    return sorted(partitions)
+
+
+# Creates the monthly partitions for [first, last]; months whose rows already
+# sit in the default partition are skipped with a warning
+def create_partitions(connection: Connection, first: date, last: date) -> List[str]:
+    existing = {name for _, name in list_partitions(connection)}
+    created = []
+    month = month_start(first)
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            try:
+                with connection.begin_nested():
+                    connection.execute(
+                        text(
+                            f"CREATE TABLE {name} PARTITION OF {PARENT} "
+                            f"FOR VALUES FROM ('{_bound(month)}') "
+                            f"TO ('{_bound(add_months(month, 1))}')"
+                        )
+                    )
+                created.append(name)
+            except Exception as e:
+                logging.warning(f"Could not create partition {name}: {e}")
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_partitions(
+    connection: Connection,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    today: Optional[date] = None,
+) -> List[str]:
+    current = month_start(today or datetime.now(timezone.utc).date())
+    return create_partitions(connection, current, add_months(current, months_ahead))
+
+
+# Detaches monthly partitions that end on or before the cutoff month, then
+# drops them or moves them to the archive schema; no row-by-row DELETE
+def apply_retention(
+    connection: Connection,
+    keep_months: int = TRANSACTION_RETENTION_MONTHS,
+    mode: str = TRANSACTION_RETENTION_MODE,
+    today: Optional[date] = None,
+) -> List[str]:
+    if keep_months <= 0:
+        return []
+    if mode not in (DROP, ARCHIVE):
+        raise ValueError(f"Unknown retention mode: {mode}")
+
+    cutoff = add_months(
+        month_start(today or datetime.now(timezone.utc).date()), -keep_months
+    )
+    if mode == ARCHIVE:
+        connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+
+    removed = []
+    for month, name in list_partitions(connection):
+        if add_months(month, 1) > cutoff:
+            break
+        connection.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if mode == DROP:
+            connection.execute(text(f"DROP TABLE {name}"))
+        else:
+            connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        removed.append(name)
+    return removed
+
+
+def maintain(engine: Engine):
+    with engine.begin() as connection:
+        created = ensure_partitions(connection)
+        removed = apply_retention(connection)
+    if removed:
+        # Retired rows must not be served from the hot read cache
+        transaction_cache.clear()
+    if created or removed:
+        logging.info(f"Partitions created: {created}, retired: {removed}")
+
+
+async def run_maintenance(
+    engine: Engine, interval: float = PARTITION_MAINTENANCE_INTERVAL
+):
+    while True:
+        try:
+            await asyncio.to_thread(maintain, engine)
+        except Exception as e:
+            logging.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+
+# python -m app.databases.partitions create --months-ahead 3
+# python -m app.databases.partitions retain --keep-months 12 --mode drop
+if __name__ == "__main__":
+    from app.databases.db import engine
+
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create")
+    create.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    retain = commands.add_parser("retain")
+    retain.add_argument("--keep-months", type=int, default=TRANSACTION_RETENTION_MONTHS)
+    retain.add_argument(
+        "--mode", choices=(DROP, ARCHIVE), default=TRANSACTION_RETENTION_MODE
+    )
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        if args.command == "create":
+            print(ensure_partitions(connection, args.months_ahead))
+        else:
+            print(apply_retention(connection, args.keep_months, args.mode))
@@ -0,0 +1,111 @@
+import logging
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import app.services.metrics as metrics
+
+# Pre-ping strategies
+ALWAYS = "always"  # ping on every checkout (SQLAlchemy pool_pre_ping)
+IDLE = "idle"  # ping only connections idle for longer than the threshold
+NEVER = "never"
+PRE_PING_STRATEGIES = (ALWAYS, IDLE, NEVER)
+
+WAIT_SECONDS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+# Times how long callers wait for a connection (pool lock + queue)
+class _TimedCheckout:
+    checkout_wait = None
+    checkout_timeouts = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.checkout_timeouts is not None:
+                self.checkout_timeouts.inc()
+            raise
+        finally:
+            if self.checkout_wait is not None:
+                self.checkout_wait.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.checkout_wait = self.checkout_wait
+        new_pool.checkout_timeouts = self.checkout_timeouts
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncPool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+# Export pool metrics for `engine` (a sync Engine) and apply the pre-ping strategy
+def instrument_pool(engine, name: str, pre_ping: str = NEVER, ping_idle: float = 30):
+    if pre_ping not in PRE_PING_STRATEGIES:
+        raise ValueError(f"Unknown pre-ping strategy {pre_ping!r}")
+    prefix = f"db_pool_{name}"
+    pool = engine.pool
+
+    pool.checkout_wait = metrics.histogram(
+        f"{prefix}_checkout_wait_seconds",
+        "Time spent waiting for a connection",
+        WAIT_SECONDS_BUCKETS,
+    )
+    pool.checkout_timeouts = metrics.counter(
+        f"{prefix}_checkout_timeouts_total", "Checkouts that hit the pool timeout"
+    )
+    # Read through the engine so pool.recreate() is picked up
+    metrics.gauge(f"{prefix}_size", "Configured pool size", lambda: engine.pool.size())
+    metrics.gauge(
+        f"{prefix}_in_use", "Connections checked out", lambda: engine.pool.checkedout()
+    )
+    metrics.gauge(
+        f"{prefix}_idle",
+        "Connections idle in the pool",
+        lambda: engine.pool.checkedin(),
+    )
+    metrics.gauge(
+        f"{prefix}_overflow",
+        "Connections open beyond the pool size",
+        lambda: max(0, engine.pool.overflow()),
+    )
+    checkouts = metrics.counter(f"{prefix}_checkouts_total", "Connection checkouts")
+    connects = metrics.counter(f"{prefix}_connects_total", "New DBAPI connections")
+    invalidations = metrics.counter(
+        f"{prefix}_invalidations_total", "Connections invalidated"
+    )
+    pings = metrics.counter(f"{prefix}_pings_total", "Idle pre-pings issued")
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        connects.inc()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        invalidations.inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+        if pre_ping != IDLE:
+            return
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < ping_idle:
+            return
+        pings.inc()
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            logging.warning(f"Discarding stale {name} pool connection: {e}")
+            # The pool drops this connection and retries with a fresh one
+            raise exc.DisconnectionError() from e
@@ -0,0 +1,69 @@
+import itertools
+from typing import Callable, List, Sequence
+import app.services.metrics as metrics
+
+# Replica selection strategies
+ROUND_ROBIN = "round_robin"
+# Fewest connections checked out of the target's pool; ties rotate
+LEAST_CONNECTIONS = "least_connections"
+STRATEGIES = (ROUND_ROBIN, LEAST_CONNECTIONS)
+
+PRIMARY = "primary"
+
+
+# One database a session can be opened on
+class Target:
+    def __init__(self, name: str, engine, session_factory: Callable):
+        self.name = name
+        self.engine = engine
+        self.session_factory = session_factory
+
+    def in_use(self) -> int:
+        return self.engine.pool.checkedout()
+
+
+# Opens read sessions on a replica, or on the primary when asked to (a
+# client's read-your-writes window) or when no replicas are configured.
+# Writes never go through the router.
+class ReadRouter:
+    def __init__(
+        self,
+        primary: Target,
+        replicas: Sequence[Target] = (),
+        strategy: str = ROUND_ROBIN,
+        name: str = "sync",
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy {strategy!r}")
+        self.primary = primary
+        self.replicas: List[Target] = list(replicas)
+        self.strategy = strategy
+        self.name = name
+        self._turn = itertools.count()
+        self.reads = metrics.counter(
+            "db_read_sessions_total",
+            "Read sessions by engine and target",
+            labels=("engine", "target"),
+        )
+
+    def choose(self) -> Target:
+        if not self.replicas:
+            return self.primary
+        start = next(self._turn) % len(self.replicas)
+        if self.strategy == ROUND_ROBIN:
+            return self.replicas[start]
+        # min() keeps the first of equals, so the rotation spreads ties
+        rotated = self.replicas[start:] + self.replicas[:start]
+        return min(rotated, key=Target.in_use)
+
+    def target(self, primary: bool = False) -> Target:
+        target = self.primary if primary else self.choose()
+        self.reads.labels(self.name, target.name).inc()
+        return target
+
+    def session(self, primary: bool = False):
+        return self.target(primary).session_factory()
+
+    # A DBAPI connection for reads that bypass the ORM (sync engines only)
+    def raw_connection(self, primary: bool = False):
+        return self.target(primary).engine.raw_connection()
@@ -0,0 +1,100 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import app.services.metrics as metrics
+
+QUERY_SECONDS_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    5,
+)
+
+# Statement label: the leading keyword, anything else is "OTHER"
+STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY"}
+
+
+def statement_kind(statement: str) -> str:
+    words = statement.lstrip()[:7].split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in STATEMENTS else "OTHER"
+
+
+# The COMMIT in flight in this thread or greenlet (a Session commits from one
+# of them) as (histogram, start). The "commit" event fires just before the
+# COMMIT is sent; SQLAlchemy has no engine event for its completion, so the
+# first event after it stops the clock
+_commit_started: ContextVar[Optional[tuple]] = ContextVar(
+    "commit_started", default=None
+)
+
+
+def _commit_finished(*args):
+    started = _commit_started.get()
+    if started is not None:
+        _commit_started.set(None)
+        histogram, start = started
+        histogram.observe(time.perf_counter() - start)
+
+
+# Fires right after the session's connections commit, before it expires its
+# objects and releases them
+event.listen(Session, "after_commit", _commit_finished)
+
+
+# Export query and commit latency for `engine` (a sync Engine)
+def instrument_queries(engine, name: str):
+    queries = metrics.histogram(
+        "db_query_duration_seconds",
+        "Statement execution time by engine and statement",
+        QUERY_SECONDS_BUCKETS,
+        labels=("engine", "statement"),
+    )
+    errors = metrics.counter(
+        "db_query_errors_total", "Statements that raised", labels=("engine",)
+    )
+    commit_seconds = metrics.histogram(
+        "db_commit_duration_seconds",
+        "COMMIT round trip by engine",
+        QUERY_SECONDS_BUCKETS,
+        labels=("engine",),
+    ).labels(name)
+    engine_errors = errors.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        queries.labels(name, statement_kind(statement)).observe(elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(exception_context):
+        engine_errors.inc()
+
+    @event.listens_for(engine, "commit")
+    def on_commit(conn):
+        _commit_started.set((commit_seconds, time.perf_counter()))
+
+    # Commits made without a Session end when the connection is used again
+    # or goes back to the pool
+    @event.listens_for(engine, "begin")
+    def on_begin(conn):
+        _commit_finished()
+
+    @event.listens_for(engine, "reset")
+    def on_reset(dbapi_connection, connection_record, reset_state):
+        _commit_finished()
@@ -1,53 +1,120 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi import (
+    FastAPI,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from starlette.middleware.base import BaseHTTPMiddleware
+from contextlib import asynccontextmanager
 import dotenv
-import time
+import asyncio
+import functools
+import json
 import logging
+import math
 import os
 import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.databases.db import SessionLocal
+from app.databases.db import (
+    AsyncSessionLocal,
+    SessionLocal,
+    async_engine,
+    async_read_router,
+    db_async,
+    engine,
+    read_router,
+)
+import app.databases.partitions as partitions
+import app.async_crud as async_crud
 import app.crud as crud
+import app.services.analytics as analytics
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+import app.services.export as export
+import app.services.ingest as ingest
+import app.services.prices as prices
+import app.services.stream as stream
+from app.services.poller import price_poller
+from app.services.prices import split_csv
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.services.instrumentation import InstrumentationMiddleware
+from app.services.resilience import UpstreamUnavailable
+from app.services.conditional import conditional_response, entity_tag
+from app.services.consistency import ReadYourWritesMiddleware, recent_write
+from app.services.serialization import TransactionJSONResponse, encode_transactions
+from app.services.transaction_cache import transaction_cache
+from app.services.stream import TooManySubscribers, broadcaster
 from app.models.model import Transaction
-from app.schemas.schemas import TransactionCreate, TransactionResponse
-from typing import Optional, List
+from app.schemas.schemas import (
+    AnalyticsResponse,
+    BulkIngestResponse,
+    RollupResponse,
+    TransactionCreate,
+    TransactionResponse,
+    TransactionUpdate,
+)
+from datetime import datetime
+from typing import Dict, Literal, Optional, List, Union
 
 # Configure logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-# Initialize the app
-app = FastAPI()
 
-# init security
-security = HTTPBasic()
+# App lifespan: shared resources live for the whole process
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await gecko.start_client()
+    prices.start()
+    if prices.LATEST_PRICE_WARMUP:
+        await prices.warm_cache()
+    # Keeps the configured watchlist fresh in the price cache
+    price_poller.start()
+    # Keeps monthly transaction partitions ahead and applies retention
+    maintenance = None
+    if partitions.PARTITION_MAINTENANCE_INTERVAL > 0:
+        maintenance = asyncio.create_task(partitions.run_maintenance(engine))
+    yield
+    if maintenance is not None:
+        maintenance.cancel()
+        await asyncio.gather(maintenance, return_exceptions=True)
+    await broadcaster.stop()
+    await price_poller.stop()
+    await prices.shutdown()
+    analytics.shutdown()
+    await gecko.close_client()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_read_router is not None:
+        for replica in async_read_router.replicas:
+            await replica.engine.dispose()
 
 
-# Custom Middleware for Request Logging
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Log request details
-        logging.info(f"Incoming request: {request.method} {request.url}")
-        logging.debug(f"Headers: {dict(request.headers)}")
+# Initialize the app
+app = FastAPI(lifespan=lifespan)
 
-        # Measure request processing time
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
+# init security
+security = HTTPBasic()
 
-        # Log response details
-        logging.info(
-            f"Completed response: {response.status_code} in {process_time:.2f}s"
-        )
-        return response
 
+# Request metrics and sampled access log
+app.add_middleware(InstrumentationMiddleware)
 
-# Add middleware to the app
-app.add_middleware(RequestLoggingMiddleware)
+# Marks clients that wrote, so their reads skip the replicas for a while
+if read_router.replicas:
+    app.add_middleware(ReadYourWritesMiddleware)
 
 # Load .env file
 dotenv.load_dotenv()
@@ -72,6 +139,66 @@ def get_db():
         db.close()
 
 
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Reads stay on the primary while the client's last write may not have
+# reached the replicas yet
+def reads_from_primary(request: Request) -> bool:
+    return recent_write(request.cookies)
+
+
+# Dependencies for read-only handlers: a replica session when replicas are
+# configured
+def get_read_db(request: Request):
+    db = read_router.session(primary=reads_from_primary(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    async with async_read_router.session(primary=reads_from_primary(request)) as db:
+        yield db
+
+
+# Sync crud functions awaited from async handlers, run in the threadpool
+class ThreadedCrud:
+    def __init__(self, module):
+        self.module = module
+
+    def __getattr__(self, name):
+        fn = getattr(self.module, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(fn, *args, **kwargs)
+
+        return call
+
+
+# Transaction storage: asyncpg by default, the sync psycopg2 API with DB_ASYNC=false
+DbSession = Union[AsyncSession, Session]
+if db_async:
+    store = async_crud
+    get_session = get_async_db
+    get_read_session = get_async_read_db
+else:
+    store = ThreadedCrud(crud)
+    get_session = get_db
+    get_read_session = get_read_db
+
+
+# Dependency for read-only handlers that manage their own session (streaming
+# bodies); the session is opened on the target chosen now
+def get_session_factory(request: Request):
+    router = async_read_router if db_async else read_router
+    return functools.partial(router.session, primary=reads_from_primary(request))
+
+
 # Security
 def get_current_username(credentials: HTTPBasicCredentials = Depends(security)):
     if (
@@ -90,77 +217,237 @@ def get_current_username(credentials: HTTPBasicCredentials = Depends(security)):
 class CryptoPriceResponse(BaseModel):
     crypto_name: str
     price_usd: Optional[float] = None
+    # live | cached | snapshot
+    source: Optional[str] = None
+
+
+class CryptoPricesResponse(BaseModel):
+    # crypto id -> vs currency -> price
+    prices: Dict[str, Dict[str, Optional[float]]]
+    # crypto id -> vs currency -> live | cached | snapshot
+    sources: Dict[str, Dict[str, str]] = {}
+
+
+# Upper bound on ids accepted by the bulk price endpoint
+MAX_BULK_IDS = 250
+
+
+# 503 while the upstream circuit is open or throttled beyond the retry budget
+def unavailable(e: UpstreamUnavailable) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
 
 
 # Endpoints
 @app.get("/crypto/{crypto_name}", response_model=CryptoPriceResponse)
-async def get_crypto_data(crypto_name: str, db: Session = Depends(get_db)):
-    logging.info(f"Fetching data for cryptocurrency: {crypto_name}")
-
-    # gecko url
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={crypto_name}&vs_currencies=usd"
+async def get_crypto_data(crypto_name: str, response: Response):
+    logging.debug("Fetching data for cryptocurrency: %s", crypto_name)
 
     # headers = {"Authorization": f"Bearer {api_key}"}
 
     try:
-        # Make the API request
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        # Served from the price cache; misses go upstream over the shared client
+        result = await prices.get_price(crypto_name, "usd")
+        response.headers.update(prices.cache_headers(result))
 
-        # Raise exception if request failed
-        response.raise_for_status()
+        return {
+            "crypto_name": crypto_name,
+            "price_usd": result.price,
+            "source": result.source,
+        }
 
-        # Parse the JSON response
-        data = response.json()
-        logging.debug(f"Response data: {data}")
+    except httpx.HTTPStatusError as e:
+        logging.error(f"HTTP error while fetching data for {crypto_name}: {e}")
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
 
-        # Extract price
-        price_usd = data.get(crypto_name, {}).get("usd", None)
+    except httpx.TimeoutException as e:
+        logging.error(f"Upstream timeout while fetching data for {crypto_name}: {e}")
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
+
+    except UpstreamUnavailable as e:
+        logging.error(
+            f"Upstream unavailable while fetching data for {crypto_name}: {e}"
+        )
+        raise unavailable(e)
 
-        # Save the transaction to the database (optional example)
-        if price_usd is not None:
-            crud.create_transaction(db, crypto_name, 1.0, price_usd)
+    except Exception as e:
+        logging.error(f"Unexpected error while fetching data for {crypto_name}: {e}")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
-        return {"crypto_name": crypto_name, "price_usd": price_usd}
+
+@app.get("/crypto", response_model=CryptoPricesResponse)
+async def get_crypto_prices(response: Response, ids: str, vs: str = "usd"):
+    crypto_names = split_csv(ids)
+    vs_currencies = split_csv(vs)
+    if not crypto_names or not vs_currencies:
+        raise HTTPException(status_code=400, detail="ids and vs must not be empty")
+    if len(crypto_names) > MAX_BULK_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BULK_IDS} ids per request"
+        )
+    logging.debug(
+        "Fetching data for cryptocurrencies: %s in %s", crypto_names, vs_currencies
+    )
+
+    try:
+        results = await prices.get_prices(crypto_names, vs_currencies)
 
     except httpx.HTTPStatusError as e:
-        logging.error(f"HTTP error while fetching data for {crypto_name}: {e}")
-        raise HTTPException(status_code=response.status_code, detail=str(e))
+        logging.error(f"HTTP error while fetching data for {crypto_names}: {e}")
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+
+    except httpx.TimeoutException as e:
+        logging.error(f"Upstream timeout while fetching data for {crypto_names}: {e}")
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
+
+    except UpstreamUnavailable as e:
+        logging.error(
+            f"Upstream unavailable while fetching data for {crypto_names}: {e}"
+        )
+        raise unavailable(e)
 
     except Exception as e:
-        logging.error(f"Unexpected error while fetching data for {crypto_name}: {e}")
+        logging.error(f"Unexpected error while fetching data for {crypto_names}: {e}")
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
+    # Headers describe the oldest price in the response
+    response.headers.update(prices.cache_headers(max(results, key=lambda r: r.age)))
+
+    quotes = {crypto_name: {} for crypto_name in crypto_names}
+    sources = {crypto_name: {} for crypto_name in crypto_names}
+    for result in results:
+        quotes[result.crypto_name][result.vs_currency] = result.price
+        sources[result.crypto_name][result.vs_currency] = result.source
+
+    return {"prices": quotes, "sources": sources}
 
+
+# Rows are encoded by the fast path; response_model only documents the schema.
+# The page carries an ETag but no Last-Modified: a deleted row changes the
+# page without any remaining row getting newer
 @app.get("/transactions/", response_model=List[TransactionResponse])
-def get_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    transactions = crud.get_transactions(db, skip, limit)
-    return transactions
+async def get_transactions(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: DbSession = Depends(get_read_session),
+):
+    # Keyset pagination by default; skip/limit kept for older clients
+    if skip and cursor is None:
+        transactions = await store.get_transactions(db, skip, limit)
+    else:
+        try:
+            after = decode_cursor(cursor) if cursor is not None else None
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        transactions = await store.get_transactions_after(db, after, limit)
+
+    # A full page may have more rows behind it
+    headers = {}
+    if limit > 0 and len(transactions) == limit:
+        last = transactions[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last.timestamp, last.id)
+    body = encode_transactions(transactions)
+    return conditional_response(
+        request.headers, body, entity_tag(body), extra_headers=headers
+    )
+
+
+# Declared before /transactions/{transaction_id} so "export" is not parsed as an id
+@app.get("/transactions/export")
+async def export_transactions(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    crypto_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session_factory=Depends(get_session_factory),
+):
+    filters = {"crypto_name": crypto_name, "start": start, "end": end}
+    if db_async:
+        body = export.export_async(session_factory, fmt, **filters)
+    else:
+        body = export.export_sync(session_factory, fmt, **filters)
+
+    headers = {}
+    if fmt == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="transactions.csv"'
+    return StreamingResponse(body, media_type=export.MEDIA_TYPES[fmt], headers=headers)
 
 
+# Hot reads come from the encoded-body cache without touching the database.
+# Inside its read-your-writes window a client bypasses the cache, which may
+# hold what a lagging replica returned
 @app.get("/transactions/{transaction_id}", response_model=TransactionResponse)
-def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    transaction = crud.get_transaction_by_id(db, transaction_id)
-    if transaction is None:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    return transaction
+async def get_transaction(
+    transaction_id: int, request: Request, db: DbSession = Depends(get_read_session)
+):
+    cached = None
+    if not reads_from_primary(request):
+        cached = transaction_cache.get(transaction_id)
+    if cached is None:
+        version = transaction_cache.version
+        transaction = await store.get_transaction_by_id(db, transaction_id)
+        if transaction is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        cached = transaction_cache.put(transaction_id, transaction, version)
+    return conditional_response(
+        request.headers, cached.body, cached.etag, cached.last_modified
+    )
 
 
 @app.post("/transactions/", response_model=TransactionResponse)
-def create_transaction(transaction: TransactionCreate, db: Session = Depends(get_db)):
-    db_transaction = crud.create_transaction(
+async def create_transaction(
+    transaction: TransactionCreate, db: DbSession = Depends(get_session)
+):
+    db_transaction = await store.create_transaction(
         db, transaction.crypto_name, transaction.amount, transaction.price_usd
     )
-    return db_transaction
+    return TransactionJSONResponse(db_transaction)
+
+
+# Bulk ingest: a JSON array or an NDJSON stream of TransactionCreate items
+@app.post("/transactions/bulk", response_model=BulkIngestResponse)
+async def create_transactions_bulk(
+    request: Request,
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    report_errors: bool = False,
+    db: DbSession = Depends(get_session),
+):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type:
+        items = ingest.iter_ndjson(request.stream())
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+        items = ingest.iter_json_array(body)
+
+    result = await ingest.ingest(
+        items,
+        lambda rows: store.create_transactions_returning(db, rows),
+        chunk_size,
+        report_errors,
+    )
+    logging.info(
+        f"Bulk ingest: {result['inserted']} inserted, {result['rejected']} rejected"
+    )
+    return result
 
 
 @app.put("/transactions/{transaction_id}", response_model=TransactionResponse)
-def update_transaction(
+async def update_transaction(
     transaction_id: int,
     transaction: TransactionCreate,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_session),
 ):
-    updated_transaction = crud.update_transaction(
+    updated_transaction = await store.update_transaction(
         db,
         transaction_id,
         transaction.crypto_name,
@@ -169,17 +456,192 @@ def update_transaction(
     )
     if updated_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return updated_transaction
+    return TransactionJSONResponse(updated_transaction)
+
+
+# Partial update: only the fields present in the body are written
+@app.patch("/transactions/{transaction_id}", response_model=TransactionResponse)
+async def patch_transaction(
+    transaction_id: int,
+    transaction: TransactionUpdate,
+    db: DbSession = Depends(get_session),
+):
+    updated_transaction = await store.update_transaction(
+        db, transaction_id, **transaction.model_dump(exclude_unset=True)
+    )
+    if updated_transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return TransactionJSONResponse(updated_transaction)
 
 
 @app.delete("/transactions/{transaction_id}")
-def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    transaction = crud.delete_transaction(db, transaction_id)
+async def delete_transaction(transaction_id: int, db: DbSession = Depends(get_session)):
+    transaction = await store.delete_transaction(db, transaction_id)
     if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return {"message": f"Transaction with ID {transaction_id} deleted successfully"}
 
 
+# OHLC candles from the pre-aggregated rollups (primary key lookups)
+@app.get("/rollups/{crypto_name}", response_model=List[RollupResponse])
+async def get_rollups(
+    crypto_name: str,
+    resolution: Literal["minute", "hour", "day"] = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: DbSession = Depends(get_read_session),
+):
+    return await store.get_rollups(db, crypto_name, resolution, start, end, limit)
+
+
+# VWAP, returns, volatility and percentile bands over [start, end)
+@app.get("/analytics/{crypto_name}", response_model=AnalyticsResponse)
+async def get_analytics(
+    request: Request,
+    crypto_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: float = Query(3600, gt=0),
+    window: int = Query(24, ge=2, le=10000),
+    percentiles: str = "5,25,50,75,95",
+):
+    try:
+        bands = [float(p) for p in split_csv(percentiles)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be numbers")
+    if not all(0 <= p <= 100 for p in bands):
+        raise HTTPException(status_code=400, detail="percentiles must be in [0, 100]")
+
+    try:
+        return await analytics.get_window_stats(
+            crypto_name,
+            start,
+            end,
+            interval,
+            window,
+            bands,
+            primary=reads_from_primary(request),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# (coin, vs) pairs for a stream subscription
+def stream_keys(ids: str, vs: str) -> List[tuple]:
+    crypto_names = split_csv(ids)
+    vs_currencies = split_csv(vs)
+    if not crypto_names or not vs_currencies:
+        raise ValueError("ids and vs must not be empty")
+    if len(crypto_names) * len(vs_currencies) > MAX_BULK_IDS:
+        raise ValueError(f"At most {MAX_BULK_IDS} coin/currency pairs per stream")
+    return [
+        (coin, vs_currency) for coin in crypto_names for vs_currency in vs_currencies
+    ]
+
+
+# Server-Sent Events: one "price" event per change of a subscribed price
+@app.get("/stream/prices")
+async def stream_prices(ids: str, vs: str = "usd"):
+    try:
+        subscriber = broadcaster.subscribe(stream_keys(ids, vs))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def events():
+        try:
+            while True:
+                message = await subscriber.get(timeout=stream.STREAM_HEARTBEAT)
+                if message is None:
+                    # Keeps proxies from closing a quiet stream
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: price\ndata: {message}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    # Also released after the response, for a client that disconnects before
+    # the generator first runs (its finally never executes then)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(broadcaster.unsubscribe, subscriber),
+    )
+
+
+# WebSocket: the same updates as JSON text frames; the subscription can be
+# changed with {"action": "subscribe" | "unsubscribe", "ids": "...", "vs": "..."}
+@app.websocket("/ws/prices")
+async def websocket_prices(websocket: WebSocket, ids: str = "", vs: str = "usd"):
+    await websocket.accept()
+    try:
+        subscriber = broadcaster.subscribe(stream_keys(ids, vs) if ids else [])
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    except TooManySubscribers as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    async def receive():
+        while True:
+            try:
+                request = await websocket.receive_json()
+                keys = stream_keys(request.get("ids", ""), request.get("vs", "usd"))
+                action = request.get("action")
+                if action == "subscribe":
+                    if len(subscriber.keys | set(keys)) > MAX_BULK_IDS:
+                        raise ValueError(f"At most {MAX_BULK_IDS} pairs per stream")
+                    broadcaster.add_keys(subscriber, keys)
+                elif action == "unsubscribe":
+                    broadcaster.remove_keys(subscriber, keys)
+                else:
+                    raise ValueError("action must be subscribe or unsubscribe")
+            except (ValueError, AttributeError) as e:
+                subscriber.push(json.dumps({"error": str(e)}))
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            getter = asyncio.ensure_future(subscriber.get())
+            done, _ = await asyncio.wait(
+                (getter, receiver), return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter not in done:
+                getter.cancel()
+                break
+            await websocket.send_text(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+
+
+# Served on the event loop so the threadpool gauges can be read
+@app.get("/stats")
+async def get_stats():
+    return metrics.snapshot()
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def get_metrics():
+    return Response(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Circuit breaker and rate limiter state for the CoinGecko upstream
+@app.get("/upstream")
+def get_upstream():
+    return {"gecko": gecko.upstream.describe()}
+
+
 @app.get("/protected")
 def read_protected(username: str = Depends(get_current_username)):
     return {"message": "This is a protected route", "username": username}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, TIMESTAMP
+from sqlalchemy import DDL, Column, Index, Integer, String, Float, TIMESTAMP, event
 from sqlalchemy.sql import func
 from app.databases.db import Base
 
@@ -6,8 +6,60 @@ from app.databases.db import Base
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     crypto_name = Column(String, index=True)
     amount = Column(Float)
     price_usd = Column(Float)
-    timestamp = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # Partition key, so part of the table's primary key
+    timestamp = Column(
+        TIMESTAMP(timezone=True), primary_key=True, server_default=func.now()
+    )
+    # Set by updates; Last-Modified is updated_at or timestamp
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Stable (timestamp, id) order for keyset pagination
+        Index("ix_transactions_timestamp_id", "timestamp", "id"),
+        # Monthly partitions, see app/databases/partitions.py
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+    # Rows are still identified by id alone. Such lookups probe every
+    # partition's primary key index; see migration b7d2e4c81f06 for the cost
+    __mapper_args__ = {"primary_key": [id]}
+
+
+# Catch-all partition so a fresh schema accepts rows before any monthly
+# partition exists
+event.listen(
+    Transaction.__table__,
+    "after_create",
+    DDL("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT"),
+)
+
+
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+
+    # One OHLC candle per (coin, resolution, bucket start)
+    crypto_name = Column(String, primary_key=True)
+    resolution = Column(String, primary_key=True)
+    bucket = Column(TIMESTAMP(timezone=True), primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    # Timestamps of the open and close trades, for merging out-of-order inserts
+    first_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    last_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+
+class LatestPrice(Base):
+    __tablename__ = "latest_prices"
+
+    # Last observed upstream price per coin and quote currency
+    crypto_name = Column(String, primary_key=True)
+    vs_currency = Column(String, primary_key=True)
+    price = Column(Float, nullable=False)
+    observed_at = Column(TIMESTAMP(timezone=True), nullable=False)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict, field_serializer
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 
@@ -27,3 +27,55 @@ class TransactionResponse(BaseModel):
     @field_serializer("timestamp")
     def serialize_timestamp(self, timestamp: datetime, _info):
         return timestamp.isoformat()
+
+
+class RollupResponse(BaseModel):
+    bucket: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    count: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_serializer("bucket")
+    def serialize_bucket(self, bucket: datetime, _info):
+        return bucket.isoformat()
+
+
+class RollingVolatility(BaseModel):
+    bucket: datetime
+    volatility: Optional[float]
+
+
+class AnalyticsResponse(BaseModel):
+    crypto_name: str
+    start: datetime
+    end: datetime
+    interval: float
+    count: int
+    volume: Optional[float]
+    vwap: Optional[float]
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    close: Optional[float]
+    total_return: Optional[float]
+    mean_return: Optional[float]
+    volatility: Optional[float]
+    percentiles: Dict[str, Optional[float]]
+    rolling_volatility: List[RollingVolatility]
+
+
+class BulkIngestError(BaseModel):
+    index: int
+    errors: List[Any]
+
+
+class BulkIngestResponse(BaseModel):
+    inserted: int
+    rejected: int
+    ids: List[int]
+    errors: Optional[List[BulkIngestError]] = None
@@ -0,0 +1,272 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Hashable, List, Optional
+
+import dotenv
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.databases.db import read_router
+from app.services.price_cache import TTLCache
+
+dotenv.load_dotenv()
+
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", "4"))
+# Results for windows that ended in the past are reused for this long
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+# A window counts as closed once its explicit end is this many seconds in the
+# past, so rows still being written with a timestamp just before it are seen
+ANALYTICS_CLOSED_MARGIN = float(os.getenv("ANALYTICS_CLOSED_MARGIN", "60"))
+# Upper bound on return buckets per request (window / interval)
+MAX_BUCKETS = 100_000
+
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+# Postgres binary COPY: timestamps are microseconds since 2000-01-01 UTC
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp()
+COPY_HEADER = 19  # signature (11) + flags (4) + extension length (4)
+COPY_ROW = np.dtype(
+    [
+        ("fields", ">i2"),
+        ("timestamp_len", ">i4"),
+        ("timestamp", ">i8"),
+        ("price_len", ">i4"),
+        ("price", ">f8"),
+        ("amount_len", ">i4"),
+        ("amount", ">f8"),
+    ]
+)
+COPY_QUERY = """
+COPY (
+    SELECT timestamp, price_usd, amount
+    FROM transactions
+    WHERE crypto_name = %(crypto_name)s
+        AND timestamp >= %(start)s
+        AND timestamp < %(end)s
+        AND price_usd IS NOT NULL
+        AND amount IS NOT NULL
+    ORDER BY timestamp, id
+) TO STDOUT (FORMAT binary)
+"""
+
+
+@dataclass
+class CachedResult:
+    result: dict
+    stored_at: float
+
+
+# Computed results of closed windows: TTL plus an LRU bound
+class ResultCache(TTLCache):
+    def __init__(
+        self,
+        ttl: float = ANALYTICS_CACHE_TTL,
+        max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "analytics_cache",
+    ):
+        super().__init__(ttl, max_entries, clock, name)
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        entry = super().get(key)
+        return None if entry is None else entry.result
+
+    def set(self, key: Hashable, result: dict):
+        super().set(key, CachedResult(result=result, stored_at=self.clock()))
+
+
+analytics_cache = ResultCache()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=ANALYTICS_WORKERS, thread_name_prefix="analytics"
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# (epoch seconds, price, amount) arrays in (timestamp, id) order, read with a
+# binary COPY straight into NumPy (no per-row Python objects). The scan runs on
+# a replica when any are configured
+def fetch_arrays(
+    crypto_name: str, start: datetime, end: datetime, primary: bool = False
+):
+    connection = read_router.raw_connection(primary=primary)
+    try:
+        with connection.cursor() as cursor:
+            query = cursor.mogrify(
+                COPY_QUERY, {"crypto_name": crypto_name, "start": start, "end": end}
+            )
+            buffer = io.BytesIO()
+            cursor.copy_expert(query.decode(), buffer)
+        connection.rollback()
+    finally:
+        connection.close()
+
+    data = buffer.getbuffer()
+    extension = int.from_bytes(data[15:COPY_HEADER], "big")
+    # Every row has the same three non-null fixed-width columns
+    rows = np.frombuffer(data[COPY_HEADER + extension : -2], dtype=COPY_ROW)
+    timestamps = rows["timestamp"] / 1e6 + PG_EPOCH
+    return (
+        timestamps,
+        rows["price"].astype(np.float64),
+        rows["amount"].astype(np.float64),
+    )
+
+
+def _value(x) -> Optional[float]:
+    x = float(x)
+    return x if np.isfinite(x) else None
+
+
+# Window statistics over trade arrays sorted by time
+def compute(
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    amounts: np.ndarray,
+    start: float,
+    interval: float,
+    window: int,
+    percentiles: List[float],
+) -> dict:
+    count = len(prices)
+    result = {
+        "count": count,
+        "volume": _value(amounts.sum()),
+        "vwap": None,
+        "open": None,
+        "high": None,
+        "low": None,
+        "close": None,
+        "total_return": None,
+        "mean_return": None,
+        "volatility": None,
+        "percentiles": {f"{p:g}": None for p in percentiles},
+        "rolling_volatility": [],
+    }
+    if count == 0:
+        return result
+
+    volume = amounts.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["vwap"] = _value(np.dot(prices, amounts) / volume)
+        result.update(
+            open=_value(prices[0]),
+            high=_value(prices.max()),
+            low=_value(prices.min()),
+            close=_value(prices[-1]),
+            total_return=_value(prices[-1] / prices[0] - 1),
+        )
+        result["percentiles"] = dict(
+            zip(result["percentiles"], map(_value, np.percentile(prices, percentiles)))
+        )
+
+        # Close of each non-empty interval bucket, then log returns between them
+        buckets = ((timestamps - start) // interval).astype(np.int64)
+        last = np.append(np.flatnonzero(np.diff(buckets)), count - 1)
+        returns = np.diff(np.log(prices[last]))
+        if len(returns) > 0:
+            result["mean_return"] = _value(returns.mean())
+        if len(returns) > 1:
+            result["volatility"] = _value(returns.std(ddof=1))
+        if window > 1 and len(returns) >= window:
+            rolling = sliding_window_view(returns, window).std(axis=1, ddof=1)
+            ends = buckets[last][window:]
+            result["rolling_volatility"] = [
+                {
+                    "bucket": datetime.fromtimestamp(
+                        start + bucket * interval, timezone.utc
+                    ),
+                    "volatility": _value(value),
+                }
+                for bucket, value in zip(ends.tolist(), rolling.tolist())
+            ]
+    return result
+
+
+def window_stats(
+    crypto_name: str,
+    start: datetime,
+    end: datetime,
+    interval: float,
+    window: int,
+    percentiles: List[float],
+    primary: bool = False,
+) -> dict:
+    timestamps, prices, amounts = fetch_arrays(crypto_name, start, end, primary)
+    return compute(
+        timestamps, prices, amounts, start.timestamp(), interval, window, percentiles
+    )
+
+
+# Statistics for [start, end), computed in the worker pool; windows that have
+# already closed are served from the cache
+async def get_window_stats(
+    crypto_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: float = 3600,
+    window: int = 24,
+    percentiles: List[float] = DEFAULT_PERCENTILES,
+    primary: bool = False,
+) -> dict:
+    now = datetime.now(timezone.utc)
+    # Naive bounds are taken as UTC
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    # Only a window with an explicit end safely in the past can be reused;
+    # defaulting to now would cache a single-use entry per request
+    closed = end is not None and (now - end).total_seconds() >= ANALYTICS_CLOSED_MARGIN
+    end = end or now
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise ValueError("start must be before end")
+    if (end - start).total_seconds() / interval > MAX_BUCKETS:
+        raise ValueError(f"At most {MAX_BUCKETS} intervals per window")
+
+    key = (crypto_name, start, end, interval, window, tuple(percentiles))
+    if closed:
+        cached = analytics_cache.get(key)
+        if cached is not None:
+            return cached
+
+    stats = await asyncio.get_running_loop().run_in_executor(
+        get_executor(),
+        window_stats,
+        crypto_name,
+        start,
+        end,
+        interval,
+        window,
+        list(percentiles),
+        primary,
+    )
+    result = {
+        "crypto_name": crypto_name,
+        "start": start,
+        "end": end,
+        "interval": interval,
+        **stats,
+    }
+    if closed:
+        analytics_cache.set(key, result)
+    return result
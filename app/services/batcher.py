@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import dotenv
+
+import app.services.metrics as metrics
+
+dotenv.load_dotenv()
+
+# Collect distinct ids for up to WINDOW_MS, or until MAX_SIZE ids are waiting
+PRICE_BATCH_WINDOW_MS = float(os.getenv("PRICE_BATCH_WINDOW_MS", "10"))
+PRICE_BATCH_MAX_SIZE = int(os.getenv("PRICE_BATCH_MAX_SIZE", "50"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+# fetch(ids, vs_currencies) -> CoinGecko simple/price payload
+FetchBatch = Callable[[str, str], Awaitable[dict]]
+
+
+def _fail(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
+        # Mark as retrieved: waiters may already have gone away
+        future.exception()
+
+
+# Groups single (coin, vs) lookups into one multi-id, multi-currency
+# simple/price call; the batch cap counts distinct coin ids
+class PriceBatcher:
+    def __init__(
+        self,
+        fetch: FetchBatch,
+        window_ms: float = PRICE_BATCH_WINDOW_MS,
+        max_size: int = PRICE_BATCH_MAX_SIZE,
+        name: str = "price_batch",
+    ):
+        self.fetch = fetch
+        self.window_ms = window_ms
+        self.max_size = max_size
+        # coin id -> vs currency -> future
+        self._pending: Dict[str, Dict[str, asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        metrics.gauge(
+            f"{name}_window_seconds", "Batching window", lambda: self.window_ms / 1000
+        )
+        metrics.gauge(f"{name}_max_size", "Batch size cap", lambda: self.max_size)
+        self.batch_size = metrics.histogram(
+            f"{name}_size", "Distinct ids per upstream call", BATCH_SIZE_BUCKETS
+        )
+        self.upstream_calls = metrics.counter(
+            f"{name}_upstream_calls_total", "Upstream calls issued by the batcher"
+        )
+        self.lookups = metrics.counter(
+            f"{name}_lookups_total", "Lookups submitted to the batcher"
+        )
+
+    async def get(self, crypto_name: str, vs_currency: str = "usd") -> Optional[float]:
+        self.lookups.inc()
+        loop = asyncio.get_running_loop()
+        currencies = self._pending.setdefault(crypto_name, {})
+        future = currencies.get(vs_currency)
+        if future is None:
+            future = loop.create_future()
+            currencies[vs_currency] = future
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        # A cancelled caller must not cancel the lookup for the rest of the batch
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: Dict[str, Dict[str, asyncio.Future]]):
+        vs_currencies = sorted(
+            {vs for currencies in batch.values() for vs in currencies}
+        )
+        self.batch_size.observe(len(batch))
+        self.upstream_calls.inc()
+        try:
+            data = await self.fetch(",".join(batch), ",".join(vs_currencies))
+            logging.debug(f"Response data: {data}")
+        except BaseException as e:
+            for currencies in batch.values():
+                for future in currencies.values():
+                    _fail(future, e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        for crypto_name, currencies in batch.items():
+            quotes = data.get(crypto_name, {})
+            for vs_currency, future in currencies.items():
+                if not future.done():
+                    future.set_result(quotes.get(vs_currency, None))
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for currencies in self._pending.values():
+            for future in currencies.values():
+                future.cancel()
+        self._pending.clear()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
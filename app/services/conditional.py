@@ -0,0 +1,63 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, Optional
+from fastapi.responses import Response
+
+
+# Strong validator from the encoded body; identical bodies get identical tags
+# in every worker
+def entity_tag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def _tags(value: str):
+    return {tag.strip().removeprefix("W/") for tag in value.split(",")}
+
+
+# RFC 9110 13.2.2: If-None-Match (weak comparison) wins; If-Modified-Since is
+# only evaluated without it, at the one-second resolution of HTTP dates
+def not_modified(
+    headers: Mapping[str, str], etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _tags(if_none_match)
+        return "*" in tags or etag in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    since = parse_http_date(if_modified_since)
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+# JSON body with validators, or an empty 304 carrying the same headers;
+# no-cache makes clients revalidate instead of guessing a freshness lifetime
+def conditional_response(
+    headers: Mapping[str, str],
+    body: bytes,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    extra_headers: Optional[dict] = None,
+) -> Response:
+    validators = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        validators["Last-Modified"] = http_date(last_modified)
+    if extra_headers:
+        validators.update(extra_headers)
+    if not_modified(headers, etag, last_modified):
+        return Response(status_code=304, headers=validators)
+    return Response(body, media_type="application/json", headers=validators)
@@ -0,0 +1,63 @@
+import math
+import os
+import time
+from typing import Callable, Mapping
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# Seconds a client's reads stay on the primary after one of its writes, so
+# replica lag never hides the write from the client that made it
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Holds the server time of the client's last successful write
+LAST_WRITE_COOKIE = "last_write"
+
+MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def recent_write(
+    cookies: Mapping[str, str],
+    window: float = READ_YOUR_WRITES_SECONDS,
+    clock: Callable[[], float] = time.time,
+) -> bool:
+    try:
+        written = float(cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return abs(clock() - written) < window
+
+
+# Pure ASGI middleware: successful mutating requests set the last-write
+# cookie, which works across workers without shared state. Clients that do
+# not keep cookies can echo it back themselves.
+class ReadYourWritesMiddleware:
+    def __init__(
+        self,
+        app,
+        window: float = READ_YOUR_WRITES_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.app = app
+        self.window = window
+        self.clock = clock
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{LAST_WRITE_COOKIE}={self.clock():.3f}; "
+                    f"Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode("latin-1")),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from typing import Callable, Iterable, Sequence
+import app.async_crud as async_crud
+import app.crud as crud
+
+# Column order of the export query
+COLUMNS = ("id", "crypto_name", "amount", "price_usd", "timestamp")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _iso(timestamp):
+    return timestamp.isoformat() if timestamp is not None else None
+
+
+def ndjson_chunk(rows: Iterable[Sequence]) -> str:
+    return "".join(
+        json.dumps(
+            {
+                "id": row[0],
+                "crypto_name": row[1],
+                "amount": row[2],
+                "price_usd": row[3],
+                "timestamp": _iso(row[4]),
+            }
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+def csv_chunk(rows: Iterable[Sequence]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows((*row[:4], _iso(row[4])) for row in rows)
+    return buffer.getvalue()
+
+
+def csv_header() -> str:
+    return ",".join(COLUMNS) + "\n"
+
+
+FORMATTERS = {"ndjson": ("", ndjson_chunk), "csv": (csv_header(), csv_chunk)}
+
+
+# One chunk per server-side cursor batch; the generators own their session
+# because the response body outlives the request's dependencies
+def export_sync(session_factory: Callable, fmt: str, **filters):
+    header, format_chunk = FORMATTERS[fmt]
+    db = session_factory()
+    try:
+        if header:
+            yield header
+        for rows in crud.iter_transaction_rows(db, **filters):
+            yield format_chunk(rows)
+    finally:
+        db.close()
+
+
+async def export_async(session_factory: Callable, fmt: str, **filters):
+    header, format_chunk = FORMATTERS[fmt]
+    async with session_factory() as db:
+        if header:
+            yield header
+        async for rows in async_crud.iter_transaction_rows(db, **filters):
+            yield format_chunk(rows)
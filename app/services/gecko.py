@@ -0,0 +1,149 @@
+import importlib.util
+import logging
+import os
+import time
+from typing import Optional
+
+import dotenv
+import httpx
+
+import app.services.metrics as metrics
+from app.services.resilience import ResilientCaller
+
+dotenv.load_dotenv()
+
+# Upstream settings
+GECKO_BASE_URL = os.getenv("GECKO_BASE_URL", "https://api.coingecko.com/api/v3")
+GECKO_HTTP2 = os.getenv("GECKO_HTTP2", "true").lower() == "true"
+
+# Connection pool / keep-alive
+GECKO_MAX_CONNECTIONS = int(os.getenv("GECKO_MAX_CONNECTIONS", "100"))
+GECKO_MAX_KEEPALIVE = int(os.getenv("GECKO_MAX_KEEPALIVE", "20"))
+GECKO_KEEPALIVE_EXPIRY = float(os.getenv("GECKO_KEEPALIVE_EXPIRY", "30"))
+
+# Per-phase timeouts (seconds)
+GECKO_CONNECT_TIMEOUT = float(os.getenv("GECKO_CONNECT_TIMEOUT", "3"))
+GECKO_READ_TIMEOUT = float(os.getenv("GECKO_READ_TIMEOUT", "5"))
+GECKO_WRITE_TIMEOUT = float(os.getenv("GECKO_WRITE_TIMEOUT", "5"))
+GECKO_POOL_TIMEOUT = float(os.getenv("GECKO_POOL_TIMEOUT", "2"))
+
+# Client-side rate limit (requests/second, halved on every 429); 0 only
+# honours Retry-After
+GECKO_RATE_LIMIT = float(os.getenv("GECKO_RATE_LIMIT", "10"))
+GECKO_RATE_BURST = int(os.getenv("GECKO_RATE_BURST", "10"))
+
+# Attempts per call for timeouts, connection errors, 429 and 5xx, with
+# full-jitter exponential backoff between them
+GECKO_MAX_ATTEMPTS = int(os.getenv("GECKO_MAX_ATTEMPTS", "3"))
+GECKO_BACKOFF_BASE = float(os.getenv("GECKO_BACKOFF_BASE", "0.2"))
+GECKO_BACKOFF_MAX = float(os.getenv("GECKO_BACKOFF_MAX", "5"))
+
+# Circuit breaker: open after this many consecutive failures, probe again
+# after the reset timeout (seconds)
+GECKO_BREAKER_THRESHOLD = int(os.getenv("GECKO_BREAKER_THRESHOLD", "5"))
+GECKO_BREAKER_RESET = float(os.getenv("GECKO_BREAKER_RESET", "30"))
+
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+REQUEST_SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_client: Optional[httpx.AsyncClient] = None
+
+# Per attempt, so retries show up individually
+request_seconds = metrics.histogram(
+    "gecko_request_duration_seconds",
+    "CoinGecko request latency by endpoint",
+    REQUEST_SECONDS_BUCKETS,
+    labels=("endpoint",),
+)
+# Outcome is the HTTP status, or the exception class when no response came back
+responses = metrics.counter(
+    "gecko_responses_total",
+    "CoinGecko responses by endpoint and outcome",
+    labels=("endpoint", "outcome"),
+)
+
+upstream = ResilientCaller(
+    "gecko",
+    rate=GECKO_RATE_LIMIT,
+    burst=GECKO_RATE_BURST,
+    max_attempts=GECKO_MAX_ATTEMPTS,
+    backoff_base=GECKO_BACKOFF_BASE,
+    backoff_max=GECKO_BACKOFF_MAX,
+    failure_threshold=GECKO_BREAKER_THRESHOLD,
+    reset_timeout=GECKO_BREAKER_RESET,
+)
+
+
+def build_client(
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=GECKO_MAX_CONNECTIONS,
+        max_keepalive_connections=GECKO_MAX_KEEPALIVE,
+        keepalive_expiry=GECKO_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=GECKO_CONNECT_TIMEOUT,
+        read=GECKO_READ_TIMEOUT,
+        write=GECKO_WRITE_TIMEOUT,
+        pool=GECKO_POOL_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        base_url=GECKO_BASE_URL,
+        limits=limits,
+        timeout=timeout,
+        http2=GECKO_HTTP2 and HTTP2_AVAILABLE,
+        transport=transport,
+    )
+
+
+# Lifespan hooks
+async def start_client(
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = build_client(transport)
+        logging.info(
+            f"Upstream client started for {GECKO_BASE_URL} "
+            f"(http2={GECKO_HTTP2 and HTTP2_AVAILABLE})"
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logging.info("Upstream client closed")
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        # Lifespan did not run (serverless runtime, bare ASGI transport)
+        _client = build_client()
+    return _client
+
+
+# CoinGecko calls, through the rate limiter, retries and circuit breaker
+async def fetch_simple_price(ids: str, vs_currencies: str = "usd") -> dict:
+    async def attempt():
+        start = time.perf_counter()
+        try:
+            response = await get_client().get(
+                "/simple/price", params={"ids": ids, "vs_currencies": vs_currencies}
+            )
+        except httpx.HTTPError as e:
+            responses.labels("simple/price", type(e).__name__).inc()
+            raise
+        finally:
+            request_seconds.labels("simple/price").observe(time.perf_counter() - start)
+        responses.labels("simple/price", str(response.status_code)).inc()
+        response.raise_for_status()
+        return response.json()
+
+    return await upstream.call(attempt)
@@ -0,0 +1,101 @@
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Tuple
+from pydantic import ValidationError
+from app.schemas.schemas import TransactionCreate
+
+
+# An NDJSON line that is not valid JSON
+class InvalidLine:
+    def __init__(self, error: str):
+        self.error = error
+
+
+async def iter_json_array(items: List[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    for index, item in enumerate(items):
+        yield index, item
+
+
+# Yields (index, parsed item) per non-empty NDJSON line of a byte stream
+async def iter_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    index = 0
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_line(buffer)
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidLine(str(e))
+
+
+# Validates a chunk; returns (rows to insert, [(index, errors)])
+def validate_chunk(items: List[Tuple[int, Any]]):
+    rows = []
+    errors = []
+    for index, item in items:
+        if isinstance(item, InvalidLine):
+            errors.append((index, [{"type": "json_invalid", "msg": item.error}]))
+            continue
+        try:
+            transaction = TransactionCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append(
+                (
+                    index,
+                    e.errors(
+                        include_url=False, include_context=False, include_input=False
+                    ),
+                )
+            )
+            continue
+        rows.append(transaction.model_dump())
+    return rows, errors
+
+
+# Validates and writes items chunk by chunk; one database transaction per chunk
+async def ingest(
+    items: AsyncIterator[Tuple[int, Any]],
+    insert_chunk: Callable[[List[dict]], Awaitable[List[int]]],
+    chunk_size: int = 1000,
+    report_errors: bool = False,
+) -> dict:
+    ids: List[int] = []
+    errors = []
+    rejected = 0
+
+    async def flush(chunk):
+        nonlocal rejected
+        rows, chunk_errors = validate_chunk(chunk)
+        rejected += len(chunk_errors)
+        if report_errors:
+            errors.extend(chunk_errors)
+        ids.extend(await insert_chunk(rows))
+
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+
+    return {
+        "inserted": len(ids),
+        "rejected": rejected,
+        "ids": ids,
+        "errors": (
+            [{"index": index, "errors": e} for index, e in errors]
+            if report_errors
+            else None
+        ),
+    }
@@ -0,0 +1,141 @@
+import logging
+import os
+import random
+from time import perf_counter_ns
+
+import anyio.to_thread
+import dotenv
+
+import app.services.metrics as metrics
+
+dotenv.load_dotenv()
+
+# Share of requests written to the access log (1 logs every request); 5xx and
+# slow requests are always logged
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+
+LATENCY_SECONDS_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+# Requests that matched no route share one label
+UNMATCHED = "unmatched"
+
+access_log = logging.getLogger("app.access")
+
+
+# Threadpool behind run_in_threadpool and sync endpoints (AnyIO's default
+# limiter); only reachable from the event loop
+def _thread_limiter():
+    try:
+        return anyio.to_thread.current_default_thread_limiter()
+    except Exception:
+        return None
+
+
+def _threadpool(read):
+    def collect():
+        limiter = _thread_limiter()
+        return read(limiter) if limiter is not None else None
+
+    return collect
+
+
+metrics.gauge(
+    "threadpool_capacity",
+    "Worker threads available to sync endpoints and run_in_threadpool",
+    _threadpool(lambda limiter: limiter.total_tokens),
+)
+metrics.gauge(
+    "threadpool_in_use",
+    "Worker threads busy",
+    _threadpool(lambda limiter: limiter.borrowed_tokens),
+)
+metrics.gauge(
+    "threadpool_waiting",
+    "Calls queued for a worker thread",
+    _threadpool(lambda limiter: limiter.statistics().tasks_waiting),
+)
+
+
+# Pure ASGI middleware: per-route latency histograms, status counts and an
+# in-flight gauge, without BaseHTTPMiddleware's extra task and body streaming
+class InstrumentationMiddleware:
+    def __init__(
+        self,
+        app,
+        sample_rate: float = ACCESS_LOG_SAMPLE_RATE,
+        slow_ms: float = ACCESS_LOG_SLOW_MS,
+        name: str = "http",
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ns = slow_ms * 1_000_000
+        self.latency = metrics.histogram(
+            f"{name}_request_duration_seconds",
+            "Request latency by route",
+            LATENCY_SECONDS_BUCKETS,
+            labels=("method", "route"),
+        )
+        self.responses = metrics.counter(
+            f"{name}_requests_total",
+            "Responses by route and status",
+            labels=("method", "route", "status"),
+        )
+        self.in_flight = metrics.gauge(
+            f"{name}_requests_in_flight", "Requests being processed"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter_ns()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = perf_counter_ns() - start
+            self.in_flight.dec()
+            # The router stores the matched route on the scope
+            route = scope.get("route")
+            route = route.path if route is not None else UNMATCHED
+            method = scope["method"]
+            self.latency.labels(method, route).observe(elapsed / 1e9)
+            self.responses.labels(method, route, str(status)).inc()
+            if access_log.isEnabledFor(logging.INFO) and (
+                status >= 500
+                or elapsed >= self.slow_ns
+                or random.random() < self.sample_rate
+            ):
+                access_log.info(
+                    "method=%s path=%s route=%s status=%d duration_ms=%.3f",
+                    method,
+                    scope["path"],
+                    route,
+                    status,
+                    elapsed / 1e6,
+                )
@@ -0,0 +1,202 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# In-process metrics registry: name -> metric
+_registry: Dict[str, Union["Counter", "Gauge", "Histogram", "Family"]] = {}
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def collect(self):
+        return self.value
+
+
+# With a label, fn returns {label value: value} and the gauge is a family
+class Gauge:
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        fn: Optional[Callable[[], Union[float, Dict[str, float]]]] = None,
+        label: Optional[str] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self.fn = fn
+        self.label = label
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def collect(self):
+        return self.fn() if self.fn is not None else self.value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def collect(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+# A labelled metric: one child per tuple of label values, created on first
+# use; callers keep label sets small (route templates, not raw paths)
+class Family:
+    def __init__(self, metric_class, name: str, documentation: str, labels, **kwargs):
+        self.kind = metric_class.kind
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.children: Dict[Tuple[str, ...], Union[Counter, Gauge, Histogram]] = {}
+        self._make = lambda: metric_class(name, documentation, **kwargs)
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._make()
+        return child
+
+    def collect(self):
+        return {
+            " ".join(values): child.collect()
+            for values, child in sorted(self.children.items())
+        }
+
+
+def _register(metric):
+    existing = _registry.get(metric.name)
+    if existing is not None:
+        if existing.kind != metric.kind:
+            raise ValueError(
+                f"Metric {metric.name} already registered as {existing.kind}"
+            )
+        return existing
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()):
+    if labels:
+        return _register(Family(Counter, name, documentation, labels))
+    return _register(Counter(name, documentation))
+
+
+def gauge(
+    name: str,
+    documentation: str,
+    fn: Optional[Callable[[], Union[float, Dict[str, float]]]] = None,
+    label: Optional[str] = None,
+) -> Gauge:
+    metric = _register(Gauge(name, documentation, fn, label))
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+
+def histogram(
+    name: str, documentation: str, buckets: Sequence[float], labels: Sequence[str] = ()
+):
+    if labels:
+        return _register(
+            Family(Histogram, name, documentation, labels, buckets=buckets)
+        )
+    return _register(Histogram(name, documentation, buckets))
+
+
+def snapshot() -> dict:
+    return {name: metric.collect() for name, metric in sorted(_registry.items())}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _label_value(value) -> str:
+    return _escape(str(value)).replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{_label_value(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def _samples(name: str, kind: str, value, names=(), values=()) -> List[str]:
+    if kind == "histogram":
+        lines = [
+            f"{name}_bucket{_labels(names + ('le',), values + (bound,))} {count}"
+            for bound, count in value["buckets"].items()
+        ]
+        lines.append(f"{name}_sum{_labels(names, values)} {_number(value['sum'])}")
+        lines.append(f"{name}_count{_labels(names, values)} {value['count']}")
+        return lines
+    if value is None:
+        return []
+    return [f"{name}{_labels(names, values)} {_number(value)}"]
+
+
+# Prometheus text exposition format (0.0.4)
+def render() -> str:
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        lines.append(f"# HELP {name} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        if isinstance(metric, Family):
+            for values, child in sorted(metric.children.items()):
+                lines.extend(
+                    _samples(
+                        name, metric.kind, child.collect(), metric.label_names, values
+                    )
+                )
+        elif isinstance(metric, Gauge) and metric.label is not None:
+            for value, sample in sorted(metric.collect().items()):
+                lines.extend(_samples(name, "gauge", sample, (metric.label,), (value,)))
+        else:
+            lines.extend(_samples(name, metric.kind, metric.collect()))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,24 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+# Opaque keyset cursor over (timestamp, id)
+Cursor = Tuple[datetime, int]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, transaction_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        timestamp, transaction_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(transaction_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
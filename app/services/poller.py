@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+import dotenv
+
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+import app.services.prices as prices
+
+dotenv.load_dotenv()
+
+# Coins kept warm in the price cache (comma separated); empty disables the poller
+PRICE_WATCHLIST = os.getenv("PRICE_WATCHLIST", "")
+PRICE_WATCHLIST_VS = os.getenv("PRICE_WATCHLIST_VS", "usd")
+# Seconds between polls; keep it below PRICE_CACHE_TTL so reads stay fresh
+PRICE_POLL_INTERVAL = float(os.getenv("PRICE_POLL_INTERVAL", "15"))
+# Coin ids per simple/price call
+PRICE_POLL_BATCH_SIZE = int(os.getenv("PRICE_POLL_BATCH_SIZE", "100"))
+# Share of the upstream rate limit the poller may use; the interval is
+# stretched when the watchlist needs more
+PRICE_POLL_RATE_SHARE = float(os.getenv("PRICE_POLL_RATE_SHARE", "0.5"))
+
+POLL_SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+# Refreshes a fixed watchlist of coins in batched simple/price calls on a
+# fixed cadence, through the same rate limiter and breaker as request traffic
+class PricePoller:
+    def __init__(
+        self,
+        watchlist: List[str],
+        vs_currencies: List[str],
+        interval: float = PRICE_POLL_INTERVAL,
+        batch_size: int = PRICE_POLL_BATCH_SIZE,
+        rate_share: float = PRICE_POLL_RATE_SHARE,
+        clock=time.monotonic,
+        name: str = "price_poll",
+    ):
+        self.watchlist = watchlist
+        self.vs_currencies = vs_currencies
+        self.interval = interval
+        self.batch_size = batch_size
+        self.rate_share = rate_share
+        self.clock = clock
+        # coin id -> clock time of its last polled price
+        self.observed: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.rounds = metrics.counter(f"{name}_rounds_total", "Watchlist polls")
+        self.errors = metrics.counter(
+            f"{name}_errors_total", "Failed simple/price calls while polling"
+        )
+        self.duration = metrics.histogram(
+            f"{name}_duration_seconds",
+            "Time to poll the whole watchlist",
+            POLL_SECONDS_BUCKETS,
+        )
+        metrics.gauge(
+            f"{name}_interval_seconds", "Effective poll interval", self.cadence
+        )
+        metrics.gauge(
+            f"{name}_staleness_seconds",
+            "Seconds since each watched coin was last refreshed",
+            self.staleness,
+            label="crypto_name",
+        )
+        metrics.gauge(
+            f"{name}_max_staleness_seconds",
+            "Staleness of the least recently refreshed watched coin",
+            lambda: max(self.staleness().values(), default=0.0),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def batches(self) -> List[List[str]]:
+        return [
+            self.watchlist[i : i + self.batch_size]
+            for i in range(0, len(self.watchlist), self.batch_size)
+        ]
+
+    # Poll interval after fitting the watchlist into its share of the rate limit
+    def cadence(self) -> float:
+        rate = gecko.upstream.limiter.max_rate * self.rate_share
+        if rate <= 0:
+            return self.interval
+        calls = math.ceil(len(self.watchlist) / self.batch_size)
+        return max(self.interval, calls / rate)
+
+    def staleness(self) -> Dict[str, float]:
+        now = self.clock()
+        return {
+            coin: round(now - self.observed[coin], 3)
+            for coin in self.watchlist
+            if coin in self.observed
+        }
+
+    # One pass over the watchlist; returns the number of coins refreshed
+    async def poll(self) -> int:
+        start = time.perf_counter()
+        refreshed = 0
+        for batch in self.batches():
+            try:
+                payload = await gecko.fetch_simple_price(
+                    ",".join(batch), ",".join(self.vs_currencies)
+                )
+            except Exception as e:
+                # Cached prices keep being served; the next poll retries
+                self.errors.inc()
+                logging.warning(f"Watchlist poll failed for {len(batch)} coins: {e}")
+                continue
+            now = self.clock()
+            for coin in batch:
+                quotes = payload.get(coin) or {}
+                for vs_currency in self.vs_currencies:
+                    await prices.observe(coin, vs_currency, quotes.get(vs_currency))
+                if quotes:
+                    self.observed[coin] = now
+                    refreshed += 1
+        self.rounds.inc()
+        self.duration.observe(time.perf_counter() - start)
+        return refreshed
+
+    async def _run(self):
+        while True:
+            started = self.clock()
+            await self.poll()
+            await asyncio.sleep(max(0.0, self.cadence() - (self.clock() - started)))
+
+    def start(self):
+        if self.watchlist and not self.running:
+            self._task = asyncio.create_task(self._run())
+            logging.info(
+                f"Polling {len(self.watchlist)} coins every {self.cadence():g}s"
+            )
+            if self.cadence() >= prices.price_cache.ttl:
+                logging.warning(
+                    "Poll interval is not below PRICE_CACHE_TTL; watched coins "
+                    "will expire between polls"
+                )
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+price_poller = PricePoller(
+    prices.split_csv(PRICE_WATCHLIST), prices.split_csv(PRICE_WATCHLIST_VS)
+)
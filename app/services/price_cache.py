@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import dotenv
+
+import app.services.metrics as metrics
+
+dotenv.load_dotenv()
+
+# Fresh for TTL seconds, then served stale for up to STALE_TTL more while refreshing
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "30"))
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "300"))
+PRICE_CACHE_MAX_ENTRIES = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "1024"))
+
+FRESH = "fresh"
+STALE = "stale"
+
+CacheKey = Tuple[str, str]  # (coin id, vs currency)
+
+
+@dataclass
+class CacheEntry:
+    price: Optional[float]
+    stored_at: float
+
+
+# TTL plus an LRU bound over entries that carry the clock reading they were
+# stored at. Reads and writes take a lock, so threadpool workers can share an
+# instance with the event loop
+class TTLCache:
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "cache",
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter(f"{name}_hits_total", "Cache hits")
+        self.misses = metrics.counter(f"{name}_misses_total", "Cache misses")
+        self.evictions = metrics.counter(
+            f"{name}_evictions_total", "Entries evicted by the LRU bound"
+        )
+        metrics.gauge(f"{name}_entries", "Entries in the cache", self.__len__)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def age(self, entry) -> float:
+        return max(0.0, self.clock() - entry.stored_at)
+
+    # The entry if it is at most max_age (default: the TTL) seconds old; older
+    # ones are dropped. Counts misses and leaves hits to the caller
+    def _lookup(self, key: Hashable, max_age: Optional[float] = None):
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.age(entry) > max_age:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.misses.inc()
+        return entry
+
+    def get(self, key: Hashable):
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits.inc()
+        return entry
+
+    # Callers hold the lock
+    def _store(self, key: Hashable, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions.inc()
+
+    def set(self, key: Hashable, entry):
+        with self._lock:
+            self._store(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Fresh entries are hits; for stale_ttl seconds past the TTL they are still
+# returned, marked STALE, so the caller can revalidate in the background
+class PriceCache(TTLCache):
+    def __init__(
+        self,
+        ttl: float = PRICE_CACHE_TTL,
+        stale_ttl: float = PRICE_CACHE_STALE_TTL,
+        max_entries: int = PRICE_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "price_cache",
+    ):
+        super().__init__(ttl, max_entries, clock, name)
+        self.stale_ttl = stale_ttl
+        self.stale_hits = metrics.counter(
+            f"{name}_stale_total", "Stale entries served while revalidating"
+        )
+
+    # Returns (entry, FRESH | STALE) or (None, None) on a miss
+    def get(self, key: CacheKey):
+        entry = self._lookup(key, self.ttl + self.stale_ttl)
+        if entry is None:
+            return None, None
+        if self.age(entry) <= self.ttl:
+            self.hits.inc()
+            return entry, FRESH
+        self.stale_hits.inc()
+        return entry, STALE
+
+    def set(
+        self, key: CacheKey, price: Optional[float], age: float = 0.0
+    ) -> CacheEntry:
+        return super().set(key, CacheEntry(price=price, stored_at=self.clock() - age))
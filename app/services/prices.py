@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+import dotenv
+import httpx
+
+import app.crud as crud
+import app.services.gecko as gecko
+from app.databases.db import SessionLocal
+from app.services.batcher import PriceBatcher
+from app.services.price_cache import FRESH, STALE, PriceCache
+from app.services.resilience import UpstreamUnavailable
+from app.services.singleflight import SingleFlight
+from app.services.writer import WriteBehindQueue, store_latest_prices
+
+dotenv.load_dotenv()
+
+# Snapshots younger than this (seconds) are served without going upstream;
+# useful when several processes share the table. 0 disables it
+LATEST_PRICE_MAX_AGE = float(os.getenv("LATEST_PRICE_MAX_AGE", "0"))
+# Serve the last snapshot when the upstream request fails
+LATEST_PRICE_FALLBACK = os.getenv("LATEST_PRICE_FALLBACK", "true").lower() == "true"
+# Load recent snapshots into the cache on start
+LATEST_PRICE_WARMUP = os.getenv("LATEST_PRICE_WARMUP", "true").lower() == "true"
+
+HIT = "hit"
+MISS = "miss"
+SNAPSHOT = "snapshot"
+
+# Where a served price came from
+LIVE = "live"
+CACHED = "cached"
+SOURCES = {HIT: CACHED, STALE: CACHED, MISS: LIVE, SNAPSHOT: SNAPSHOT}
+
+price_cache = PriceCache()
+price_flights = SingleFlight("price_fetch")
+price_batcher = PriceBatcher(
+    lambda ids, vs_currencies: gecko.fetch_simple_price(ids, vs_currencies)
+)
+# Observed USD prices are persisted as transactions off the request path
+price_writer = WriteBehindQueue()
+# Last observed price per (coin, vs), upserted off the request path
+snapshot_writer = WriteBehindQueue(
+    flush=store_latest_prices, name="latest_price_writes"
+)
+
+# Background revalidations in flight (strong refs keep the tasks alive)
+_refreshing: Set[tuple] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+# Comma-separated coin ids or currencies: trimmed, with empty items and
+# repeats dropped, in first-seen order
+def split_csv(value: str) -> List[str]:
+    return list(
+        dict.fromkeys(item.strip() for item in value.split(",") if item.strip())
+    )
+
+
+@dataclass
+class PriceResult:
+    crypto_name: str
+    vs_currency: str
+    price: Optional[float]
+    age: float
+    cache_status: str  # hit | stale | miss | snapshot
+
+    @property
+    def source(self) -> str:
+        return SOURCES[self.cache_status]
+
+
+# Caches an upstream observation and queues it for the snapshot table
+async def observe(crypto_name: str, vs_currency: str, price: Optional[float]):
+    price_cache.set((crypto_name, vs_currency), price)
+    if price is not None:
+        await snapshot_writer.put(
+            {
+                "crypto_name": crypto_name,
+                "vs_currency": vs_currency,
+                "price": price,
+                "observed_at": datetime.now(timezone.utc),
+            }
+        )
+
+
+async def _fetch_upstream(crypto_name: str, vs_currency: str) -> Optional[float]:
+    # Lookups arriving within the batching window share one simple/price call
+    price = await price_batcher.get(crypto_name, vs_currency)
+    # Record each upstream observation once, whoever is waiting on it
+    await observe(crypto_name, vs_currency, price)
+    if price is not None and vs_currency == "usd":
+        await price_writer.put(
+            {"crypto_name": crypto_name, "amount": 1.0, "price_usd": price}
+        )
+    return price
+
+
+def _load_snapshot(crypto_name: str, vs_currency: str):
+    db = SessionLocal()
+    try:
+        return crud.get_latest_price(db, crypto_name, vs_currency)
+    finally:
+        db.close()
+
+
+# The stored snapshot and its age in seconds, or (None, None)
+async def load_snapshot(crypto_name: str, vs_currency: str):
+    try:
+        snapshot = await asyncio.to_thread(_load_snapshot, crypto_name, vs_currency)
+    except Exception as e:
+        logging.warning(f"Snapshot lookup failed for {crypto_name}/{vs_currency}: {e}")
+        return None, None
+    if snapshot is None:
+        return None, None
+    age = (datetime.now(timezone.utc) - snapshot.observed_at).total_seconds()
+    return snapshot, max(0.0, age)
+
+
+# Concurrent fetches of the same (coin, vs) share one upstream request
+async def fetch_price(crypto_name: str, vs_currency: str = "usd") -> Optional[float]:
+    price, _ = await price_flights.do(
+        (crypto_name, vs_currency),
+        lambda: _fetch_upstream(crypto_name, vs_currency),
+    )
+    return price
+
+
+async def _revalidate(crypto_name: str, vs_currency: str):
+    key = (crypto_name, vs_currency)
+    try:
+        await fetch_price(crypto_name, vs_currency)
+    except Exception as e:
+        # Keep serving the stale value; the next stale read retries
+        logging.warning(
+            f"Background refresh failed for {crypto_name}/{vs_currency}: {e}"
+        )
+    finally:
+        _refreshing.discard(key)
+
+
+def _schedule_revalidation(crypto_name: str, vs_currency: str):
+    key = (crypto_name, vs_currency)
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+    task = asyncio.create_task(_revalidate(crypto_name, vs_currency))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def get_price(crypto_name: str, vs_currency: str = "usd") -> PriceResult:
+    entry, state = price_cache.get((crypto_name, vs_currency))
+
+    if state == FRESH:
+        return PriceResult(
+            crypto_name, vs_currency, entry.price, price_cache.age(entry), HIT
+        )
+
+    if state == STALE:
+        _schedule_revalidation(crypto_name, vs_currency)
+        return PriceResult(
+            crypto_name, vs_currency, entry.price, price_cache.age(entry), STALE
+        )
+
+    if LATEST_PRICE_MAX_AGE > 0:
+        snapshot, age = await load_snapshot(crypto_name, vs_currency)
+        if snapshot is not None and age <= LATEST_PRICE_MAX_AGE:
+            price_cache.set((crypto_name, vs_currency), snapshot.price, age=age)
+            return PriceResult(crypto_name, vs_currency, snapshot.price, age, SNAPSHOT)
+
+    try:
+        price = await fetch_price(crypto_name, vs_currency)
+    # Includes the open circuit: fail fast upstream, serve the snapshot here
+    except (httpx.HTTPError, UpstreamUnavailable) as e:
+        if not LATEST_PRICE_FALLBACK:
+            raise
+        snapshot, age = await load_snapshot(crypto_name, vs_currency)
+        if snapshot is None:
+            raise
+        logging.warning(
+            f"Upstream failed for {crypto_name}/{vs_currency} ({e!r}), "
+            f"serving snapshot from {int(age)}s ago"
+        )
+        return PriceResult(crypto_name, vs_currency, snapshot.price, age, SNAPSHOT)
+    return PriceResult(crypto_name, vs_currency, price, 0.0, MISS)
+
+
+# Bulk lookup: cached pairs are served from memory, all misses issued in the
+# same tick share one batched upstream call
+async def get_prices(
+    crypto_names: List[str], vs_currencies: List[str]
+) -> List[PriceResult]:
+    return await asyncio.gather(
+        *(
+            get_price(crypto_name, vs_currency)
+            for crypto_name in crypto_names
+            for vs_currency in vs_currencies
+        )
+    )
+
+
+# Cache-Control / Age headers for a served price
+def cache_headers(result: PriceResult) -> dict:
+    max_age = max(0, int(price_cache.ttl - result.age))
+    return {
+        "Cache-Control": (
+            f"public, max-age={max_age}, "
+            f"stale-while-revalidate={int(price_cache.stale_ttl)}"
+        ),
+        "Age": str(int(result.age)),
+        "X-Cache": result.cache_status.upper(),
+        "X-Price-Source": result.source,
+    }
+
+
+def _load_recent_snapshots(since: datetime):
+    db = SessionLocal()
+    try:
+        return crud.get_latest_prices(db, since)
+    finally:
+        db.close()
+
+
+# Fills the cache from snapshots still inside the fresh + stale window, so a
+# restart does not send every first request upstream
+async def warm_cache() -> int:
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(seconds=price_cache.ttl + price_cache.stale_ttl)
+    try:
+        snapshots = await asyncio.to_thread(_load_recent_snapshots, since)
+    except Exception as e:
+        logging.warning(f"Price cache warm-up failed: {e}")
+        return 0
+    for snapshot in snapshots:
+        age = max(0.0, (now - snapshot.observed_at).total_seconds())
+        price_cache.set(
+            (snapshot.crypto_name, snapshot.vs_currency), snapshot.price, age
+        )
+    logging.info(f"Price cache warmed with {len(snapshots)} snapshots")
+    return len(snapshots)
+
+
+def start():
+    price_writer.start()
+    snapshot_writer.start()
+
+
+async def shutdown():
+    for task in list(_tasks):
+        task.cancel()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    _refreshing.clear()
+    await price_batcher.close()
+    await price_writer.stop()
+    await snapshot_writer.stop()
@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+import app.services.metrics as metrics
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Upstream statuses worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+WAIT_SECONDS_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+# Raised without calling the upstream; retry_after is in seconds
+class UpstreamUnavailable(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"{name} circuit open, retry in {retry_after:.1f}s", retry_after
+        )
+
+
+class RateLimited(UpstreamUnavailable):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"{name} rate limited, retry in {retry_after:.1f}s", retry_after
+        )
+
+
+# Seconds from a Retry-After header (delta-seconds or HTTP date)
+def parse_retry_after(
+    value: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+# Token bucket whose rate halves on every 429 and creeps back up on success;
+# a rate of 0 only enforces Retry-After
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float = 0.1,
+        recovery: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self.clock = clock
+        self.configure(rate, burst)
+
+    def configure(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.burst = burst
+        self.reset()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def blocked_for(self) -> float:
+        return max(0.0, self.blocked_until - self.clock())
+
+    # Seconds the caller has to wait for its token (0 when one is available now)
+    def reserve(self) -> float:
+        wait = self.blocked_for()
+        if self.rate <= 0:
+            return wait
+        self._refill(self.clock())
+        self.tokens -= 1
+        if self.tokens < 0:
+            wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+    def throttled(self, retry_after: Optional[float] = None):
+        if self.max_rate > 0:
+            self.rate = max(min(self.min_rate, self.max_rate), self.rate / 2)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+    def reset(self):
+        self.rate = self.max_rate
+        self.tokens = float(self.burst)
+        self.updated = self.clock()
+        self.blocked_until = 0.0
+
+
+# Opens after failure_threshold consecutive failures, lets one probe through
+# after reset_timeout and closes again when it succeeds
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    # True when a call may go ahead (the probe in half-open state)
+    def allow(self) -> bool:
+        if self.state == OPEN and self.retry_after() == 0:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def succeeded(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    # The probe ended without an answer (cancelled); let the next call probe
+    def release(self):
+        self._probing = False
+
+    # Returns True when this failure opened the circuit
+    def failed(self) -> bool:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            opened = self.state != OPEN
+            self.state = OPEN
+            self.opened_at = self.clock()
+            return opened
+        return False
+
+    def reset(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+
+# Rate limiting, retries with full-jitter exponential backoff and a circuit
+# breaker around one upstream
+class ResilientCaller:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.name = name
+        self.limiter = AdaptiveRateLimiter(rate, burst, clock=clock)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock=clock)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+
+        self.calls = metrics.counter(f"{name}_calls_total", "Upstream calls")
+        self.attempts = metrics.counter(f"{name}_attempts_total", "Requests sent")
+        self.retries = metrics.counter(f"{name}_retries_total", "Retried attempts")
+        self.failures = metrics.counter(
+            f"{name}_failures_total", "Calls that failed after all attempts"
+        )
+        self.throttled = metrics.counter(
+            f"{name}_throttled_total", "429 responses from upstream"
+        )
+        self.short_circuited = metrics.counter(
+            f"{name}_short_circuited_total", "Calls rejected by the open circuit"
+        )
+        self.opened = metrics.counter(
+            f"{name}_circuit_opened_total", "Times the circuit opened"
+        )
+        self.limiter_wait = metrics.histogram(
+            f"{name}_limiter_wait_seconds",
+            "Time spent waiting for a rate limit token",
+            WAIT_SECONDS_BUCKETS,
+        )
+        metrics.gauge(
+            f"{name}_circuit_state",
+            "0 closed, 1 half-open, 2 open",
+            lambda: STATE_VALUES[self.breaker.state],
+        )
+        metrics.gauge(
+            f"{name}_rate_limit", "Current requests/second", lambda: self.limiter.rate
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls.inc()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.short_circuited.inc()
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+            # Set once the breaker has recorded this attempt's outcome
+            settled = False
+            try:
+                # Fail fast rather than hold the request through a long Retry-After
+                blocked = self.limiter.blocked_for()
+                if blocked > self.backoff_max:
+                    raise RateLimited(self.name, blocked)
+                wait = self.limiter.reserve()
+                self.limiter_wait.observe(wait)
+                if wait > 0:
+                    await self.sleep(wait)
+
+                self.attempts.inc()
+                try:
+                    result = await fn()
+                except Exception as e:
+                    settled = True
+                    delay = self._failed(e)
+                    attempt += 1
+                    if delay is None or attempt >= self.max_attempts:
+                        self.failures.inc()
+                        raise
+                    self.retries.inc()
+                    logging.warning(
+                        f"{self.name} attempt {attempt} failed ({e!r}), "
+                        f"retrying in {delay:.2f}s"
+                    )
+                    await self.sleep(delay)
+                    continue
+
+                settled = True
+                self.breaker.succeeded()
+                self.limiter.succeeded()
+                return result
+            finally:
+                # Turned away by the limiter or cancelled (also while waiting
+                # for a token) before an answer: a half-open probe must not
+                # stay claimed, or the circuit never closes again
+                if not settled:
+                    self.breaker.release()
+
+    # Records a failed attempt; returns the delay before a retry, or None when
+    # the error is not worth retrying
+    def _failed(self, error: Exception) -> Optional[float]:
+        if not is_transient(error):
+            # The upstream answered; it is healthy even if the request was bad
+            self.breaker.succeeded()
+            return None
+
+        retry_after = None
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = parse_retry_after(error.response.headers.get("Retry-After"))
+            if error.response.status_code == 429:
+                # Throttling is handled by the limiter; the upstream itself is up
+                self.throttled.inc()
+                self.breaker.succeeded()
+                self.limiter.throttled(retry_after)
+                if retry_after is None:
+                    return self.backoff(0)
+                # The limiter holds the retry until Retry-After has passed
+                return 0.0 if retry_after <= self.backoff_max else None
+
+        if self.breaker.failed():
+            self.opened.inc()
+            logging.error(
+                f"{self.name} circuit opened after {self.breaker.failures} failures"
+            )
+        if self.breaker.state == OPEN:
+            return None
+        delay = self.backoff(self.breaker.failures - 1)
+        return delay if retry_after is None else max(delay, retry_after)
+
+    def describe(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retry_after": (
+                round(self.breaker.retry_after(), 3)
+                if self.breaker.state == OPEN
+                else None
+            ),
+            "rate_limit": self.limiter.rate,
+            "max_rate_limit": self.limiter.max_rate,
+            "rate_limited_for": round(self.limiter.blocked_for(), 3),
+        }
+
+    def reset(self):
+        self.breaker.reset()
+        self.limiter.reset()
@@ -0,0 +1,308 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import (
+    Float,
+    and_,
+    case,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
+from app.models.model import PriceRollup, Transaction
+
+# Bucket widths, truncated in UTC
+RESOLUTIONS = ("minute", "hour", "day")
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    if resolution == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+
+# Folds inserted transaction rows into one candle per (coin, resolution, bucket)
+def aggregate(rows: Iterable) -> List[dict]:
+    candles: Dict[tuple, dict] = {}
+    # Rows written together usually share one server timestamp
+    buckets: Dict[datetime, tuple] = {}
+    # Plain tuples: Row attribute access dominates otherwise
+    trades = sorted(
+        (row.timestamp, row.id, row.crypto_name, row.amount, row.price_usd)
+        for row in rows
+    )
+    for timestamp, _, crypto_name, amount, price in trades:
+        starts = buckets.get(timestamp)
+        if starts is None:
+            starts = buckets[timestamp] = tuple(
+                bucket_start(timestamp, resolution) for resolution in RESOLUTIONS
+            )
+        for resolution, start in zip(RESOLUTIONS, starts):
+            key = (crypto_name, resolution, start)
+            candle = candles.get(key)
+            if candle is None:
+                candles[key] = {
+                    "crypto_name": crypto_name,
+                    "resolution": resolution,
+                    "bucket": start,
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "volume": amount,
+                    "count": 1,
+                    "first_at": timestamp,
+                    "last_at": timestamp,
+                }
+                continue
+            if price > candle["high"]:
+                candle["high"] = price
+            if price < candle["low"]:
+                candle["low"] = price
+            candle["close"] = price
+            candle["volume"] += amount
+            candle["count"] += 1
+            candle["last_at"] = timestamp
+    # Sorted by key so concurrent upserts lock rows in the same order
+    return [candles[key] for key in sorted(candles)]
+
+
+# Namespace (first key of the two-key advisory lock form) for rollup writes,
+# so they cannot collide with other advisory lock users: "roll" in ASCII
+ROLLUP_LOCK_CLASS = 0x726F6C6C
+
+
+# Per-coin transaction-level advisory locks: incremental upserts share them,
+# rebuilds take them exclusively. A rebuild's delete cannot see candles that
+# concurrent writers insert, so without them two rebuilds (or a rebuild and
+# a first insert into a bucket) race on the rollups primary key. The select
+# list is evaluated left to right, so sorted names keep the lock order stable
+def lock(crypto_names: Iterable[str], exclusive: bool = False):
+    acquire = (
+        func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    )
+    return select(
+        *(
+            acquire(ROLLUP_LOCK_CLASS, func.hashtext(name))
+            for name in sorted(set(crypto_names))
+        )
+    )
+
+
+# Merges candles into the stored ones (INSERT ... ON CONFLICT DO UPDATE);
+# executed with the candles as executemany parameters
+def upsert():
+    stmt = insert(PriceRollup)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            PriceRollup.crypto_name,
+            PriceRollup.resolution,
+            PriceRollup.bucket,
+        ],
+        set_={
+            "open": case(
+                (new.first_at < PriceRollup.first_at, new.open),
+                else_=PriceRollup.open,
+            ),
+            "close": case(
+                (new.last_at >= PriceRollup.last_at, new.close),
+                else_=PriceRollup.close,
+            ),
+            "high": func.greatest(PriceRollup.high, new.high),
+            "low": func.least(PriceRollup.low, new.low),
+            "volume": PriceRollup.volume + new.volume,
+            "count": PriceRollup.count + new.count,
+            "first_at": func.least(PriceRollup.first_at, new.first_at),
+            "last_at": func.greatest(PriceRollup.last_at, new.last_at),
+        },
+    )
+
+
+# Bucket widths, and the resolution each one is merged from on rebuilds
+WIDTHS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+CHILDREN = {"hour": "minute", "day": "hour"}
+
+CANDLE_COLUMNS = [
+    "crypto_name",
+    "resolution",
+    "bucket",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "count",
+    "first_at",
+    "last_at",
+]
+
+
+def _first(column, *order):
+    return func.array_agg(aggregate_order_by(column, *order), type_=ARRAY(Float))[1]
+
+
+def _raw_candles(resolution: str, *conditions):
+    bucket = func.date_trunc(resolution, Transaction.timestamp, "UTC")
+    return (
+        select(
+            Transaction.crypto_name,
+            literal(resolution),
+            bucket,
+            _first(Transaction.price_usd, Transaction.timestamp, Transaction.id),
+            func.max(Transaction.price_usd),
+            func.min(Transaction.price_usd),
+            _first(
+                Transaction.price_usd,
+                Transaction.timestamp.desc(),
+                Transaction.id.desc(),
+            ),
+            func.sum(Transaction.amount),
+            func.count(),
+            func.min(Transaction.timestamp),
+            func.max(Transaction.timestamp),
+        )
+        .where(*conditions)
+        .group_by(Transaction.crypto_name, bucket)
+    )
+
+
+# Candles recomputed from the raw rows of [start, end) for the given coins
+def candles_query(crypto_names: List[str], start: datetime, end: datetime):
+    return union_all(
+        *(
+            _raw_candles(
+                resolution,
+                Transaction.crypto_name.in_(crypto_names),
+                Transaction.timestamp >= start,
+                Transaction.timestamp < end,
+            )
+            for resolution in RESOLUTIONS
+        )
+    )
+
+
+# (coin, bucket start) pairs at `resolution` covering the given trades
+def _spans(crypto_names, timestamps, resolution: str):
+    return sorted(
+        {
+            (name, bucket_start(ts, resolution))
+            for name in crypto_names
+            for ts in timestamps
+        }
+    )
+
+
+# Candles of the given buckets merged from their stored child candles: the
+# open of the earliest, the close of the latest, extremes and sums of the rest
+def _merged_candles(resolution: str, spans):
+    child = CHILDREN[resolution]
+    bucket = func.date_trunc(resolution, PriceRollup.bucket, "UTC")
+    return (
+        select(
+            PriceRollup.crypto_name,
+            literal(resolution),
+            bucket,
+            _first(PriceRollup.open, PriceRollup.first_at),
+            func.max(PriceRollup.high),
+            func.min(PriceRollup.low),
+            _first(PriceRollup.close, PriceRollup.last_at.desc()),
+            func.sum(PriceRollup.volume),
+            func.sum(PriceRollup.count),
+            func.min(PriceRollup.first_at),
+            func.max(PriceRollup.last_at),
+        )
+        .where(
+            PriceRollup.resolution == child,
+            or_(
+                *(
+                    and_(
+                        PriceRollup.crypto_name == name,
+                        PriceRollup.bucket >= start,
+                        PriceRollup.bucket < start + WIDTHS[resolution],
+                    )
+                    for name, start in spans
+                )
+            ),
+        )
+        .group_by(PriceRollup.crypto_name, bucket)
+    )
+
+
+# Statements replacing the stored candles that contain the given trades;
+# used after updates and deletes, which cannot be folded in incrementally
+# (a high or low cannot be taken back). Only the touched buckets are
+# rebuilt: each minute from its raw rows, then its hour from the stored
+# minutes and its day from the stored hours, so no statement reads more
+# than one minute of transactions or 60 candles per bucket
+def rebuild(crypto_names: Iterable[str], timestamps: Iterable[datetime]):
+    crypto_names = sorted(set(crypto_names))
+    timestamps = list(timestamps)
+    spans = {
+        resolution: _spans(crypto_names, timestamps, resolution)
+        for resolution in RESOLUTIONS
+    }
+    touched = [
+        (name, resolution, start)
+        for resolution in RESOLUTIONS
+        for name, start in spans[resolution]
+    ]
+    minutes = or_(
+        *(
+            and_(
+                Transaction.crypto_name == name,
+                Transaction.timestamp >= start,
+                Transaction.timestamp < start + WIDTHS["minute"],
+            )
+            for name, start in spans["minute"]
+        )
+    )
+    return [
+        lock(crypto_names, exclusive=True),
+        delete(PriceRollup).where(
+            tuple_(
+                PriceRollup.crypto_name, PriceRollup.resolution, PriceRollup.bucket
+            ).in_(touched)
+        ),
+        insert(PriceRollup).from_select(
+            CANDLE_COLUMNS, _raw_candles("minute", minutes)
+        ),
+        insert(PriceRollup).from_select(
+            CANDLE_COLUMNS, _merged_candles("hour", spans["hour"])
+        ),
+        insert(PriceRollup).from_select(
+            CANDLE_COLUMNS, _merged_candles("day", spans["day"])
+        ),
+    ]
+
+
+# Stored candles for one coin, oldest first
+def rollups_query(
+    crypto_name: str,
+    resolution: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 500,
+):
+    query = select(PriceRollup).where(
+        PriceRollup.crypto_name == crypto_name,
+        PriceRollup.resolution == resolution,
+    )
+    if start is not None:
+        query = query.where(PriceRollup.bucket >= start)
+    if end is not None:
+        query = query.where(PriceRollup.bucket < end)
+    return query.order_by(PriceRollup.bucket).limit(limit)
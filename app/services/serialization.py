@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+from typing import Sequence
+import orjson
+from fastapi.responses import Response
+from app.schemas.schemas import TransactionResponse
+
+# Fields of a transaction row, in app.crud.COLUMNS order
+FIELDS = ("id", "crypto_name", "amount", "price_usd", "timestamp")
+
+# json.dumps writes floats outside [1e-4, 1e16) in exponent notation, orjson
+# only further out; rows holding such values take the json.dumps path
+FLOAT_MIN = 1e-4
+FLOAT_MAX = 1e16
+
+
+def _plain_float(value) -> bool:
+    return value.__class__ is float and (
+        value == 0 or FLOAT_MIN <= abs(value) < FLOAT_MAX
+    )
+
+
+# Rows straight from our own table already have the response types, so they
+# skip model validation and are encoded by orjson (datetimes included)
+def _fast(row: Sequence) -> bool:
+    return (
+        row[0].__class__ is int
+        and row[1].__class__ is str
+        and _plain_float(row[2])
+        and _plain_float(row[3])
+        and row[4].__class__ is datetime
+    )
+
+
+# Anything else goes through TransactionResponse and JSONResponse's encoder,
+# exactly as response_model would
+def _validated(row: Sequence) -> dict:
+    return TransactionResponse.model_validate(dict(zip(FIELDS, row))).model_dump(
+        mode="json"
+    )
+
+
+def _dumps(content) -> bytes:
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_transaction(row: Sequence) -> bytes:
+    if _fast(row):
+        return orjson.dumps(dict(zip(FIELDS, row)))
+    return _dumps(_validated(row))
+
+
+def encode_transactions(rows: Sequence[Sequence]) -> bytes:
+    if all(_fast(row) for row in rows):
+        return orjson.dumps([dict(zip(FIELDS, row)) for row in rows])
+    return _dumps([_validated(row) for row in rows])
+
+
+# Byte-for-byte the body response_model=TransactionResponse produces
+class TransactionJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return encode_transaction(content)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import app.services.metrics as metrics
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+# Concurrent callers with the same key share one in-flight call
+class SingleFlight:
+    def __init__(self, name: str = "singleflight"):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = metrics.counter(
+            f"{name}_leaders_total", "Calls that started an upstream request"
+        )
+        self.shared = metrics.counter(
+            f"{name}_shared_total", "Calls that joined an in-flight request"
+        )
+        metrics.gauge(
+            f"{name}_in_flight", "Keys with a request in flight", self.__len__
+        )
+
+    def __len__(self):
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    # Returns (result, shared); failures are raised to every waiter
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            # The call runs in its own task so one waiter's cancellation
+            # or timeout does not abort it for everyone else
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders.inc()
+        else:
+            self.shared.inc()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.task.done():
+                self._forget(key, call)
+            elif call.waiters == 0:
+                # Nobody is left waiting: stop the upstream work
+                call.task.cancel()
+                self._forget(key, call)
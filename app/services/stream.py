@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import dotenv
+
+import app.services.metrics as metrics
+import app.services.prices as prices
+
+dotenv.load_dotenv()
+
+# Seconds between price checks for the subscribed coins
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", "2"))
+# Updates buffered per subscriber; the oldest are dropped when a client lags
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "100"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+# Seconds between SSE keep-alive comments on a quiet stream
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15"))
+
+TICK_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+Key = Tuple[str, str]  # (coin id, vs currency)
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+# One client's bounded buffer of encoded updates
+class Subscriber:
+    def __init__(self, keys: Set[Key], buffer_size: int):
+        self.keys = keys
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, message: str) -> bool:
+        dropped = len(self.buffer) == self.buffer.maxlen
+        if dropped:
+            self.dropped += 1
+        self.buffer.append(message)
+        self._ready.set()
+        return dropped
+
+    # Next update, or None when nothing arrived within timeout seconds
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        while not self.buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.buffer.popleft()
+
+
+# A single loop reads the subscribed prices on a fixed cadence and fans each
+# change out to every subscriber of that coin; the update is encoded once
+class PriceBroadcaster:
+    def __init__(
+        self,
+        interval: float = STREAM_INTERVAL,
+        buffer_size: int = STREAM_BUFFER_SIZE,
+        max_subscribers: int = STREAM_MAX_SUBSCRIBERS,
+        name: str = "stream",
+    ):
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscriber] = set()
+        # (coin, vs) -> subscribers watching it
+        self._by_key: Dict[Key, Set[Subscriber]] = {}
+        # (coin, vs) -> (price, last encoded update)
+        self._last: Dict[Key, Tuple[Optional[float], str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.gauge(f"{name}_subscribers", "Connected subscribers", self.__len__)
+        metrics.gauge(
+            f"{name}_keys",
+            "Distinct (coin, vs) pairs watched",
+            lambda: len(self._by_key),
+        )
+        self.sent = metrics.counter(
+            f"{name}_updates_total", "Updates queued to subscribers"
+        )
+        self.dropped = metrics.counter(
+            f"{name}_dropped_total", "Updates dropped from full subscriber buffers"
+        )
+        self.tick_seconds = metrics.histogram(
+            f"{name}_tick_seconds",
+            "Time to check and fan out one tick",
+            TICK_SECONDS_BUCKETS,
+        )
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def subscribe(self, keys: Iterable[Key]) -> Subscriber:
+        if len(self.subscribers) >= self.max_subscribers:
+            raise TooManySubscribers(f"At most {self.max_subscribers} subscribers")
+        subscriber = Subscriber(set(), self.buffer_size)
+        self.subscribers.add(subscriber)
+        self.add_keys(subscriber, keys)
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+
+    def add_keys(self, subscriber: Subscriber, keys: Iterable[Key]):
+        for key in keys:
+            if key in subscriber.keys:
+                continue
+            subscriber.keys.add(key)
+            self._by_key.setdefault(key, set()).add(subscriber)
+            # Start from the last known price instead of waiting for a change
+            last = self._last.get(key)
+            if last is not None:
+                subscriber.push(last[1])
+
+    def remove_keys(self, subscriber: Subscriber, keys: Iterable[Key]):
+        for key in keys:
+            subscriber.keys.discard(key)
+            watchers = self._by_key.get(key)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self._by_key[key]
+                    self._last.pop(key, None)
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.remove_keys(subscriber, list(subscriber.keys))
+        self.subscribers.discard(subscriber)
+        # Nobody is listening: stop polling until the next subscriber
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, key: Key, price: Optional[float], source: str) -> int:
+        last = self._last.get(key)
+        if last is not None and last[0] == price:
+            return 0
+        message = json.dumps(
+            {
+                "crypto_name": key[0],
+                "vs_currency": key[1],
+                "price": price,
+                "source": source,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+        )
+        self._last[key] = (price, message)
+        watchers = self._by_key.get(key, ())
+        dropped = sum(subscriber.push(message) for subscriber in watchers)
+        self.sent.inc(len(watchers))
+        self.dropped.inc(dropped)
+        return len(watchers)
+
+    # Reads every watched price (through the cache, batcher and breaker) and
+    # publishes the ones that changed
+    async def tick(self):
+        start = time.perf_counter()
+        keys = list(self._by_key)
+        results = await asyncio.gather(
+            *(prices.get_price(coin, vs) for coin, vs in keys),
+            return_exceptions=True,
+        )
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Stream update failed for {key[0]}/{key[1]}: {result}")
+                continue
+            if key in self._by_key:
+                self.publish(key, result.price, result.source)
+        self.tick_seconds.observe(time.perf_counter() - start)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self.subscribers:
+            started = loop.time()
+            try:
+                await self.tick()
+            except Exception as e:
+                logging.error(f"Stream tick failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+broadcaster = PriceBroadcaster()
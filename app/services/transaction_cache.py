@@ -0,0 +1,76 @@
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Sequence
+
+import dotenv
+
+import app.services.metrics as metrics
+from app.services.conditional import entity_tag
+from app.services.price_cache import TTLCache
+from app.services.serialization import encode_transaction
+
+dotenv.load_dotenv()
+
+# Encoded single-transaction reads. Updates and deletes in this process
+# invalidate their entry; the TTL bounds staleness from writes made by other
+# processes. A TTL of 0 disables the cache
+TRANSACTION_CACHE_TTL = float(os.getenv("TRANSACTION_CACHE_TTL", "5"))
+TRANSACTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSACTION_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass
+class CachedTransaction:
+    body: bytes
+    etag: str
+    last_modified: datetime
+    stored_at: float
+
+
+class TransactionCache(TTLCache):
+    def __init__(
+        self,
+        ttl: float = TRANSACTION_CACHE_TTL,
+        max_entries: int = TRANSACTION_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "transaction_cache",
+    ):
+        super().__init__(ttl, max_entries, clock, name)
+        # Change counter: bumped by every invalidation, so a read that started
+        # before a write cannot store what it read
+        self.version = 0
+        self.invalidations = metrics.counter(
+            f"{name}_invalidations_total", "Entries dropped by updates and deletes"
+        )
+
+    # Encodes `row` (read when the counter was at `version`) and keeps it
+    # unless a write happened in between
+    def put(self, transaction_id: int, row: Sequence, version: int):
+        body = encode_transaction(row)
+        entry = CachedTransaction(
+            body=body,
+            etag=entity_tag(body),
+            last_modified=row.updated_at or row.timestamp,
+            stored_at=self.clock(),
+        )
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return entry
+        with self._lock:
+            if version == self.version:
+                self._store(transaction_id, entry)
+        return entry
+
+    def invalidate(self, transaction_id: int):
+        with self._lock:
+            self.version += 1
+            if self._entries.pop(transaction_id, None) is not None:
+                self.invalidations.inc()
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+transaction_cache = TransactionCache()
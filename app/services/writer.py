@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Callable, List, Optional
+
+import dotenv
+
+import app.crud as crud
+import app.services.metrics as metrics
+from app.databases.db import SessionLocal
+
+dotenv.load_dotenv()
+
+# Queue bound, flush thresholds (rows / seconds) and what to do when full
+WRITE_QUEUE_MAX_SIZE = int(os.getenv("WRITE_QUEUE_MAX_SIZE", "10000"))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "1.0"))
+WRITE_BACKPRESSURE = os.getenv("WRITE_BACKPRESSURE", "drop").lower()
+WRITE_SAMPLE_RATE = float(os.getenv("WRITE_SAMPLE_RATE", "0.1"))
+
+DROP = "drop"  # discard new rows while the queue is full
+BLOCK = "block"  # make producers wait for space
+SAMPLE = "sample"  # above half capacity keep only WRITE_SAMPLE_RATE of new rows
+POLICIES = (DROP, BLOCK, SAMPLE)
+
+FLUSH_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def insert_transactions(rows: List[dict]):
+    db = SessionLocal()
+    try:
+        crud.create_transactions(db, rows)
+    finally:
+        db.close()
+
+
+def store_latest_prices(rows: List[dict]):
+    db = SessionLocal()
+    try:
+        crud.upsert_latest_prices(db, rows)
+    finally:
+        db.close()
+
+
+# Buffers rows in memory and writes them in batches from a background worker
+class WriteBehindQueue:
+    def __init__(
+        self,
+        flush: Callable[[List[dict]], None] = insert_transactions,
+        max_size: int = WRITE_QUEUE_MAX_SIZE,
+        batch_size: int = WRITE_BATCH_SIZE,
+        flush_interval: float = WRITE_FLUSH_INTERVAL,
+        policy: str = WRITE_BACKPRESSURE,
+        sample_rate: float = WRITE_SAMPLE_RATE,
+        name: str = "price_writes",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}")
+        self.flush = flush
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[dict] = []
+        self._inflight: Optional[asyncio.Future] = None
+
+        metrics.gauge(f"{name}_queue_depth", "Rows waiting to be written", self.depth)
+        metrics.gauge(f"{name}_queue_capacity", "Queue bound", lambda: self.max_size)
+        self.flush_seconds = metrics.histogram(
+            f"{name}_flush_seconds", "Batch write latency", FLUSH_SECONDS_BUCKETS
+        )
+        self.written = metrics.counter(f"{name}_written_total", "Rows written")
+        self.dropped = metrics.counter(
+            f"{name}_dropped_total", "Rows dropped because the queue was full"
+        )
+        self.sampled_out = metrics.counter(
+            f"{name}_sampled_out_total", "Rows skipped by the sample policy"
+        )
+        self.errors = metrics.counter(f"{name}_flush_errors_total", "Failed flushes")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def depth(self) -> int:
+        return len(self._batch) + (self._queue.qsize() if self._queue else 0)
+
+    def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        # Graceful shutdown: finish the in-flight write, then drain the queue
+        if self._inflight is not None:
+            await self._inflight
+        while not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+            if len(self._batch) >= self.batch_size:
+                await self._flush_pending()
+        if self._batch:
+            await self._flush_pending()
+        self._queue = None
+
+    # Returns False when the row was not accepted
+    async def put(self, row: dict) -> bool:
+        if not self.running:
+            # No worker (lifespan did not run): write through
+            await self._flush_batch([row])
+            return True
+
+        if self.policy == BLOCK:
+            await self._queue.put(row)
+            return True
+
+        if (
+            self.policy == SAMPLE
+            and self._queue.qsize() >= self.max_size // 2
+            and random.random() >= self.sample_rate
+        ):
+            self.sampled_out.inc()
+            return False
+
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped.inc()
+            return False
+        return True
+
+    async def _flush_batch(self, batch: List[dict]):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.flush, batch)
+        except Exception as e:
+            self.errors.inc()
+            logging.error(f"Failed to write {len(batch)} rows: {e}")
+            return
+        self.flush_seconds.observe(time.perf_counter() - start)
+        self.written.inc(len(batch))
+
+    # Flush the current batch; shielded so shutdown never aborts a write midway
+    async def _flush_pending(self):
+        batch, self._batch = self._batch, []
+        self._inflight = asyncio.ensure_future(self._flush_batch(batch))
+        await asyncio.shield(self._inflight)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._batch) < self.batch_size:
+                try:
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            await self._flush_pending()
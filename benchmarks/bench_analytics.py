@@ -0,0 +1,139 @@
+# Analytics latency over growing data sizes: binary COPY + NumPy vs pulling
+# Transaction rows through the ORM. Runs against the database configured by
+# the POSTGRES_* variables.
+#
+#   python -m benchmarks.bench_analytics --sizes 10000,100000,1000000 --reset-db
+import argparse
+import io
+import json
+import logging
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import select
+import app.services.analytics as analytics
+from app.databases.db import Base, SessionLocal, engine
+from app.models.model import Transaction
+from benchmarks.common import add_reset_db_argument, require_reset_db
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+# Bulk load through COPY; one trade per second
+def seed(rows: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 1e-4, rows)))
+    amounts = rng.uniform(0.01, 5, rows)
+    buffer = io.StringIO()
+    for i, (price, amount) in enumerate(zip(prices.tolist(), amounts.tolist())):
+        ts = (START + timedelta(seconds=i)).isoformat()
+        buffer.write(f"bitcoin\t{amount}\t{price}\t{ts}\n")
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_from(
+                buffer,
+                "transactions",
+                columns=("crypto_name", "amount", "price_usd", "timestamp"),
+            )
+            cursor.execute("ANALYZE transactions")
+        connection.commit()
+    finally:
+        connection.close()
+    return START + timedelta(seconds=rows)
+
+
+def orm_stats(end: datetime, interval: float, window: int):
+    db = SessionLocal()
+    try:
+        rows = db.scalars(
+            select(Transaction)
+            .where(
+                Transaction.crypto_name == "bitcoin",
+                Transaction.timestamp >= START,
+                Transaction.timestamp < end,
+            )
+            .order_by(Transaction.timestamp, Transaction.id)
+        ).all()
+    finally:
+        db.close()
+    timestamps = np.array([r.timestamp.timestamp() for r in rows])
+    prices = np.array([r.price_usd for r in rows])
+    amounts = np.array([r.amount for r in rows])
+    return analytics.compute(
+        timestamps,
+        prices,
+        amounts,
+        START.timestamp(),
+        interval,
+        window,
+        list(analytics.DEFAULT_PERCENTILES),
+    )
+
+
+def timed(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def main(args):
+    require_reset_db(args)
+    logging.disable(logging.INFO)
+    results = {}
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            end = seed(size)
+            percentiles = list(analytics.DEFAULT_PERCENTILES)
+            arrays = analytics.fetch_arrays("bitcoin", START, end)
+            result = {
+                "fetch_ms": timed(
+                    lambda: analytics.fetch_arrays("bitcoin", START, end),
+                    args.repeats,
+                ),
+                "compute_ms": timed(
+                    lambda: analytics.compute(
+                        *arrays,
+                        START.timestamp(),
+                        args.interval,
+                        args.window,
+                        percentiles,
+                    ),
+                    args.repeats,
+                ),
+                "total_ms": timed(
+                    lambda: analytics.window_stats(
+                        "bitcoin", START, end, args.interval, args.window, percentiles
+                    ),
+                    args.repeats,
+                ),
+            }
+            if size <= args.orm_max:
+                result["orm_ms"] = timed(
+                    lambda: orm_stats(end, args.interval, args.window), args.repeats
+                )
+            results[size] = result
+            print(size, result, flush=True)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--orm-max", type=int, default=100000, help="largest size for the ORM baseline"
+    )
+    add_reset_db_argument(parser)
+    main(parser.parse_args())
@@ -0,0 +1,107 @@
+# Ingest throughput: one POST /transactions/ per row vs POST /transactions/bulk
+# with a JSON array and an NDJSON stream. Runs against the database configured
+# by the POSTGRES_* variables.
+#
+#   python -m benchmarks.bench_bulk_ingest --rows 20000 --chunk-size 1000 --reset-db
+import argparse
+import asyncio
+import json
+import logging
+import time
+import httpx
+from httpx import ASGITransport
+import app.main as main
+from app.databases.db import Base, engine
+from benchmarks.common import add_reset_db_argument, require_reset_db
+
+
+def make_rows(count: int):
+    return [
+        {"crypto_name": f"coin{i % 50}", "amount": 1.0, "price_usd": float(i)}
+        for i in range(count)
+    ]
+
+
+async def single_rows(client, rows, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(row):
+        async with semaphore:
+            response = await client.post("/transactions/", json=row)
+            response.raise_for_status()
+
+    await asyncio.gather(*(one(row) for row in rows))
+
+
+async def bulk_json(client, rows, chunk_size: int):
+    response = await client.post(
+        "/transactions/bulk", params={"chunk_size": chunk_size}, json=rows
+    )
+    response.raise_for_status()
+
+
+async def bulk_ndjson(client, rows, chunk_size: int):
+    # Sent in blocks of lines, as a client writing to a socket would
+    async def body():
+        for i in range(0, len(rows), 500):
+            yield "".join(json.dumps(row) + "\n" for row in rows[i : i + 500]).encode()
+
+    response = await client.post(
+        "/transactions/bulk",
+        params={"chunk_size": chunk_size},
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response.raise_for_status()
+
+
+async def measure(client, label, fn, *args):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    await fn(client, *args)
+    elapsed = time.perf_counter() - started
+    rows = len(args[0])
+    return label, {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1),
+    }
+
+
+async def main_async(args):
+    require_reset_db(args)
+    # Request logging would dominate the single-row path; measure the writes
+    logging.disable(logging.INFO)
+    results = {}
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=main.app), base_url="http://bench", timeout=None
+        ) as client:
+            for label, fn, *fn_args in (
+                (
+                    "single_row",
+                    single_rows,
+                    make_rows(args.single_rows),
+                    args.concurrency,
+                ),
+                ("bulk_json", bulk_json, make_rows(args.rows), args.chunk_size),
+                ("bulk_ndjson", bulk_ndjson, make_rows(args.rows), args.chunk_size),
+            ):
+                label, result = await measure(client, label, fn, *fn_args)
+                results[label] = result
+    finally:
+        if main.async_engine is not None:
+            await main.async_engine.dispose()
+        Base.metadata.drop_all(bind=engine)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single-rows", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    add_reset_db_argument(parser)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,89 @@
+# Per-endpoint latency of the transaction write paths (POST, PUT, PATCH, DELETE)
+# for both storage backends. Runs against the database configured by the
+# POSTGRES_* variables.
+#
+#   python -m benchmarks.bench_crud_writes --requests 1000 --concurrency 20 --reset-db
+import argparse
+import asyncio
+import json
+import logging
+import time
+import httpx
+from httpx import ASGITransport
+import app.async_crud as async_crud
+import app.crud as crud
+import app.main as main
+from app.databases.db import Base, engine
+from benchmarks.common import add_reset_db_argument, require_reset_db, summarize
+
+
+async def timed(client, latencies, method, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    response.raise_for_status()
+    latencies.append(time.perf_counter() - start)
+    return response
+
+
+async def run(total: int, concurrency: int, patch: bool):
+    latencies = {"POST": [], "PUT": [], "PATCH": [], "DELETE": []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        transport=ASGITransport(app=main.app), base_url="http://bench"
+    ) as client:
+
+        async def one(i):
+            async with semaphore:
+                row = {"crypto_name": f"coin{i % 50}", "amount": 1.0, "price_usd": 1.0}
+                created = await timed(
+                    client, latencies["POST"], "POST", "/transactions/", json=row
+                )
+                url = f"/transactions/{created.json()['id']}"
+                row["price_usd"] = 2.0
+                await timed(client, latencies["PUT"], "PUT", url, json=row)
+                if patch:
+                    await timed(
+                        client, latencies["PATCH"], "PATCH", url, json={"amount": 3.0}
+                    )
+                await timed(client, latencies["DELETE"], "DELETE", url)
+
+        await asyncio.gather(*(one(i) for i in range(total)))
+    return {method: summarize(values) for method, values in latencies.items() if values}
+
+
+async def main_async(args):
+    require_reset_db(args)
+    # Request logging would dominate every path; measure the database work
+    logging.disable(logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    patch = any(
+        "PATCH" in getattr(route, "methods", ()) for route in main.app.router.routes
+    )
+    results = {}
+    try:
+        main.store, main.app.dependency_overrides[main.get_session] = (
+            main.ThreadedCrud(crud),
+            main.get_db,
+        )
+        results["sync_threadpool"] = await run(args.requests, args.concurrency, patch)
+
+        main.store, main.app.dependency_overrides[main.get_session] = (
+            async_crud,
+            main.get_async_db,
+        )
+        results["async_asyncpg"] = await run(args.requests, args.concurrency, patch)
+    finally:
+        main.app.dependency_overrides.clear()
+        if main.async_engine is not None:
+            await main.async_engine.dispose()
+        Base.metadata.drop_all(bind=engine)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    add_reset_db_argument(parser)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,94 @@
+# Transaction endpoint throughput: sync psycopg2 API in the threadpool vs asyncpg.
+# Runs against the database configured by the POSTGRES_* variables.
+#
+#   python -m benchmarks.bench_db_throughput --requests 2000 --concurrency 100 --reset-db
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import httpx
+from httpx import ASGITransport
+import app.async_crud as async_crud
+import app.crud as crud
+import app.main as main
+from app.databases.db import Base, SessionLocal, engine
+from app.services.transaction_cache import transaction_cache
+from benchmarks.common import add_reset_db_argument, require_reset_db, summarize
+
+
+def seed(rows: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        crud.create_transactions(
+            db,
+            [
+                {"crypto_name": f"coin{i % 50}", "amount": 1.0, "price_usd": float(i)}
+                for i in range(rows)
+            ],
+        )
+        return [t.id for t in crud.get_transactions(db, 0, rows)]
+    finally:
+        db.close()
+
+
+async def run(ids, total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        transport=ASGITransport(app=main.app), base_url="http://bench"
+    ) as client:
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/transactions/{random.choice(ids)}")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    return {**summarize(latencies), "rps": round(total / elapsed, 1)}
+
+
+async def main_async(args):
+    require_reset_db(args)
+    # Request logging would dominate both paths; measure the database work
+    logging.disable(logging.INFO)
+    ids = seed(args.rows)
+    # Every request should reach the database, not the hot read cache
+    transaction_cache.ttl = 0
+    results = {}
+    try:
+        main.store, main.app.dependency_overrides[main.get_read_session] = (
+            main.ThreadedCrud(crud),
+            main.get_read_db,
+        )
+        results["sync_threadpool"] = await run(ids, args.requests, args.concurrency)
+
+        main.store, main.app.dependency_overrides[main.get_read_session] = (
+            async_crud,
+            main.get_async_read_db,
+        )
+        results["async_asyncpg"] = await run(ids, args.requests, args.concurrency)
+    finally:
+        main.app.dependency_overrides.clear()
+        if main.async_engine is not None:
+            await main.async_engine.dispose()
+        if not args.keep:
+            Base.metadata.drop_all(bind=engine)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded table")
+    add_reset_db_argument(parser)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,366 @@
+# Load test for the HTTP endpoints in app/main.py. The app runs in-process
+# (ASGI, no sockets) or under uvicorn on a local port, with CoinGecko replaced
+# by the local stub (latency, error rate and rate limit configurable) and the
+# database configured by the POSTGRES_* variables seeded with transactions.
+# Each endpoint gets the same number of requests at a fixed concurrency;
+# throughput, p50/p95/p99 latency and status codes are written as JSON.
+# A previous result file can be passed as a baseline to flag regressions.
+#
+#   python -m benchmarks.bench_endpoints --mode uvicorn --concurrency 50 --reset-db
+#   python -m benchmarks.bench_endpoints --endpoints get_transaction,list_transactions --reset-db
+#   python -m benchmarks.bench_endpoints --baseline benchmarks/results/before.json --reset-db
+#
+# The price streams (/stream/prices, /ws/prices) are long-lived and covered by
+# benchmarks.bench_stream.
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import httpx
+from httpx import ASGITransport
+import app.crud as crud
+import app.main as main
+import app.services.gecko as gecko
+import app.databases.partitions as partitions
+from app.databases.db import Base, SessionLocal, engine
+from benchmarks.common import (
+    ServerThread,
+    add_reset_db_argument,
+    require_reset_db,
+    summarize,
+)
+from benchmarks.stub_gecko import StubServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+COINS = [f"coin{i}" for i in range(20)]
+USERNAME, PASSWORD = "bench", "bench"
+
+# Run settings that make two result files comparable
+COMPARED_SETTINGS = ("mode", "concurrency", "requests", "rows", "db_async", "upstream")
+
+
+# Request factories share the seeded ids; deletes consume their own pool
+class Workload:
+    def __init__(self, ids, delete_ids, bulk_size: int):
+        self.ids = ids
+        self.delete_ids = delete_ids
+        self.bulk_size = bulk_size
+        self.cold = itertools.count()
+
+    def body(self) -> dict:
+        return {
+            "crypto_name": random.choice(COINS),
+            "amount": round(random.uniform(0.01, 5), 4),
+            "price_usd": round(random.uniform(10, 50000), 2),
+        }
+
+    def transaction_url(self) -> str:
+        return f"/transactions/{random.choice(self.ids)}"
+
+
+# name -> workload -> (method, url, httpx request options)
+ENDPOINTS = {
+    # Mostly price cache hits
+    "get_crypto": lambda w: ("GET", f"/crypto/{random.choice(COINS)}", {}),
+    # A new coin every request: cache miss, upstream call through the stub
+    "get_crypto_cold": lambda w: ("GET", f"/crypto/cold{next(w.cold)}", {}),
+    "get_crypto_bulk": lambda w: (
+        "GET",
+        "/crypto",
+        {"params": {"ids": ",".join(random.sample(COINS, 5)), "vs": "usd,eur"}},
+    ),
+    "list_transactions": lambda w: ("GET", "/transactions/", {}),
+    "export_transactions": lambda w: (
+        "GET",
+        "/transactions/export",
+        {"params": {"crypto_name": random.choice(COINS)}},
+    ),
+    "get_transaction": lambda w: ("GET", w.transaction_url(), {}),
+    "create_transaction": lambda w: ("POST", "/transactions/", {"json": w.body()}),
+    "bulk_ingest": lambda w: (
+        "POST",
+        "/transactions/bulk",
+        {"json": [w.body() for _ in range(w.bulk_size)]},
+    ),
+    "update_transaction": lambda w: ("PUT", w.transaction_url(), {"json": w.body()}),
+    "patch_transaction": lambda w: (
+        "PATCH",
+        w.transaction_url(),
+        {"json": {"amount": round(random.uniform(0.01, 5), 4)}},
+    ),
+    "delete_transaction": lambda w: (
+        "DELETE",
+        f"/transactions/{w.delete_ids.pop()}",
+        {},
+    ),
+    "get_rollups": lambda w: ("GET", f"/rollups/{random.choice(COINS)}", {}),
+    "get_analytics": lambda w: ("GET", f"/analytics/{random.choice(COINS)}", {}),
+    "stats": lambda w: ("GET", "/stats", {}),
+    "metrics": lambda w: ("GET", "/metrics", {}),
+    "upstream": lambda w: ("GET", "/upstream", {}),
+    "protected": lambda w: ("GET", "/protected", {"auth": (USERNAME, PASSWORD)}),
+}
+
+
+# Transactions spread over the last `days`, so rollups and analytics have data
+def seed(rows: int, spare: int, days: float):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    # Monthly partitions first: rows in the default one would block them
+    with engine.begin() as connection:
+        partitions.create_partitions(
+            connection,
+            (now - timedelta(days=days)).date(),
+            partitions.add_months(partitions.month_start(now.date()), 1),
+        )
+    step = timedelta(days=days) / max(rows, 1)
+    db = SessionLocal()
+    try:
+        ids = crud.create_transactions_returning(
+            db,
+            [
+                {
+                    "crypto_name": COINS[i % len(COINS)],
+                    "amount": round(random.uniform(0.01, 5), 4),
+                    "price_usd": round(random.uniform(10, 50000), 2),
+                    "timestamp": now - step * (rows - i),
+                }
+                for i in range(rows + spare)
+            ],
+        )
+    finally:
+        db.close()
+    return ids[:rows], ids[rows:]
+
+
+async def run_endpoint(client, build, workload, requests: int, concurrency: int):
+    latencies = []
+    statuses = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            method, url, options = build(workload)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **options)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    return {
+        **summarize(latencies),
+        "rps": round(requests / elapsed, 1),
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+async def run_all(client, names, workload, args):
+    results = {}
+    for name in names:
+        build = ENDPOINTS[name]
+        if args.warmup:
+            await run_endpoint(client, build, workload, args.warmup, args.concurrency)
+        results[name] = await run_endpoint(
+            client, build, workload, args.requests, args.concurrency
+        )
+        result = results[name]
+        print(
+            f"{name:24} {result['rps']:>9} rps  p50 {result['p50_ms']:>8} ms  "
+            f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+            f"errors {result['errors']}",
+            file=sys.stderr,
+            flush=True,
+        )
+    return results
+
+
+def client_limits(concurrency: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+
+
+async def run_in_process(names, workload, args):
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=main.app),
+            base_url="http://bench",
+            timeout=args.timeout,
+        ) as client:
+            return await run_all(client, names, workload, args)
+
+
+async def run_uvicorn(names, workload, args):
+    with ServerThread(main.app, lifespan="on") as server:
+        async with httpx.AsyncClient(
+            base_url=server.origin,
+            limits=client_limits(args.concurrency),
+            timeout=args.timeout,
+        ) as client:
+            return await run_all(client, names, workload, args)
+
+
+# Endpoints whose p95 latency rose, or whose throughput or error rate got
+# worse, by more than `tolerance` against the baseline run
+def compare(baseline: dict, current: dict, tolerance: float) -> dict:
+    regressions = {}
+    for name, result in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        found = {}
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found["p95_ms"] = [before["p95_ms"], result["p95_ms"]]
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            found["rps"] = [before["rps"], result["rps"]]
+        if result["error_rate"] > before["error_rate"] + tolerance / 10:
+            found["error_rate"] = [before["error_rate"], result["error_rate"]]
+        if found:
+            regressions[name] = found
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main_sync(args) -> int:
+    require_reset_db(args)
+    names = [n.strip() for n in args.endpoints.split(",")] if args.endpoints else []
+    names = names or list(ENDPOINTS)
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}")
+
+    # Access logs would dominate the cheap endpoints, and the stub's injected
+    # failures are expected; server errors still show up in the status counts
+    logging.disable(logging.ERROR)
+    random.seed(args.seed)
+    # Deletes need one row each, warmup included
+    spare = args.requests + args.warmup if "delete_transaction" in names else 0
+    ids, delete_ids = seed(args.rows, spare, args.days)
+    workload = Workload(ids, delete_ids, args.bulk_size)
+    main.correct_username, main.correct_password = USERNAME, PASSWORD
+    if args.gecko_rate is not None:
+        gecko.upstream.limiter.configure(args.gecko_rate, max(1, args.gecko_rate))
+
+    started_at = datetime.now(timezone.utc)
+    try:
+        with StubServer(
+            latency=args.upstream_latency,
+            error_rate=args.upstream_error_rate,
+            rate_limit=args.upstream_rate_limit,
+        ) as stub:
+            gecko.GECKO_BASE_URL = stub.base_url
+            run = run_uvicorn if args.mode == "uvicorn" else run_in_process
+            endpoints = asyncio.run(run(names, workload, args))
+            upstream_requests = stub.requests
+    finally:
+        if not args.keep:
+            Base.metadata.drop_all(bind=engine)
+
+    results = {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "mode": args.mode,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "rows": args.rows,
+            "db_async": main.db_async,
+            "upstream": {
+                "latency": args.upstream_latency,
+                "error_rate": args.upstream_error_rate,
+                "rate_limit": args.upstream_rate_limit,
+            },
+            "upstream_requests": upstream_requests,
+        },
+        "endpoints": endpoints,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"endpoints-{started_at:%Y%m%dT%H%M%SZ}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differing = [
+            key
+            for key in COMPARED_SETTINGS
+            if baseline["meta"].get(key) != results["meta"][key]
+        ]
+        if differing:
+            print(
+                f"Warning: baseline ran with different {', '.join(differing)}",
+                file=sys.stderr,
+            )
+        regressions = compare(baseline, results, args.tolerance)
+        print(json.dumps({"regressions": regressions}, indent=2))
+        return 1 if regressions else 0
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument(
+        "--endpoints", default="", help=f"comma-separated, from: {', '.join(ENDPOINTS)}"
+    )
+    parser.add_argument("--requests", type=int, default=500, help="per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--rows", type=int, default=10000, help="seeded transactions")
+    parser.add_argument("--days", type=float, default=7, help="seeded time span")
+    parser.add_argument("--bulk-size", type=int, default=100)
+    parser.add_argument("--upstream-latency", type=float, default=0.05)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--upstream-rate-limit", type=float, default=0.0, help="stub requests/s"
+    )
+    parser.add_argument(
+        "--gecko-rate", type=float, default=None, help="override the client limiter"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="")
+    parser.add_argument("--baseline", default="", help="results file to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    add_reset_db_argument(parser)
+    sys.exit(main_sync(parser.parse_args()))
@@ -0,0 +1,113 @@
+# Per-request overhead of the request middleware: no middleware, the old
+# BaseHTTPMiddleware request logger and the pure ASGI instrumentation layer.
+# Requests are fed straight into the ASGI app, so only the app and its
+# middleware are timed.
+#
+#   python -m benchmarks.bench_middleware --requests 20000
+import argparse
+import asyncio
+import json
+import logging
+import time
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.services.instrumentation import InstrumentationMiddleware
+
+
+# The middleware this layer replaced
+class RequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        logging.info(f"Incoming request: {request.method} {request.url}")
+        logging.debug(f"Headers: {dict(request.headers)}")
+        start_time = time.time()
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logging.info(
+            f"Completed response: {response.status_code} in {process_time:.2f}s"
+        )
+        return response
+
+
+def build_app(middleware=None, **options) -> FastAPI:
+    bench_app = FastAPI()
+
+    @bench_app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"item_id": item_id}
+
+    if middleware is not None:
+        bench_app.add_middleware(middleware, **options)
+    return bench_app
+
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/items/42",
+    "raw_path": b"/items/42",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [
+        (b"host", b"bench"),
+        (b"user-agent", b"bench"),
+        (b"accept", b"application/json"),
+    ],
+    "client": ("127.0.0.1", 50000),
+    "server": ("bench", 80),
+}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(asgi_app, requests: int) -> float:
+    # The first request builds the middleware stack
+    await asgi_app(dict(SCOPE), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await asgi_app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(args):
+    logging.basicConfig(level=args.log_level.upper())
+    # Keep log output off the terminal; formatting and filtering still run
+    for handler in logging.getLogger().handlers:
+        handler.setStream(open("/dev/null", "w"))
+
+    variants = {
+        "none": build_app(),
+        "request_logging": build_app(RequestLoggingMiddleware),
+        "instrumentation": build_app(InstrumentationMiddleware, name="bench_http"),
+        "instrumentation_sampled": build_app(
+            InstrumentationMiddleware, name="bench_http_sampled", sample_rate=0.01
+        ),
+    }
+    per_request = {}
+    for name, asgi_app in variants.items():
+        per_request[name] = await run(asgi_app, args.requests)
+
+    baseline = per_request["none"]
+    results = {
+        name: {
+            "us_per_request": round(seconds * 1e6, 2),
+            "overhead_us": round((seconds - baseline) * 1e6, 2),
+        }
+        for name, seconds in per_request.items()
+    }
+    print(json.dumps({"log_level": args.log_level, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--log-level", default="INFO")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,138 @@
+# Transaction list serialisation: ORM rows through response_model (pydantic
+# validation, field_serializer, json.dumps) vs column tuples through the orjson
+# fast path. Encoding is timed on rows already in memory; "read" adds the query.
+# Runs against the database configured by the POSTGRES_* variables.
+#
+#   python -m benchmarks.bench_serialization --sizes 100,1000,10000 --reset-db
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+import app.crud as crud
+from app.databases.db import Base, SessionLocal, engine
+from app.models.model import Transaction
+from app.schemas.schemas import TransactionResponse
+from app.services.serialization import encode_transactions
+from benchmarks.common import add_reset_db_argument, require_reset_db
+
+# The field FastAPI builds for response_model=List[TransactionResponse]
+RESPONSE_FIELD = create_model_field(
+    "Response_get_transactions", List[TransactionResponse], mode="serialization"
+)
+
+# serialize_response is a coroutine; one loop keeps its setup out of the timing
+loop = asyncio.new_event_loop()
+
+
+def seed(rows: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        crud.create_transactions(
+            db,
+            [
+                {
+                    "crypto_name": f"coin{i % 50}",
+                    "amount": 0.5 + i % 7,
+                    "price_usd": 100 + i * 0.01,
+                }
+                for i in range(rows)
+            ],
+        )
+    finally:
+        db.close()
+
+
+def orm_rows(limit: int):
+    db = SessionLocal()
+    try:
+        return db.scalars(select(Transaction).order_by(*crud.ORDER).limit(limit)).all()
+    finally:
+        db.close()
+
+
+def column_rows(limit: int):
+    db = SessionLocal()
+    try:
+        return crud.get_transactions_after(db, None, limit)
+    finally:
+        db.close()
+
+
+# What the endpoint did before: serialize_response, then JSONResponse
+def response_model_body(rows) -> bytes:
+    content = loop.run_until_complete(
+        serialize_response(field=RESPONSE_FIELD, response_content=rows)
+    )
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path_body(rows) -> bytes:
+    return encode_transactions(rows)
+
+
+def timed(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main(args):
+    require_reset_db(args)
+    logging.disable(logging.INFO)
+    results = {}
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            seed(size)
+            orm, columns = orm_rows(size), column_rows(size)
+            assert response_model_body(orm) == fast_path_body(columns)
+
+            encode = {
+                "response_model": timed(lambda: response_model_body(orm), args.repeats),
+                "fast_path": timed(lambda: fast_path_body(columns), args.repeats),
+            }
+            read = {
+                "response_model": timed(
+                    lambda: response_model_body(orm_rows(size)), args.repeats
+                ),
+                "fast_path": timed(
+                    lambda: fast_path_body(column_rows(size)), args.repeats
+                ),
+            }
+            result = {
+                "encode_rows_per_s": {
+                    name: round(size / seconds) for name, seconds in encode.items()
+                },
+                "read_rows_per_s": {
+                    name: round(size / seconds) for name, seconds in read.items()
+                },
+                "encode_speedup": round(
+                    encode["response_model"] / encode["fast_path"], 1
+                ),
+                "read_speedup": round(read["response_model"] / read["fast_path"], 1),
+            }
+            results[size] = result
+            print(size, result, flush=True)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeats", type=int, default=20)
+    add_reset_db_argument(parser)
+    main(parser.parse_args())
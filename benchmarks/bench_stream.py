@@ -0,0 +1,128 @@
+# Streaming fan-out load test: subscriber count vs memory and CPU. Subscribers
+# are attached to the real broadcaster in-process; prices come from a fake
+# upstream that moves every coin on every tick, so each tick fans out to
+# everyone. A share of the subscribers never reads, to show that their
+# buffers stay bounded.
+#
+#   python -m benchmarks.bench_stream --subscribers 100,1000,10000 --ticks 50
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import tracemalloc
+import httpx
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.prices as prices
+from app.services.stream import PriceBroadcaster
+from benchmarks.common import summarize
+
+
+def moving_prices(coins):
+    quotes = {coin: 100.0 for coin in coins}
+
+    def handler(request: httpx.Request):
+        ids = request.url.params["ids"].split(",")
+        for coin in ids:
+            quotes[coin] *= random.uniform(0.99, 1.01)
+        return httpx.Response(200, json={coin: {"usd": quotes[coin]} for coin in ids})
+
+    return httpx.MockTransport(handler)
+
+
+async def drain(subscriber, counter):
+    while True:
+        await subscriber.get()
+        counter[0] += 1
+
+
+async def run(subscribers: int, args, trace: bool) -> dict:
+    coins = [f"coin{i}" for i in range(args.coins)]
+    stream = PriceBroadcaster(
+        interval=3600, buffer_size=args.buffer, max_subscribers=subscribers
+    )
+    if trace:
+        tracemalloc.start()
+    received = [0]
+    readers = []
+    clients = []
+    for i in range(subscribers):
+        keys = [(coin, "usd") for coin in random.sample(coins, args.per_subscriber)]
+        subscriber = stream.subscribe(keys)
+        clients.append(subscriber)
+        if i % 100 >= args.slow_percent:
+            readers.append(asyncio.create_task(drain(subscriber, received)))
+    await asyncio.sleep(0)
+
+    tick_seconds = []
+    cpu_seconds = []
+    for _ in range(args.ticks):
+        prices.price_cache.clear()
+        wall, cpu = time.perf_counter(), time.process_time()
+        await stream.tick()
+        # Let the readers drain what this tick queued
+        await asyncio.sleep(0)
+        tick_seconds.append(time.perf_counter() - wall)
+        cpu_seconds.append(time.process_time() - cpu)
+
+    result = {
+        "subscribers": subscribers,
+        "tick": summarize(tick_seconds),
+        "cpu_ms_per_tick": round(sum(cpu_seconds) / len(cpu_seconds) * 1000, 3),
+        "updates_queued": stream.sent.value,
+        "updates_read": received[0],
+        "updates_dropped": stream.dropped.value,
+        "max_buffered": max(len(s.buffer) for s in clients),
+    }
+    if trace:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["memory_kib"] = round(current / 1024, 1)
+        result["peak_memory_kib"] = round(peak / 1024, 1)
+        result["bytes_per_subscriber"] = round(current / subscribers)
+
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    for subscriber in clients:
+        stream.unsubscribe(subscriber)
+    return result
+
+
+async def main(args):
+    random.seed(0)
+    logging.disable(logging.WARNING)
+    # No database writes; no client-side rate limit on the fake upstream
+    crud.create_transactions = lambda *a, **k: None
+    crud.upsert_latest_prices = lambda *a, **k: None
+    gecko.upstream.limiter.configure(0, 1)
+    await gecko.start_client(
+        transport=moving_prices([f"coin{i}" for i in range(args.coins)])
+    )
+    try:
+        results = []
+        for subscribers in map(int, args.subscribers.split(",")):
+            # CPU is measured without tracemalloc, memory in a second pass
+            result = await run(subscribers, args, trace=False)
+            memory = await run(subscribers, args, trace=True)
+            for key in ("memory_kib", "peak_memory_kib", "bytes_per_subscriber"):
+                result[key] = memory[key]
+            results.append(result)
+    finally:
+        await prices.shutdown()
+        await gecko.close_client()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", default="100,1000,10000")
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--coins", type=int, default=50)
+    parser.add_argument("--per-subscriber", type=int, default=5)
+    parser.add_argument("--buffer", type=int, default=100)
+    # Percentage of subscribers that never read their stream
+    parser.add_argument("--slow-percent", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,72 @@
+# Per-request httpx.AsyncClient vs the shared, pooled upstream client.
+#
+#   python -m benchmarks.bench_upstream_client --requests 2000 --concurrency 20
+import argparse
+import asyncio
+import json
+import time
+import httpx
+import app.services.gecko as gecko
+from benchmarks.common import summarize
+from benchmarks.stub_gecko import StubServer
+
+
+async def per_request_client(base_url: str):
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            f"{base_url}/simple/price",
+            params={"ids": "bitcoin", "vs_currencies": "usd"},
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def shared_client(base_url: str):
+    return await gecko.fetch_simple_price("bitcoin", "usd")
+
+
+async def run(fetch, base_url: str, total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await fetch(base_url)
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return {**summarize(latencies), "rps": round(total / elapsed, 1)}
+
+
+async def main(args):
+    with StubServer(latency=args.latency) as stub:
+        gecko.GECKO_BASE_URL = stub.base_url
+        # Measure the client, not the client-side rate limit
+        gecko.upstream.limiter.configure(0, 1)
+        await gecko.start_client()
+        try:
+            # Warm up both paths once
+            await per_request_client(stub.base_url)
+            await shared_client(stub.base_url)
+            results = {
+                "per_request_client": await run(
+                    per_request_client, stub.base_url, args.requests, args.concurrency
+                ),
+                "shared_client": await run(
+                    shared_client, stub.base_url, args.requests, args.concurrency
+                ),
+            }
+        finally:
+            await gecko.close_client()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
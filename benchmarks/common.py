@@ -0,0 +1,71 @@
+import statistics
+import threading
+import time
+from typing import List
+import uvicorn
+from app.databases.db import engine
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# Latency summary in milliseconds
+def summarize(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+# Runs an ASGI app under uvicorn in a background thread
+class ServerThread:
+    def __init__(self, app, port: int = 0, **options):
+        self.app = app
+        options.setdefault("log_level", "warning")
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, **options)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def origin(self) -> str:
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+# The database benchmarks drop and recreate the app tables in the database the
+# POSTGRES_* variables point at, so they only run when told it is disposable
+def add_reset_db_argument(parser):
+    parser.add_argument(
+        "--reset-db",
+        action="store_true",
+        help="drop and recreate the app tables (all their data is lost)",
+    )
+
+
+def require_reset_db(args):
+    if not args.reset_db:
+        url = engine.url.render_as_string(hide_password=True)
+        raise SystemExit(
+            f"This benchmark drops and recreates the tables in {url}. "
+            "Point POSTGRES_* at a scratch database and pass --reset-db."
+        )
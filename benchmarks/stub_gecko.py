@@ -0,0 +1,88 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from benchmarks.common import ServerThread
+
+# Scripted fault: "hang" sleeps for state.hang seconds, otherwise a status
+# code or (status code, Retry-After seconds)
+HANG = "hang"
+
+
+def error_response(status_code: int, retry_after=None) -> JSONResponse:
+    headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+    return JSONResponse(
+        {"error": "stub upstream error"}, status_code=status_code, headers=headers
+    )
+
+
+# Local stand-in for CoinGecko's simple/price with injectable faults:
+# latency, a random 503 rate, a requests/second limit answered with 429 and
+# Retry-After, and a queue of scripted faults consumed one per request
+def create_stub_app(
+    latency: float = 0.0, error_rate: float = 0.0, rate_limit: float = 0.0
+) -> FastAPI:
+    stub = FastAPI()
+    stub.state.latency = latency
+    stub.state.error_rate = error_rate
+    stub.state.rate_limit = rate_limit
+    stub.state.faults = deque()
+    stub.state.hang = 30.0
+    stub.state.requests = 0
+    stub.state.window = (0, 0)  # (second, requests in it)
+
+    def over_limit() -> bool:
+        second = int(time.monotonic())
+        current, count = stub.state.window
+        count = count + 1 if second == current else 1
+        stub.state.window = (second, count)
+        return count > stub.state.rate_limit
+
+    @stub.get("/api/v3/simple/price")
+    async def simple_price(ids: str, vs_currencies: str = "usd"):
+        stub.state.requests += 1
+        if stub.state.faults:
+            fault = stub.state.faults.popleft()
+            if fault == HANG:
+                await asyncio.sleep(stub.state.hang)
+            elif isinstance(fault, tuple):
+                return error_response(*fault)
+            else:
+                return error_response(fault)
+        if stub.state.rate_limit and over_limit():
+            return error_response(429, math.ceil(1 / stub.state.rate_limit))
+        if stub.state.latency:
+            await asyncio.sleep(stub.state.latency)
+        if stub.state.error_rate and random.random() < stub.state.error_rate:
+            return error_response(503)
+
+        prices = {}
+        for coin in ids.split(","):
+            base = 1000.0 + sum(map(ord, coin))
+            prices[coin] = {vs: round(base, 2) for vs in vs_currencies.split(",")}
+        return prices
+
+    return stub
+
+
+# Runs the stub under uvicorn in a background thread
+class StubServer(ServerThread):
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        port: int = 0,
+    ):
+        super().__init__(create_stub_app(latency, error_rate, rate_limit), port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.origin}/api/v3"
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.requests
@@ -0,0 +1,39 @@
+"""add transactions timestamp id index
+
+Revision ID: 4ad1b56598bf
+Revises: 0082cd429187
+Create Date: 2026-10-18 09:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4ad1b56598bf'
+down_revision: Union[str, None] = '0082cd429187'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pagination orders by (timestamp, id); build without locking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_timestamp_id',
+            'transactions',
+            ['timestamp', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_timestamp_id',
+            table_name='transactions',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,65 @@
+"""add price rollups
+
+Revision ID: 9c5e1f7a2b34
+Revises: 4ad1b56598bf
+Create Date: 2026-10-18 10:12:40.116024
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c5e1f7a2b34'
+down_revision: Union[str, None] = '4ad1b56598bf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'price_rollups',
+        sa.Column('crypto_name', sa.String(), nullable=False),
+        sa.Column('resolution', sa.String(), nullable=False),
+        sa.Column('bucket', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('open', sa.Float(), nullable=False),
+        sa.Column('high', sa.Float(), nullable=False),
+        sa.Column('low', sa.Float(), nullable=False),
+        sa.Column('close', sa.Float(), nullable=False),
+        sa.Column('volume', sa.Float(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('first_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('last_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('crypto_name', 'resolution', 'bucket'),
+    )
+    # Backfill from the existing transactions; new rows are folded in by crud
+    for resolution in ('minute', 'hour', 'day'):
+        op.execute(
+            f"""
+            INSERT INTO price_rollups
+            SELECT
+                crypto_name,
+                '{resolution}',
+                date_trunc('{resolution}', timestamp, 'UTC') AS bucket,
+                (array_agg(price_usd ORDER BY timestamp, id))[1],
+                max(price_usd),
+                min(price_usd),
+                (array_agg(price_usd ORDER BY timestamp DESC, id DESC))[1],
+                sum(amount),
+                count(*),
+                min(timestamp),
+                max(timestamp)
+            FROM transactions
+            WHERE crypto_name IS NOT NULL
+                AND price_usd IS NOT NULL
+                AND amount IS NOT NULL
+                AND timestamp IS NOT NULL
+            GROUP BY crypto_name, bucket
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('price_rollups')
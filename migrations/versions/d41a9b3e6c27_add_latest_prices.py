@@ -0,0 +1,43 @@
+"""add latest prices
+
+Revision ID: d41a9b3e6c27
+Revises: b7d2e4c81f06
+Create Date: 2026-10-18 11:48:03.271655
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a9b3e6c27'
+down_revision: Union[str, None] = 'b7d2e4c81f06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'latest_prices',
+        sa.Column('crypto_name', sa.String(), nullable=False),
+        sa.Column('vs_currency', sa.String(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('observed_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('crypto_name', 'vs_currency'),
+    )
+    # Seed from the newest stored USD price per coin
+    op.execute(
+        """
+        INSERT INTO latest_prices (crypto_name, vs_currency, price, observed_at)
+        SELECT DISTINCT ON (crypto_name) crypto_name, 'usd', price_usd, timestamp
+        FROM transactions
+        WHERE crypto_name IS NOT NULL AND price_usd IS NOT NULL
+        ORDER BY crypto_name, timestamp DESC, id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('latest_prices')
@@ -0,0 +1,27 @@
+"""add transactions updated_at
+
+Revision ID: e3b8f0a4c1d7
+Revises: d41a9b3e6c27
+Create Date: 2026-10-18 15:02:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b8f0a4c1d7'
+down_revision: Union[str, None] = 'd41a9b3e6c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable without a default: a catalog-only change on every partition
+    op.add_column('transactions', sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transactions', 'updated_at')
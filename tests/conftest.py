@@ -0,0 +1,100 @@
+import pytest
+import httpx
+from httpx import ASGITransport
+import app.crud as crud
+import app.services.analytics as analytics
+import app.services.gecko as gecko
+import app.services.prices as prices
+from app.databases.db import Base, SessionLocal, engine
+from app.main import app
+from app.services.transaction_cache import transaction_cache
+
+
+# Process-level price, analytics and read-cache state must not leak between
+# tests
+@pytest.fixture(autouse=True)
+def reset_price_state():
+    prices.price_cache.clear()
+    gecko.upstream.reset()
+    transaction_cache.clear()
+    analytics.analytics_cache.clear()
+    yield
+    prices.price_cache.clear()
+    gecko.upstream.reset()
+    transaction_cache.clear()
+    analytics.analytics_cache.clear()
+
+
+# Manually advanced time source for caches, limiters and breakers
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+# Local stand-in for CoinGecko's simple/price. Every requested coin is priced
+# at `price` in each requested currency, or, given `quotes`, only the quoted
+# coins are (unknown coins are left out, as CoinGecko does)
+@pytest.fixture
+def stub_transport():
+    def build(calls, status_code=200, quotes=None, price=100.0):
+        def handler(request: httpx.Request):
+            calls.append(request)
+            if status_code != 200:
+                return httpx.Response(status_code, json={"error": "stub error"})
+            ids = request.url.params["ids"].split(",")
+            currencies = request.url.params["vs_currencies"].split(",")
+            if quotes is None:
+                priced = {coin: price for coin in ids}
+            else:
+                priced = {coin: quotes[coin] for coin in ids if coin in quotes}
+            return httpx.Response(
+                200,
+                json={
+                    coin: {vs: value for vs in currencies}
+                    for coin, value in priced.items()
+                },
+            )
+
+        return httpx.MockTransport(handler)
+
+    return build
+
+
+# Keeps observed prices out of the database; no stored snapshot to fall back on
+@pytest.fixture
+def no_persist(monkeypatch):
+    monkeypatch.setattr(crud, "create_transactions", lambda *args, **kwargs: None)
+    monkeypatch.setattr(crud, "upsert_latest_prices", lambda *args, **kwargs: None)
+    monkeypatch.setattr(crud, "get_latest_price", lambda *args, **kwargs: None)
+
+
+# GET through the app in-process
+@pytest.fixture
+def get():
+    async def request(url):
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await client.get(url)
+
+    return request
+
+
+# A fresh schema and a session on it for each test
+@pytest.fixture(scope="function")
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,195 @@
+# test_analytics.py
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+import httpx
+from httpx import ASGITransport
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import app.crud as crud
+import app.services.analytics as analytics
+import app.services.metrics as metrics
+from app.databases.db import SessionLocal, engine
+from app.databases.replicas import PRIMARY, ReadRouter, Target
+from app.main import app
+from app.services.consistency import LAST_WRITE_COOKIE
+
+T0 = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+
+def seed(db_session, trades, crypto_name="bitcoin"):
+    crud.create_transactions(
+        db_session,
+        [
+            {
+                "crypto_name": crypto_name,
+                "amount": amount,
+                "price_usd": price,
+                "timestamp": T0 + timedelta(seconds=seconds),
+            }
+            for seconds, price, amount in trades
+        ],
+    )
+
+
+def test_compute_matches_reference():
+    timestamps = np.array([0, 10, 70, 80, 130, 190, 200], dtype=np.float64)
+    prices = np.array([100, 102, 101, 105, 99, 98, 104], dtype=np.float64)
+    amounts = np.array([1, 2, 1, 1, 3, 1, 1], dtype=np.float64)
+
+    stats = analytics.compute(timestamps, prices, amounts, 0.0, 60, 2, [50])
+
+    assert stats["count"] == 7
+    assert stats["vwap"] == pytest.approx((prices * amounts).sum() / amounts.sum())
+    assert (stats["open"], stats["close"]) == (100.0, 104.0)
+    assert (stats["high"], stats["low"]) == (105.0, 98.0)
+    assert stats["total_return"] == pytest.approx(0.04)
+    assert stats["percentiles"] == {"50": 101.0}
+    # Bucket closes: 102 (0-60s), 105 (60-120s), 99 (120-180s), 104 (180-240s)
+    returns = np.diff(np.log([102, 105, 99, 104]))
+    assert stats["mean_return"] == pytest.approx(returns.mean())
+    assert stats["volatility"] == pytest.approx(returns.std(ddof=1))
+    assert [p["volatility"] for p in stats["rolling_volatility"]] == pytest.approx(
+        [returns[0:2].std(ddof=1), returns[1:3].std(ddof=1)]
+    )
+    assert [p["bucket"] for p in stats["rolling_volatility"]] == [
+        datetime.fromtimestamp(120, timezone.utc),
+        datetime.fromtimestamp(180, timezone.utc),
+    ]
+
+
+def test_compute_empty_window():
+    empty = np.array([], dtype=np.float64)
+    stats = analytics.compute(empty, empty, empty, 0.0, 60, 2, [5, 95])
+    assert stats["count"] == 0
+    assert stats["vwap"] is None
+    assert stats["percentiles"] == {"5": None, "95": None}
+
+
+def test_fetch_arrays_reads_binary_copy(db_session):
+    seed(db_session, [(30, 101.5, 2.0), (0, 100.0, 1.0), (90, 99.0, 0.5)])
+    seed(db_session, [(10, 5.0, 1.0)], crypto_name="ethereum")
+
+    timestamps, prices, amounts = analytics.fetch_arrays(
+        "bitcoin", T0, T0 + timedelta(seconds=60)
+    )
+    assert timestamps.tolist() == [T0.timestamp(), T0.timestamp() + 30]
+    assert prices.tolist() == [100.0, 101.5]
+    assert amounts.tolist() == [1.0, 2.0]
+
+
+# A second engine on the test database stands in for a replica
+@pytest.mark.asyncio(loop_scope="function")
+async def test_analytics_reads_from_a_replica(db_session, monkeypatch):
+    seed(db_session, [(0, 100.0, 1.0), (30, 101.0, 1.0)])
+    replica_engine = create_engine(engine.url)
+    monkeypatch.setattr(
+        analytics,
+        "read_router",
+        ReadRouter(
+            Target(PRIMARY, engine, SessionLocal),
+            [Target("replica1", replica_engine, sessionmaker(bind=replica_engine))],
+            name="t_analytics",
+        ),
+    )
+
+    params = {"start": T0.isoformat(), "end": (T0 + timedelta(minutes=1)).isoformat()}
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            response = await client.get("/analytics/bitcoin", params=params)
+            assert response.json()["count"] == 2
+            reads = metrics.snapshot()["db_read_sessions_total"]
+            assert reads["t_analytics replica1"] == 1
+            assert "t_analytics primary" not in reads
+
+            # Within the read-your-writes window the scan stays on the primary
+            analytics.analytics_cache.clear()
+            client.cookies.set(LAST_WRITE_COOKIE, str(time.time()))
+            response = await client.get("/analytics/bitcoin", params=params)
+            assert response.json()["count"] == 2
+            reads = metrics.snapshot()["db_read_sessions_total"]
+            assert reads["t_analytics replica1"] == 1
+            assert reads["t_analytics primary"] == 1
+    finally:
+        replica_engine.dispose()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_closed_windows_are_cached(db_session, monkeypatch):
+    seed(db_session, [(0, 100.0, 1.0), (3600, 110.0, 1.0)])
+    calls = []
+    window_stats = analytics.window_stats
+
+    def counting(*args):
+        calls.append(args)
+        return window_stats(*args)
+
+    monkeypatch.setattr(analytics, "window_stats", counting)
+    end = T0 + timedelta(days=1)
+
+    first = await analytics.get_window_stats("bitcoin", T0, end)
+    second = await analytics.get_window_stats("bitcoin", T0, end)
+    assert first == second
+    assert first["vwap"] == 105.0
+    assert len(calls) == 1
+
+    # Windows that are still open, or closed only just now, are recomputed
+    # every time and never stored
+    await analytics.get_window_stats("bitcoin", T0)
+    await analytics.get_window_stats("bitcoin", T0)
+    recent = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await analytics.get_window_stats("bitcoin", T0, recent)
+    await analytics.get_window_stats("bitcoin", T0, recent)
+    assert len(calls) == 5
+    assert len(analytics.analytics_cache) == 1
+
+
+def test_result_cache_ttl_and_lru(clock):
+    cache = analytics.ResultCache(ttl=10, max_entries=2, clock=clock, name="t_results")
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.set("c", {"n": 3})
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.evictions.value == 1
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_analytics_endpoint(db_session):
+    seed(db_session, [(i * 60, 100.0 + i, 1.0) for i in range(10)])
+
+    async with httpx.AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get(
+            "/analytics/bitcoin",
+            params={
+                "start": T0.isoformat(),
+                "end": (T0 + timedelta(hours=1)).isoformat(),
+                "interval": 60,
+                "window": 3,
+                "percentiles": "10,90",
+            },
+        )
+        invalid = await client.get("/analytics/bitcoin?percentiles=200")
+        backwards = await client.get(
+            "/analytics/bitcoin",
+            params={"start": T0.isoformat(), "end": T0.isoformat()},
+        )
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["count"] == 10
+    assert body["vwap"] == pytest.approx(104.5)
+    assert set(body["percentiles"]) == {"10", "90"}
+    assert len(body["rolling_volatility"]) == 7
+    assert invalid.status_code == 400
+    assert backwards.status_code == 400
@@ -0,0 +1,375 @@
+# test_async_crud.py
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import ANY
+from urllib.parse import quote
+import pytest
+import pytest_asyncio
+import httpx
+from httpx import ASGITransport
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+import app.async_crud as async_crud
+import app.crud as crud
+import app.main as main
+from app.databases.db import ASYNC_DATABASE_URL, Base, SessionLocal, engine
+from app.main import app
+
+
+# Fixture: a fresh schema and an async session factory bound to this test's loop
+@pytest_asyncio.fixture(loop_scope="function")
+async def session_factory():
+    Base.metadata.create_all(bind=engine)
+    test_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    try:
+        yield async_sessionmaker(test_engine, autoflush=False, expire_on_commit=False)
+    finally:
+        await test_engine.dispose()
+        Base.metadata.drop_all(bind=engine)
+
+
+# Fixture: the app served with the async store on this test's session factory
+@pytest_asyncio.fixture(loop_scope="function")
+async def async_client(session_factory, monkeypatch):
+    async def override():
+        async with session_factory() as db:
+            yield db
+
+    monkeypatch.setattr(main, "store", async_crud)
+    app.dependency_overrides[main.get_session] = override
+    app.dependency_overrides[main.get_read_session] = override
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_async_crud_round_trip(session_factory):
+    async with session_factory() as db:
+        transaction = await async_crud.create_transaction(db, "bitcoin", 1.0, 50000.0)
+        assert transaction.id is not None
+        assert transaction.timestamp is not None
+
+        await async_crud.create_transactions(
+            db, [{"crypto_name": "ethereum", "amount": 2.0, "price_usd": 3000.0}]
+        )
+        transactions = await async_crud.get_transactions(db)
+        assert [t.crypto_name for t in transactions] == ["bitcoin", "ethereum"]
+
+        updated = await async_crud.update_transaction(
+            db, transaction.id, crypto_name="solana"
+        )
+        assert updated.crypto_name == "solana"
+        assert updated.amount == 1.0
+
+        deleted = await async_crud.delete_transaction(db, transaction.id)
+        assert deleted is not None
+        assert await async_crud.get_transaction_by_id(db, transaction.id) is None
+        assert await async_crud.update_transaction(db, transaction.id) is None
+        assert await async_crud.delete_transaction(db, transaction.id) is None
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_transaction_endpoints_async(async_client):
+    created = await async_client.post(
+        "/transactions/",
+        json={"crypto_name": "bitcoin", "amount": 1.5, "price_usd": 50000.0},
+    )
+    assert created.status_code == 200
+    transaction_id = created.json()["id"]
+
+    listed = await async_client.get("/transactions/")
+    assert [t["id"] for t in listed.json()] == [transaction_id]
+
+    updated = await async_client.put(
+        f"/transactions/{transaction_id}",
+        json={"crypto_name": "ethereum", "amount": 2.0, "price_usd": 3000.0},
+    )
+    assert updated.json()["crypto_name"] == "ethereum"
+
+    fetched = await async_client.get(f"/transactions/{transaction_id}")
+    assert fetched.json()["price_usd"] == 3000.0
+
+    patched = await async_client.patch(
+        f"/transactions/{transaction_id}", json={"amount": 4.0}
+    )
+    assert patched.json()["amount"] == 4.0
+    assert patched.json()["crypto_name"] == "ethereum"
+    assert patched.json()["price_usd"] == 3000.0
+    assert (await async_client.patch("/transactions/0", json={})).status_code == 404
+
+    deleted = await async_client.delete(f"/transactions/{transaction_id}")
+    assert deleted.status_code == 200
+    missing = await async_client.get(f"/transactions/{transaction_id}")
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_transaction_endpoints_sync_store(session_factory, monkeypatch):
+    # DB_ASYNC=false: the sync crud API runs in the threadpool
+    monkeypatch.setattr(main, "store", main.ThreadedCrud(crud))
+    app.dependency_overrides[main.get_session] = main.get_db
+    app.dependency_overrides[main.get_read_session] = main.get_read_db
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            created = await client.post(
+                "/transactions/",
+                json={"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 1.0},
+            )
+            fetched = await client.get(f"/transactions/{created.json()['id']}")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert created.status_code == 200
+    assert fetched.json()["crypto_name"] == "bitcoin"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_transactions_cursor_pagination(async_client, session_factory):
+    async with session_factory() as db:
+        await async_crud.create_transactions(
+            db,
+            [
+                {"crypto_name": f"coin{i}", "amount": 1.0, "price_usd": float(i)}
+                for i in range(5)
+            ],
+        )
+
+    seen = []
+    response = await async_client.get("/transactions/?limit=2")
+    while True:
+        seen.extend(t["crypto_name"] for t in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = await async_client.get(f"/transactions/?limit=2&cursor={cursor}")
+
+    assert seen == [f"coin{i}" for i in range(5)]
+
+    # Legacy offset paging still works
+    legacy = await async_client.get("/transactions/?skip=3&limit=2")
+    assert [t["crypto_name"] for t in legacy.json()] == ["coin3", "coin4"]
+
+    invalid = await async_client.get("/transactions/?cursor=not-a-cursor")
+    assert invalid.status_code == 400
+
+
+# Both export implementations: the async generator and the threadpool one
+@pytest.mark.parametrize("db_async", [True, False])
+@pytest.mark.asyncio(loop_scope="function")
+async def test_export_streams_ndjson_and_csv(
+    async_client, session_factory, monkeypatch, db_async
+):
+    monkeypatch.setattr(main, "db_async", db_async)
+    export_factory = session_factory if db_async else SessionLocal
+    app.dependency_overrides[main.get_session_factory] = lambda: export_factory
+    async with session_factory() as db:
+        await async_crud.create_transaction(db, "bitcoin", 1.0, 50000.0)
+        await async_crud.create_transaction(db, "ethereum", 2.0, 3000.0)
+        await async_crud.create_transaction(db, "bitcoin", 0.5, 51000.0)
+
+    ndjson = await async_client.get("/transactions/export?crypto_name=bitcoin")
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [line["price_usd"] for line in lines] == [50000.0, 51000.0]
+
+    # Rows match the regular endpoint's serialisation
+    listed = await async_client.get(f"/transactions/{lines[0]['id']}")
+    assert lines[0] == listed.json()
+
+    exported = await async_client.get("/transactions/export?format=csv")
+    assert exported.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(exported.text)))
+    assert rows[0] == ["id", "crypto_name", "amount", "price_usd", "timestamp"]
+    assert [row[1] for row in rows[1:]] == ["bitcoin", "ethereum", "bitcoin"]
+    assert rows[1][2:4] == ["1.0", "50000.0"]
+
+    # Time range filter: [start, end)
+    start = quote(lines[1]["timestamp"])
+    ranged = await async_client.get(f"/transactions/export?start={start}")
+    assert [json.loads(line)["id"] for line in ranged.text.splitlines()] == [
+        lines[1]["id"]
+    ]
+    empty = await async_client.get(
+        f"/transactions/export?end={quote(lines[0]['timestamp'])}"
+    )
+    assert empty.text == ""
+
+    invalid = await async_client.get("/transactions/export?format=xml")
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bulk_ingest_json_array(async_client):
+    items = [
+        {"crypto_name": f"coin{i}", "amount": 1.0, "price_usd": float(i)}
+        for i in range(7)
+    ]
+    items.insert(3, {"crypto_name": "bad", "amount": -1, "price_usd": 1.0})
+
+    response = await async_client.post(
+        "/transactions/bulk?chunk_size=3&report_errors=true", json=items
+    )
+    body = response.json()
+    assert response.status_code == 200
+    assert body["inserted"] == 7
+    assert body["rejected"] == 1
+    assert body["errors"][0]["index"] == 3
+    assert body["errors"][0]["errors"][0]["loc"] == ["amount"]
+
+    listed = await async_client.get("/transactions/")
+    assert [t["id"] for t in listed.json()] == body["ids"]
+    assert [t["crypto_name"] for t in listed.json()] == [f"coin{i}" for i in range(7)]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bulk_ingest_ndjson_stream(async_client):
+    lines = [
+        json.dumps({"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 1.0}),
+        "not json",
+        "",
+        json.dumps({"crypto_name": "ethereum", "amount": 2.0, "price_usd": 2.0}),
+    ]
+
+    async def body():
+        # Split mid-line to exercise the stream reassembly
+        data = "\n".join(lines).encode()
+        yield data[:10]
+        yield data[10:]
+
+    response = await async_client.post(
+        "/transactions/bulk",
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    result = response.json()
+    assert result["inserted"] == 2
+    assert result["rejected"] == 1
+    assert result["errors"] is None
+
+    reported = await async_client.post(
+        "/transactions/bulk?report_errors=true",
+        content="not json\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert reported.json()["errors"] == [
+        {"index": 0, "errors": [{"type": "json_invalid", "msg": ANY}]}
+    ]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bulk_ingest_rejects_non_array(async_client):
+    response = await async_client.post("/transactions/bulk", json={"a": 1})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_rollups_endpoint(async_client, session_factory):
+    day = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    async with session_factory() as db:
+        await async_crud.create_transactions(
+            db,
+            [
+                {
+                    "crypto_name": "bitcoin",
+                    "amount": 1.0,
+                    "price_usd": price,
+                    "timestamp": day + timedelta(minutes=minutes),
+                }
+                for minutes, price in ((0, 100.0), (30, 120.0), (90, 110.0))
+            ],
+        )
+
+    hourly = await async_client.get("/rollups/bitcoin?resolution=hour")
+    assert hourly.status_code == 200
+    assert hourly.json() == [
+        {
+            "bucket": "2026-01-05T00:00:00+00:00",
+            "open": 100.0,
+            "high": 120.0,
+            "low": 100.0,
+            "close": 120.0,
+            "volume": 2.0,
+            "count": 2,
+        },
+        {
+            "bucket": "2026-01-05T01:00:00+00:00",
+            "open": 110.0,
+            "high": 110.0,
+            "low": 110.0,
+            "close": 110.0,
+            "volume": 1.0,
+            "count": 1,
+        },
+    ]
+
+    daily = await async_client.get("/rollups/bitcoin", params={"resolution": "day"})
+    assert [(c["open"], c["close"], c["count"]) for c in daily.json()] == [
+        (100.0, 110.0, 3)
+    ]
+    invalid = await async_client.get("/rollups/bitcoin?resolution=week")
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_conditional_transaction_reads(async_client, monkeypatch):
+    created = await async_client.post(
+        "/transactions/",
+        json={"crypto_name": "bitcoin", "amount": 1.5, "price_usd": 50000.0},
+    )
+    transaction_id = created.json()["id"]
+    url = f"/transactions/{transaction_id}"
+
+    first = await async_client.get(url)
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+    assert first.headers["cache-control"] == "no-cache"
+    assert first.json() == created.json()
+
+    # Repeat reads come from the cache, without a query
+    async def no_query(*args, **kwargs):
+        raise AssertionError("read went to the database")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(async_crud, "get_transaction_by_id", no_query)
+        not_modified = await async_client.get(url, headers={"If-None-Match": etag})
+        since = await async_client.get(
+            url, headers={"If-Modified-Since": last_modified}
+        )
+        assert (await async_client.get(url)).content == first.content
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert since.status_code == 304
+
+    # An update invalidates the cached body and changes the validators
+    await async_client.patch(url, json={"amount": 4.0})
+    changed = await async_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["amount"] == 4.0
+    assert changed.headers["etag"] != etag
+    assert changed.headers["last-modified"] >= last_modified
+
+    listed = await async_client.get("/transactions/")
+    list_etag = listed.headers["etag"]
+    assert "last-modified" not in listed.headers
+    again = await async_client.get(
+        "/transactions/", headers={"If-None-Match": f'W/"other", {list_etag}'}
+    )
+    assert again.status_code == 304
+
+    await async_client.delete(url)
+    assert (await async_client.get(url)).status_code == 404
+    emptied = await async_client.get(
+        "/transactions/", headers={"If-None-Match": list_etag}
+    )
+    assert emptied.status_code == 200
+    assert emptied.json() == []
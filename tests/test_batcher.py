@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+import httpx
+from httpx import ASGITransport
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+from app.services.batcher import PriceBatcher
+from app.main import app
+
+
+class StubUpstream:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, ids: str, vs_currencies: str):
+        self.calls.append((ids.split(","), vs_currencies))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {
+            coin: {vs: float(len(coin)) for vs in vs_currencies.split(",")}
+            for coin in ids.split(",")
+        }
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_distinct_ids_share_one_call():
+    upstream = StubUpstream()
+    batcher = PriceBatcher(upstream, window_ms=5, max_size=100, name="b_share")
+    coins = [f"coin{i}" for i in range(50)]
+
+    prices = await asyncio.gather(*(batcher.get(coin, "usd") for coin in coins))
+
+    assert len(upstream.calls) == 1
+    assert sorted(upstream.calls[0][0]) == sorted(coins)
+    assert prices == [float(len(coin)) for coin in coins]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_batch_size_cap_and_histogram():
+    upstream = StubUpstream()
+    batcher = PriceBatcher(upstream, window_ms=5, max_size=20, name="b_cap")
+
+    await asyncio.gather(*(batcher.get(f"coin{i}", "usd") for i in range(45)))
+
+    assert [len(ids) for ids, _ in upstream.calls] == [20, 20, 5]
+    histogram = metrics.snapshot()["b_cap_size"]
+    assert histogram["count"] == 3
+    assert histogram["sum"] == 45
+    assert histogram["buckets"]["5"] == 1
+    assert histogram["buckets"]["20"] == 3
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_vs_currencies_share_one_call():
+    upstream = StubUpstream()
+    batcher = PriceBatcher(upstream, window_ms=5, max_size=20, name="b_vs")
+
+    usd, eur, eth = await asyncio.gather(
+        batcher.get("bitcoin", "usd"),
+        batcher.get("bitcoin", "eur"),
+        batcher.get("ethereum", "usd"),
+    )
+
+    assert usd == eur == 7.0
+    assert eth == 8.0
+    assert upstream.calls == [(["bitcoin", "ethereum"], "eur,usd")]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_failure_fans_out_to_batch():
+    batcher = PriceBatcher(StubUpstream(fail=True), window_ms=5, name="b_fail")
+
+    results = await asyncio.gather(
+        *(batcher.get(f"coin{i}", "usd") for i in range(5)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_cancelled_caller_does_not_cancel_batch():
+    upstream = StubUpstream()
+    batcher = PriceBatcher(upstream, window_ms=5, name="b_cancel")
+
+    cancelled = asyncio.create_task(batcher.get("bitcoin", "usd"))
+    kept = asyncio.create_task(batcher.get("ethereum", "usd"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await kept == 8.0
+    assert upstream.calls[0][0] == ["bitcoin", "ethereum"]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_crypto_endpoint_batches_distinct_coins(monkeypatch):
+    monkeypatch.setattr(crud, "create_transactions", lambda *args, **kwargs: None)
+    requested = []
+
+    def handler(request: httpx.Request):
+        ids = request.url.params["ids"].split(",")
+        requested.append(ids)
+        return httpx.Response(200, json={coin: {"usd": 1.0} for coin in ids})
+
+    coins = [f"coin{i}" for i in range(30)]
+    await gecko.start_client(transport=httpx.MockTransport(handler))
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as async_client:
+            responses = await asyncio.gather(
+                *(async_client.get(f"/crypto/{coin}") for coin in coins)
+            )
+    finally:
+        await gecko.close_client()
+
+    assert [response.json()["crypto_name"] for response in responses] == coins
+    assert len(requested) < len(coins)
+    assert sorted(sum(requested, [])) == sorted(coins)
+
+    stats = metrics.snapshot()
+    assert "price_batch_window_seconds" in stats
+    assert "price_batch_max_size" in stats
+    assert stats["price_batch_size"]["count"] >= 1
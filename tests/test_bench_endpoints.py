@@ -0,0 +1,33 @@
+from benchmarks.bench_endpoints import compare
+
+
+def result(p95_ms, rps, error_rate=0.0):
+    return {"p95_ms": p95_ms, "rps": rps, "error_rate": error_rate}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {
+        "endpoints": {
+            "get_transaction": result(10.0, 1000.0),
+            "list_transactions": result(20.0, 500.0),
+            "stats": result(2.0, 3000.0),
+        }
+    }
+    current = {
+        "endpoints": {
+            # Within tolerance
+            "get_transaction": result(11.5, 900.0),
+            "list_transactions": result(30.0, 350.0, error_rate=0.05),
+            "stats": result(1.0, 4000.0),
+            # Not in the baseline
+            "metrics": result(5.0, 100.0),
+        }
+    }
+    assert compare(baseline, current, tolerance=0.2) == {
+        "list_transactions": {
+            "p95_ms": [20.0, 30.0],
+            "rps": [500.0, 350.0],
+            "error_rate": [0.0, 0.05],
+        }
+    }
+    assert compare(baseline, baseline, tolerance=0.0) == {}
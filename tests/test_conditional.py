@@ -0,0 +1,92 @@
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
+from app.services.conditional import http_date, not_modified
+from app.services.transaction_cache import TransactionCache
+
+MODIFIED = datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+
+# Shaped like the Row from get_transaction_by_id
+class Row(NamedTuple):
+    id: int
+    crypto_name: str
+    amount: float
+    price_usd: float
+    timestamp: datetime
+    updated_at: datetime
+
+
+def row(transaction_id, amount=1.0, updated_at=None):
+    return Row(transaction_id, "bitcoin", amount, 100.0, MODIFIED, updated_at)
+
+
+def test_not_modified():
+    etag = '"abc"'
+    assert http_date(MODIFIED) == "Fri, 02 Jan 2026 03:04:05 GMT"
+    assert not_modified({"if-none-match": '"abc"'}, etag)
+    assert not_modified({"if-none-match": 'W/"abc"'}, etag)
+    assert not_modified({"if-none-match": '"x", "abc"'}, etag)
+    assert not_modified({"if-none-match": "*"}, etag)
+    assert not not_modified({"if-none-match": '"x"'}, etag)
+    assert not not_modified({}, etag, MODIFIED)
+
+    # Second resolution: the same second is not modified, the next one is
+    same_second = {"if-modified-since": http_date(MODIFIED)}
+    assert not_modified(same_second, etag, MODIFIED)
+    earlier = {"if-modified-since": "Fri, 02 Jan 2026 03:04:04 GMT"}
+    assert not not_modified(earlier, etag, MODIFIED)
+    assert not not_modified({"if-modified-since": "yesterday"}, etag, MODIFIED)
+    # If-None-Match takes precedence over If-Modified-Since
+    both = {"if-none-match": '"x"', **same_second}
+    assert not not_modified(both, etag, MODIFIED)
+
+
+def test_transaction_cache_ttl_lru_and_invalidation(clock):
+    cache = TransactionCache(ttl=5, max_entries=2, clock=clock, name="t_tx_cache")
+
+    entry = cache.put(1, row(1), cache.version)
+    assert entry.body.startswith(b'{"id":1,')
+    assert entry.last_modified == MODIFIED
+    assert cache.get(1) is entry
+
+    cache.put(2, row(2), cache.version)
+    assert cache.get(1) is entry
+    cache.put(3, row(3), cache.version)
+    assert cache.get(2) is None
+    assert len(cache) == 2
+
+    clock.now += 6
+    assert cache.get(1) is None
+
+    # A read that started before an invalidation is not stored
+    version = cache.version
+    cache.put(3, row(3), version)
+    cache.invalidate(3)
+    assert cache.get(3) is None
+    stale = cache.put(3, row(3), version)
+    assert cache.get(3) is None
+    fresh = cache.put(3, row(3, amount=2.0, updated_at=MODIFIED), cache.version)
+    assert cache.get(3) is fresh
+    assert fresh.etag != stale.etag
+
+
+def test_transaction_cache_get_is_atomic_with_invalidation(clock):
+    cache = TransactionCache(ttl=60, clock=clock, name="t_tx_race")
+    entry = cache.put(1, row(1), cache.version)
+    invalidations = []
+
+    # get() reads the clock between its lookup and the LRU reorder; a
+    # worker thread invalidates right there
+    def invalidating_clock():
+        worker = threading.Thread(target=cache.invalidate, args=(1,))
+        invalidations.append(worker)
+        worker.start()
+        worker.join(timeout=0.2)
+        return clock()
+
+    cache.clock = invalidating_clock
+    assert cache.get(1) is entry
+    cache.clock = clock
+    invalidations[0].join()
+    assert cache.get(1) is None
@@ -1,33 +1,17 @@
 # test_db.py
-import pytest
 from sqlalchemy.orm import Session
-from app.databases.db import Base, engine, SessionLocal
-from app.models.model import Transaction
 from app.crud import (
     create_transaction,
+    create_transactions,
+    create_transactions_returning,
     get_transactions,
+    get_transactions_after,
     get_transaction_by_id,
     update_transaction,
     delete_transaction,
 )
 
 
-# Fixture to create a new database session for each test
-@pytest.fixture(scope="function")
-def db_session():
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
-
-    # Create a new session
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        # Drop all tables after the test
-        Base.metadata.drop_all(bind=engine)
-
-
 # Test create_transaction
 def test_create_transaction(db_session: Session):
     transaction = create_transaction(db_session, "bitcoin", 1.0, 50000.0)
@@ -64,6 +48,8 @@ def test_update_transaction(db_session: Session):
     )
     assert updated_transaction is not None
     assert updated_transaction.crypto_name == "ethereum"
+    assert updated_transaction.price_usd == 50000.0
+    assert update_transaction(db_session, transaction.id + 1, amount=2.0) is None
 
 
 # Test delete_transaction
@@ -71,4 +57,63 @@ def test_delete_transaction(db_session: Session):
     transaction = create_transaction(db_session, "bitcoin", 1.0, 50000.0)
     deleted_transaction = delete_transaction(db_session, transaction.id)
     assert deleted_transaction is not None
+    assert deleted_transaction.crypto_name == "bitcoin"
     assert get_transaction_by_id(db_session, transaction.id) is None
+    assert delete_transaction(db_session, transaction.id) is None
+
+
+# Test create_transactions
+def test_create_transactions(db_session: Session):
+    count = create_transactions(
+        db_session,
+        [
+            {"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 50000.0},
+            {"crypto_name": "ethereum", "amount": 1.0, "price_usd": 3000.0},
+        ],
+    )
+    assert count == 2
+    transactions = get_transactions(db_session)
+    assert {t.crypto_name for t in transactions} == {"bitcoin", "ethereum"}
+    assert create_transactions(db_session, []) == 0
+
+
+# Test get_transactions_after (keyset pagination)
+def test_get_transactions_after(db_session: Session):
+    # One multi-row insert: every row shares the same timestamp
+    create_transactions(
+        db_session,
+        [
+            {"crypto_name": f"coin{i}", "amount": 1.0, "price_usd": float(i)}
+            for i in range(5)
+        ],
+    )
+    create_transaction(db_session, "bitcoin", 1.0, 50000.0)
+
+    seen = []
+    cursor = None
+    while True:
+        page = get_transactions_after(db_session, cursor, limit=2)
+        seen.extend(t.crypto_name for t in page)
+        if len(page) < 2:
+            break
+        cursor = (page[-1].timestamp, page[-1].id)
+
+    assert seen == ["coin0", "coin1", "coin2", "coin3", "coin4", "bitcoin"]
+    assert [t.crypto_name for t in get_transactions(db_session, 4, 2)] == [
+        "coin4",
+        "bitcoin",
+    ]
+
+
+# Test create_transactions_returning
+def test_create_transactions_returning(db_session: Session):
+    ids = create_transactions_returning(
+        db_session,
+        [
+            {"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 50000.0},
+            {"crypto_name": "ethereum", "amount": 1.0, "price_usd": 3000.0},
+        ],
+    )
+    assert len(ids) == 2
+    assert get_transaction_by_id(db_session, ids[1]).crypto_name == "ethereum"
+    assert create_transactions_returning(db_session, []) == []
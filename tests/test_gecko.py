@@ -0,0 +1,77 @@
+import pytest
+import httpx
+import app.services.gecko as gecko
+from app.main import app
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_lifespan_manages_shared_client():
+    async with app.router.lifespan_context(app):
+        client = gecko.get_client()
+        assert not client.is_closed
+        assert gecko.get_client() is client
+
+    assert client.is_closed
+    assert gecko._client is None
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_client_limits_and_timeouts():
+    client = gecko.build_client()
+    try:
+        assert client.timeout.connect == gecko.GECKO_CONNECT_TIMEOUT
+        assert client.timeout.read == gecko.GECKO_READ_TIMEOUT
+        assert client.timeout.pool == gecko.GECKO_POOL_TIMEOUT
+        assert str(client.base_url).rstrip("/") == gecko.GECKO_BASE_URL
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_crypto_endpoint_uses_shared_client(no_persist, get, stub_transport):
+    calls = []
+    client = await gecko.start_client(transport=stub_transport(calls))
+    try:
+        first = await get("/crypto/bitcoin")
+        second = await get("/crypto/ethereum")
+        assert gecko.get_client() is client
+    finally:
+        await gecko.close_client()
+
+    assert first.status_code == 200
+    assert first.json() == {
+        "crypto_name": "bitcoin",
+        "price_usd": 100.0,
+        "source": "live",
+    }
+    assert second.status_code == 200
+    assert len(calls) == 2
+    assert calls[0].url.path.endswith("/simple/price")
+    assert calls[0].url.params["ids"] == "bitcoin"
+    assert calls[0].url.params["vs_currencies"] == "usd"
+    assert calls[1].url.params["ids"] == "ethereum"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_crypto_endpoint_upstream_status(no_persist, get, stub_transport):
+    await gecko.start_client(transport=stub_transport([], status_code=429))
+    try:
+        response = await get("/crypto/bitcoin")
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 429
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_crypto_endpoint_upstream_timeout(no_persist, get):
+    def handler(request: httpx.Request):
+        raise httpx.ReadTimeout("stub timeout", request=request)
+
+    await gecko.start_client(transport=httpx.MockTransport(handler))
+    try:
+        response = await get("/crypto/bitcoin")
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 504
@@ -0,0 +1,72 @@
+import logging
+import pytest
+import httpx
+from fastapi import FastAPI, HTTPException
+from httpx import ASGITransport
+import app.services.metrics as metrics
+from app.services.instrumentation import InstrumentationMiddleware
+
+
+def instrumented_app(name, **kwargs):
+    test_app = FastAPI()
+
+    @test_app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"item_id": item_id}
+
+    @test_app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    test_app.add_middleware(InstrumentationMiddleware, name=name, **kwargs)
+    return test_app
+
+
+async def get(test_app, *urls):
+    async with httpx.AsyncClient(
+        transport=ASGITransport(app=test_app, raise_app_exceptions=False),
+        base_url="http://test",
+    ) as client:
+        return [await client.get(url) for url in urls]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_metrics_by_route_template():
+    test_app = instrumented_app("t_http")
+    responses = await get(
+        test_app, "/items/1", "/items/2", "/items/0", "/missing", "/boom"
+    )
+    assert [r.status_code for r in responses] == [200, 200, 404, 404, 500]
+
+    snapshot = metrics.snapshot()
+    assert snapshot["t_http_requests_total"] == {
+        "GET /boom 500": 1,
+        "GET /items/{item_id} 200": 2,
+        "GET /items/{item_id} 404": 1,
+        "GET unmatched 404": 1,
+    }
+    latency = snapshot["t_http_request_duration_seconds"]
+    assert latency["GET /items/{item_id}"]["count"] == 3
+    assert latency["GET /boom"]["buckets"]["+Inf"] == 1
+    assert snapshot["t_http_requests_in_flight"] == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_access_log_sampling(caplog):
+    caplog.set_level(logging.INFO, logger="app.access")
+    test_app = instrumented_app("t_http_sampled", sample_rate=0.0)
+    await get(test_app, "/items/1", "/boom")
+
+    # Unsampled, but server errors are always logged
+    messages = [r.getMessage() for r in caplog.records if r.name == "app.access"]
+    assert len(messages) == 1
+    assert "route=/boom status=500" in messages[0]
+
+    caplog.clear()
+    await get(instrumented_app("t_http_all", sample_rate=1.0), "/items/7")
+    (record,) = [r for r in caplog.records if r.name == "app.access"]
+    assert record.getMessage().startswith(
+        "method=GET path=/items/7 route=/items/{item_id} status=200 duration_ms="
+    )
@@ -0,0 +1,116 @@
+# test_latest_prices.py
+from datetime import datetime, timedelta, timezone
+import pytest
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.prices as prices
+
+
+# Observed prices still reach the snapshot table, just not transactions
+@pytest.fixture(autouse=True)
+def no_transactions(monkeypatch):
+    monkeypatch.setattr(crud, "create_transactions", lambda *args, **kwargs: None)
+
+
+def observation(crypto_name, price, seconds_ago=0.0, vs_currency="usd"):
+    return {
+        "crypto_name": crypto_name,
+        "vs_currency": vs_currency,
+        "price": price,
+        "observed_at": datetime.now(timezone.utc) - timedelta(seconds=seconds_ago),
+    }
+
+
+def test_upsert_keeps_newest_observation(db_session):
+    crud.upsert_latest_prices(
+        db_session,
+        [observation("bitcoin", 1.0, 10), observation("bitcoin", 2.0, 5)],
+    )
+    # An older observation arriving late does not overwrite a newer one
+    crud.upsert_latest_prices(db_session, [observation("bitcoin", 3.0, 60)])
+    crud.upsert_latest_prices(db_session, [observation("bitcoin", 4.0, 0, "eur")])
+
+    assert crud.get_latest_price(db_session, "bitcoin").price == 2.0
+    assert crud.get_latest_price(db_session, "bitcoin", "eur").price == 4.0
+    assert crud.get_latest_price(db_session, "ethereum") is None
+    assert crud.upsert_latest_prices(db_session, []) == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_observations_are_snapshotted(db_session, get, stub_transport):
+    await gecko.start_client(transport=stub_transport([], price=42.0))
+    try:
+        response = await get("/crypto/bitcoin")
+    finally:
+        await gecko.close_client()
+
+    assert response.json()["source"] == "live"
+    assert crud.get_latest_price(db_session, "bitcoin").price == 42.0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_upstream_failure_served_from_snapshot(db_session, get, stub_transport):
+    crud.upsert_latest_prices(db_session, [observation("bitcoin", 7.0, 3600)])
+    calls = []
+    await gecko.start_client(transport=stub_transport(calls, status_code=503))
+    try:
+        response = await get("/crypto/bitcoin")
+        missing = await get("/crypto/ethereum")
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "crypto_name": "bitcoin",
+        "price_usd": 7.0,
+        "source": "snapshot",
+    }
+    assert response.headers["X-Cache"] == "SNAPSHOT"
+    assert int(response.headers["Age"]) >= 3600
+    # No snapshot to fall back to: the upstream error is surfaced
+    assert missing.status_code == 503
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_recent_snapshot_served_without_upstream(
+    db_session, monkeypatch, stub_transport
+):
+    monkeypatch.setattr(prices, "LATEST_PRICE_MAX_AGE", 60.0)
+    crud.upsert_latest_prices(
+        db_session, [observation("bitcoin", 5.0, 10), observation("ethereum", 6.0, 600)]
+    )
+    calls = []
+    await gecko.start_client(transport=stub_transport(calls, price=100.0))
+    try:
+        recent = await prices.get_price("bitcoin")
+        old = await prices.get_price("ethereum")
+    finally:
+        await gecko.close_client()
+
+    assert (recent.price, recent.source) == (5.0, "snapshot")
+    assert (old.price, old.source) == (100.0, "live")
+    assert len(calls) == 1
+    # The snapshot also seeded the cache
+    assert (await prices.get_price("bitcoin")).source == "cached"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_warm_cache_prevents_upstream_stampede(db_session):
+    window = prices.price_cache.ttl + prices.price_cache.stale_ttl
+    crud.upsert_latest_prices(
+        db_session,
+        [
+            observation("bitcoin", 1.0, 1),
+            observation("ethereum", 2.0, prices.price_cache.ttl + 1),
+            observation("dogecoin", 3.0, window + 60),
+        ],
+    )
+
+    assert await prices.warm_cache() == 2
+
+    fresh = await prices.get_price("bitcoin")
+    stale = await prices.get_price("ethereum")
+    assert (fresh.price, fresh.cache_status) == (1.0, prices.HIT)
+    assert (stale.price, stale.cache_status) == (2.0, prices.STALE)
+    assert len(prices.price_cache) == 2
+    await prices.shutdown()
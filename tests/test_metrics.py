@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+import httpx
+from httpx import ASGITransport
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+from app.databases.db import ASYNC_DATABASE_URL, SessionLocal, engine
+from app.databases.timing import instrument_queries, statement_kind
+from app.main import app
+from benchmarks.stub_gecko import create_stub_app
+
+
+def test_render_text_format():
+    metrics.counter("t_render_total", "Plain counter").inc(3)
+    metrics.counter(
+        "t_render_labelled_total", "Labelled\ncounter", labels=("path",)
+    ).labels('a"b\\c').inc()
+    family = metrics.histogram(
+        "t_render_seconds", "Latency", (0.1, 1), labels=("route",)
+    )
+    family.labels("/x").observe(0.5)
+    metrics.gauge("t_render_unset", "Gauge without a value", lambda: None)
+    metrics.gauge("t_render_by_key", "Per key", lambda: {"btc": 1.5}, label="key")
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE t_render_total counter" in lines
+    assert "t_render_total 3" in lines
+    assert "# HELP t_render_labelled_total Labelled\\ncounter" in lines
+    assert 't_render_labelled_total{path="a\\"b\\\\c"} 1' in lines
+    assert 't_render_seconds_bucket{route="/x",le="0.1"} 0' in lines
+    assert 't_render_seconds_bucket{route="/x",le="1"} 1' in lines
+    assert 't_render_seconds_bucket{route="/x",le="+Inf"} 1' in lines
+    assert 't_render_seconds_sum{route="/x"} 0.5' in lines
+    assert 't_render_seconds_count{route="/x"} 1' in lines
+    assert "# TYPE t_render_unset gauge" in lines
+    assert not any(line.startswith("t_render_unset ") for line in lines)
+    assert 't_render_by_key{key="btc"} 1.5' in lines
+
+
+def test_statement_kind():
+    assert statement_kind("SELECT 1") == "SELECT"
+    assert statement_kind("  insert into t values (1)") == "INSERT"
+    assert statement_kind("WITH x AS (SELECT 1) SELECT * FROM x") == "WITH"
+    assert statement_kind("SAVEPOINT sa_1") == "OTHER"
+    assert statement_kind("") == "OTHER"
+
+
+def commits(name: str) -> int:
+    return metrics.snapshot()["db_commit_duration_seconds"][name]["count"]
+
+
+# Timed through engine and session events; the dialect is left alone
+def test_commit_duration_sync():
+    before = commits("sync")
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        db.commit()
+        # Nothing to commit: no COMMIT is sent
+        db.commit()
+    finally:
+        db.close()
+    assert commits("sync") == before + 1
+
+    with engine.begin() as connection:
+        connection.execute(text("SELECT 1"))
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        connection.commit()
+        connection.execute(text("SELECT 1"))
+        connection.commit()
+    assert commits("sync") == before + 4
+    assert "do_commit" not in vars(engine.dialect)
+
+
+# Concurrent async sessions each time their own COMMIT
+@pytest.mark.asyncio(loop_scope="function")
+async def test_commit_duration_async():
+    test_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    instrument_queries(test_engine.sync_engine, "t_async_commit")
+    session_factory = async_sessionmaker(test_engine)
+
+    async def commit():
+        async with session_factory() as db:
+            await db.execute(text("SELECT pg_sleep(0.01)"))
+            await db.commit()
+
+    try:
+        await asyncio.gather(*(commit() for _ in range(5)))
+    finally:
+        await test_engine.dispose()
+    assert commits("t_async_commit") == 5
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(crud, "create_transactions", lambda *args, **kwargs: None)
+    monkeypatch.setattr(crud, "upsert_latest_prices", lambda *args, **kwargs: None)
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        db.commit()
+    finally:
+        db.close()
+
+    await gecko.start_client(transport=ASGITransport(app=create_stub_app()))
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            assert (await client.get("/crypto/bitcoin")).status_code == 200
+            response = await client.get("/metrics")
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    samples = {line.split(" ")[0] for line in lines if not line.startswith("#")}
+    assert (
+        'http_requests_total{method="GET",route="/crypto/{crypto_name}",status="200"}'
+        in samples
+    )
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/crypto/{crypto_name}"}'
+        in samples
+    )
+    assert 'gecko_responses_total{endpoint="simple/price",outcome="200"}' in samples
+    assert 'gecko_request_duration_seconds_count{endpoint="simple/price"}' in samples
+    assert (
+        'db_query_duration_seconds_count{engine="sync",statement="SELECT"}' in samples
+    )
+    assert 'db_commit_duration_seconds_count{engine="sync"}' in samples
+    # Read on the event loop, so the threadpool is visible
+    assert "threadpool_capacity" in samples
+    assert "threadpool_in_use" in samples
+    assert "threadpool_waiting" in samples
@@ -0,0 +1,128 @@
+# test_partitions.py
+from datetime import date, datetime, timezone
+import pytest
+from sqlalchemy import text
+import app.crud as crud
+import app.databases.partitions as partitions
+from app.databases.db import Base, SessionLocal, engine
+
+
+@pytest.fixture(scope="function")
+def connection():
+    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.connect() as connection:
+            yield connection
+    finally:
+        with engine.begin() as connection:
+            connection.execute(
+                text(f"DROP SCHEMA IF EXISTS {partitions.ARCHIVE_SCHEMA} CASCADE")
+            )
+        Base.metadata.drop_all(bind=engine)
+
+
+def insert(rows):
+    db = SessionLocal()
+    try:
+        crud.create_transactions(
+            db,
+            [
+                {
+                    "crypto_name": "bitcoin",
+                    "amount": 1.0,
+                    "price_usd": 1.0,
+                    "timestamp": ts,
+                }
+                for ts in rows
+            ],
+        )
+    finally:
+        db.close()
+
+
+def placement(connection):
+    return dict(
+        connection.execute(
+            text("SELECT id, tableoid::regclass::text FROM transactions ORDER BY id")
+        ).all()
+    )
+
+
+def test_month_helpers():
+    assert partitions.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert partitions.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partitions.month_start(date(2026, 5, 17)) == date(2026, 5, 1)
+    assert partitions.partition_name(date(2026, 5, 1)) == "transactions_2026_05"
+
+
+def test_ensure_partitions_routes_rows(connection):
+    created = partitions.ensure_partitions(connection, 2, today=date(2026, 1, 15))
+    assert created == [
+        "transactions_2026_01",
+        "transactions_2026_02",
+        "transactions_2026_03",
+    ]
+    assert partitions.ensure_partitions(connection, 2, today=date(2026, 1, 15)) == []
+    connection.commit()
+
+    insert(
+        [
+            datetime(2025, 12, 31, 23, 59, tzinfo=timezone.utc),
+            datetime(2026, 1, 1, tzinfo=timezone.utc),
+            datetime(2026, 3, 31, 12, tzinfo=timezone.utc),
+        ]
+    )
+    assert list(placement(connection).values()) == [
+        "transactions_default",
+        "transactions_2026_01",
+        "transactions_2026_03",
+    ]
+
+
+def test_create_skips_months_held_by_default_partition(connection):
+    connection.commit()
+    insert([datetime(2026, 5, 3, tzinfo=timezone.utc)])
+
+    created = partitions.create_partitions(
+        connection, date(2026, 4, 1), date(2026, 6, 1)
+    )
+    assert created == ["transactions_2026_04", "transactions_2026_06"]
+    assert [name for _, name in partitions.list_partitions(connection)] == created
+
+
+@pytest.mark.parametrize("mode", [partitions.DROP, partitions.ARCHIVE])
+def test_retention_retires_whole_partitions(connection, mode):
+    partitions.create_partitions(connection, date(2026, 1, 1), date(2026, 4, 1))
+    connection.commit()
+    insert(
+        [
+            datetime(2026, 1, 10, tzinfo=timezone.utc),
+            datetime(2026, 2, 10, tzinfo=timezone.utc),
+            datetime(2026, 4, 10, tzinfo=timezone.utc),
+        ]
+    )
+
+    assert partitions.apply_retention(connection, 0, mode) == []
+    # One full month kept behind the current one: March and April stay
+    removed = partitions.apply_retention(connection, 1, mode, today=date(2026, 4, 20))
+    assert removed == ["transactions_2026_01", "transactions_2026_02"]
+    assert list(placement(connection).values()) == ["transactions_2026_04"]
+
+    archived = connection.execute(
+        text(
+            "SELECT count(*) FROM information_schema.tables "
+            "WHERE table_schema = :schema"
+        ),
+        {"schema": partitions.ARCHIVE_SCHEMA},
+    ).scalar()
+    assert archived == (2 if mode == partitions.ARCHIVE else 0)
+    # Rollups outlive the raw rows
+    candles = connection.execute(
+        text("SELECT count(*) FROM price_rollups WHERE resolution = 'day'")
+    ).scalar()
+    assert candles == 3
+
+
+def test_retention_rejects_unknown_mode(connection):
+    with pytest.raises(ValueError):
+        partitions.apply_retention(connection, 1, "truncate")
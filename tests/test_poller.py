@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+import httpx
+from httpx import ASGITransport
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+import app.services.prices as prices
+from app.main import app
+from app.services.poller import PricePoller
+from app.services.price_cache import FRESH
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_poll_fills_cache_in_batches(no_persist, clock, stub_transport):
+    calls = []
+    poller = PricePoller(
+        ["bitcoin", "ethereum", "unknown"],
+        ["usd", "eur"],
+        batch_size=2,
+        clock=clock,
+        name="t_poll",
+    )
+    # "unknown" is not quoted
+    quotes = {"bitcoin": 100.0, "ethereum": 101.0}
+    await gecko.start_client(transport=stub_transport(calls, quotes=quotes))
+    try:
+        assert await poller.poll() == 2
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            response = await client.get("/crypto/ethereum")
+    finally:
+        await gecko.close_client()
+
+    assert [call.url.params["ids"] for call in calls] == ["bitcoin,ethereum", "unknown"]
+    assert calls[0].url.params["vs_currencies"] == "usd,eur"
+    entry, state = prices.price_cache.get(("bitcoin", "eur"))
+    assert (entry.price, state) == (100.0, FRESH)
+
+    # Served from memory, no further upstream call
+    assert response.json()["price_usd"] == 101.0
+    assert response.headers["X-Cache"] == "HIT"
+    assert len(calls) == 2
+
+    clock.now += 4
+    assert poller.staleness() == {"bitcoin": 4.0, "ethereum": 4.0}
+    snapshot = metrics.snapshot()
+    assert snapshot["t_poll_max_staleness_seconds"] == 4.0
+    assert snapshot["t_poll_rounds_total"] == 1
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_poll_failures_are_counted(no_persist, stub_transport):
+    poller = PricePoller(["bitcoin"], ["usd"], name="t_poll_errors")
+    await gecko.start_client(transport=stub_transport([], status_code=404))
+    try:
+        assert await poller.poll() == 0
+    finally:
+        await gecko.close_client()
+
+    assert poller.errors.value == 1
+    assert poller.staleness() == {}
+    assert prices.price_cache.get(("bitcoin", "usd")) == (None, None)
+
+
+def test_cadence_fits_rate_budget(monkeypatch):
+    monkeypatch.setattr(gecko.upstream.limiter, "max_rate", 10)
+    coins = [f"coin{i}" for i in range(30)]
+    poller = PricePoller(coins, ["usd"], interval=1, batch_size=1, name="t_cadence")
+    # 30 calls per poll at half of 10 requests/second
+    assert poller.cadence() == 6
+    poller.batch_size = 100
+    assert poller.cadence() == 1
+
+    monkeypatch.setattr(gecko.upstream.limiter, "max_rate", 0)
+    poller.batch_size = 1
+    assert poller.cadence() == 1
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_poller_runs_in_background(no_persist, monkeypatch, stub_transport):
+    monkeypatch.setattr(gecko.upstream.limiter, "max_rate", 0)
+    calls = []
+    poller = PricePoller(["bitcoin"], ["usd"], interval=0.05, name="t_background")
+    await gecko.start_client(transport=stub_transport(calls))
+    try:
+        poller.start()
+        assert poller.running
+        await asyncio.sleep(0.12)
+        await poller.stop()
+    finally:
+        await gecko.close_client()
+
+    assert not poller.running
+    assert 2 <= len(calls) <= 4
+
+    idle = PricePoller([], ["usd"], name="t_idle")
+    idle.start()
+    assert not idle.running
@@ -0,0 +1,88 @@
+# test_pool.py
+import pytest
+from sqlalchemy import create_engine, exc, text
+import app.services.metrics as metrics
+from app.databases.db import DATABASE_URL, engine
+from app.databases.pool import InstrumentedQueuePool, instrument_pool
+
+
+def make_engine(name, pre_ping="never", ping_idle=30, **options):
+    test_engine = create_engine(
+        DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=options.pop("pool_size", 1),
+        max_overflow=options.pop("max_overflow", 0),
+        pool_timeout=options.pop("pool_timeout", 0.1),
+        **options,
+    )
+    instrument_pool(test_engine, name, pre_ping, ping_idle)
+    return test_engine
+
+
+def test_pool_gauges_and_checkout_wait():
+    test_engine = make_engine("t_gauges", pool_size=1, max_overflow=1)
+    try:
+        first = test_engine.connect()
+        second = test_engine.connect()
+        stats = metrics.snapshot()
+        assert stats["db_pool_t_gauges_size"] == 1
+        assert stats["db_pool_t_gauges_in_use"] == 2
+        assert stats["db_pool_t_gauges_overflow"] == 1
+        assert stats["db_pool_t_gauges_checkouts_total"] == 2
+        assert stats["db_pool_t_gauges_checkout_wait_seconds"]["count"] == 2
+
+        second.close()
+        first.close()
+        stats = metrics.snapshot()
+        assert stats["db_pool_t_gauges_in_use"] == 0
+        assert stats["db_pool_t_gauges_idle"] == 1
+    finally:
+        test_engine.dispose()
+
+
+def test_pool_timeout_counted():
+    test_engine = make_engine("t_timeout", pool_size=1, max_overflow=0)
+    try:
+        with test_engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                test_engine.connect()
+        assert metrics.snapshot()["db_pool_t_timeout_checkout_timeouts_total"] == 1
+    finally:
+        test_engine.dispose()
+
+
+def test_idle_pre_ping_replaces_dead_connection():
+    test_engine = make_engine("t_ping", pre_ping="idle", ping_idle=0)
+    try:
+        with test_engine.connect() as conn:
+            pid = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+
+        # Kill the pooled connection behind the pool's back
+        with engine.connect() as admin:
+            admin.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+
+        with test_engine.connect() as conn:
+            new_pid = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+
+        stats = metrics.snapshot()
+        assert new_pid != pid
+        assert stats["db_pool_t_ping_pings_total"] >= 1
+        assert stats["db_pool_t_ping_connects_total"] == 2
+    finally:
+        test_engine.dispose()
+
+
+def test_idle_pre_ping_skips_recent_connections():
+    test_engine = make_engine("t_noping", pre_ping="idle", ping_idle=60)
+    try:
+        for _ in range(3):
+            with test_engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        assert metrics.snapshot()["db_pool_t_noping_pings_total"] == 0
+    finally:
+        test_engine.dispose()
+
+
+def test_unknown_pre_ping_strategy():
+    with pytest.raises(ValueError):
+        make_engine("t_bad", pre_ping="sometimes")
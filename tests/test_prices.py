@@ -0,0 +1,218 @@
+import asyncio
+import pytest
+import httpx
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+import app.services.prices as prices
+from app.services.price_cache import FRESH, STALE, PriceCache
+
+
+def test_split_csv():
+    assert prices.split_csv(" bitcoin, ethereum,,bitcoin ") == ["bitcoin", "ethereum"]
+    assert prices.split_csv("") == []
+
+
+def test_cache_fresh_stale_and_expired(clock):
+    cache = PriceCache(ttl=10, stale_ttl=20, max_entries=10, clock=clock, name="t1")
+    cache.set(("bitcoin", "usd"), 50000.0)
+
+    entry, state = cache.get(("bitcoin", "usd"))
+    assert state == FRESH
+    assert entry.price == 50000.0
+
+    clock.now += 15
+    entry, state = cache.get(("bitcoin", "usd"))
+    assert state == STALE
+    assert cache.age(entry) == 15
+
+    clock.now += 20
+    assert cache.get(("bitcoin", "usd")) == (None, None)
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction(clock):
+    cache = PriceCache(ttl=10, stale_ttl=0, max_entries=2, clock=clock, name="t2")
+    cache.set(("bitcoin", "usd"), 1.0)
+    cache.set(("ethereum", "usd"), 2.0)
+    cache.get(("bitcoin", "usd"))  # bitcoin becomes most recently used
+    cache.set(("solana", "usd"), 3.0)
+
+    assert cache.get(("ethereum", "usd")) == (None, None)
+    assert cache.get(("bitcoin", "usd"))[1] == FRESH
+    assert cache.get(("solana", "usd"))[1] == FRESH
+
+    assert cache.evictions.value == 1
+
+
+def test_cache_counters(clock):
+    cache = PriceCache(ttl=10, stale_ttl=10, clock=clock, name="t3")
+    cache.get(("bitcoin", "usd"))
+    cache.set(("bitcoin", "usd"), 1.0)
+    cache.get(("bitcoin", "usd"))
+    cache.clock.now += 15
+    cache.get(("bitcoin", "usd"))
+
+    stats = metrics.snapshot()
+    assert stats["t3_misses_total"] == 1
+    assert stats["t3_hits_total"] == 1
+    assert stats["t3_stale_total"] == 1
+    assert stats["t3_entries"] == 1
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_crypto_endpoint_served_from_cache(monkeypatch, get, stub_transport):
+    persisted = []
+    monkeypatch.setattr(
+        crud, "create_transactions", lambda db, rows: persisted.extend(rows)
+    )
+    calls = []
+    await gecko.start_client(transport=stub_transport(calls))
+    try:
+        first = await get("/crypto/bitcoin")
+        second = await get("/crypto/bitcoin")
+    finally:
+        await gecko.close_client()
+
+    assert len(calls) == 1
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == {
+        "crypto_name": "bitcoin",
+        "price_usd": 100.0,
+        "source": "cached",
+    }
+    assert first.headers["X-Price-Source"] == "live"
+    assert "max-age=" in second.headers["Cache-Control"]
+    assert second.headers["Age"] == "0"
+    # Only the upstream observation is persisted
+    assert persisted == [{"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 100.0}]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_stale_entry_served_and_revalidated(monkeypatch, clock, stub_transport):
+    monkeypatch.setattr(prices.price_cache, "clock", clock)
+    prices.price_cache.set(("bitcoin", "usd"), 1.0)
+    clock.now += prices.price_cache.ttl + 1
+
+    calls = []
+    await gecko.start_client(transport=stub_transport(calls, price=2.0))
+    try:
+        result = await prices.get_price("bitcoin", "usd")
+        assert result.cache_status == STALE
+        assert result.price == 1.0
+        assert int(result.age) == int(prices.price_cache.ttl + 1)
+
+        # A second stale read does not schedule another refresh
+        await prices.get_price("bitcoin", "usd")
+        await asyncio.gather(*prices._tasks)
+    finally:
+        await gecko.close_client()
+
+    assert len(calls) == 1
+    refreshed = await prices.get_price("bitcoin", "usd")
+    assert refreshed.cache_status == prices.HIT
+    assert refreshed.price == 2.0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_failed_revalidation_keeps_stale_entry(monkeypatch, clock):
+    monkeypatch.setattr(prices.price_cache, "clock", clock)
+    prices.price_cache.set(("bitcoin", "usd"), 1.0)
+    clock.now += prices.price_cache.ttl + 1
+
+    def handler(request: httpx.Request):
+        return httpx.Response(503)
+
+    await gecko.start_client(transport=httpx.MockTransport(handler))
+    try:
+        await prices.get_price("bitcoin", "usd")
+        await asyncio.gather(*prices._tasks)
+        result = await prices.get_price("bitcoin", "usd")
+    finally:
+        await prices.shutdown()
+        await gecko.close_client()
+
+    assert result.cache_status == STALE
+    assert result.price == 1.0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_stats_endpoint_exposes_cache_counters(get):
+    response = await get("/stats")
+    assert response.status_code == 200
+    body = response.json()
+    for name in (
+        "price_cache_hits_total",
+        "price_cache_misses_total",
+        "price_cache_stale_total",
+        "price_cache_entries",
+    ):
+        assert name in body
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bulk_endpoint_one_upstream_call(monkeypatch, get):
+    persisted = []
+    monkeypatch.setattr(
+        crud, "create_transactions", lambda db, rows: persisted.append(rows)
+    )
+    requested = []
+
+    def handler(request: httpx.Request):
+        ids = request.url.params["ids"].split(",")
+        currencies = request.url.params["vs_currencies"].split(",")
+        requested.append((ids, currencies))
+        return httpx.Response(
+            200,
+            json={
+                coin: {vs: float(len(coin + vs)) for vs in currencies} for coin in ids
+            },
+        )
+
+    # ethereum/usd is already cached and must not be requested again
+    prices.price_cache.set(("ethereum", "usd"), 3000.0)
+    await gecko.start_client(transport=httpx.MockTransport(handler))
+    try:
+        response = await get("/crypto?ids=bitcoin,ethereum,bitcoin&vs=usd,eur")
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "prices": {
+            "bitcoin": {"usd": 10.0, "eur": 10.0},
+            "ethereum": {"usd": 3000.0, "eur": 11.0},
+        },
+        "sources": {
+            "bitcoin": {"usd": "live", "eur": "live"},
+            "ethereum": {"usd": "cached", "eur": "live"},
+        },
+    }
+    assert len(requested) == 1
+    assert sorted(requested[0][0]) == ["bitcoin", "ethereum"]
+    assert requested[0][1] == ["eur", "usd"]
+    # One insert for the freshly observed USD prices only
+    assert persisted == [[{"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 10.0}]]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bulk_endpoint_served_from_cache(monkeypatch, get):
+    monkeypatch.setattr(crud, "create_transactions", lambda db, rows: None)
+    prices.price_cache.set(("bitcoin", "usd"), 1.0)
+    prices.price_cache.set(("ethereum", "usd"), 2.0)
+
+    response = await get("/crypto?ids=bitcoin,ethereum")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "prices": {"bitcoin": {"usd": 1.0}, "ethereum": {"usd": 2.0}},
+        "sources": {"bitcoin": {"usd": "cached"}, "ethereum": {"usd": "cached"}},
+    }
+    assert response.headers["X-Cache"] == "HIT"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bulk_endpoint_rejects_empty_ids(get):
+    response = await get("/crypto?ids=,&vs=usd")
+    assert response.status_code == 400
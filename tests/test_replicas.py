@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+import pytest
+import httpx
+from httpx import ASGITransport
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+import app.crud as crud
+import app.main as main
+import app.services.metrics as metrics
+from app.databases.db import Base, SessionLocal, engine
+from app.databases.pool import InstrumentedQueuePool, instrument_pool
+from app.databases.replicas import (
+    LEAST_CONNECTIONS,
+    PRIMARY,
+    ROUND_ROBIN,
+    ReadRouter,
+    Target,
+)
+from app.main import app
+from app.models.model import Transaction
+from app.services.consistency import (
+    LAST_WRITE_COOKIE,
+    ReadYourWritesMiddleware,
+    recent_write,
+)
+
+
+# SQLite files stand in for replicas; replication would have created the table
+def sqlite_target(tmp_path, name):
+    replica_engine = create_engine(
+        f"sqlite:///{tmp_path / name}.db", poolclass=InstrumentedQueuePool
+    )
+    instrument_pool(replica_engine, f"t_{name}")
+    with replica_engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE transactions (id INTEGER, crypto_name VARCHAR, "
+                "amount FLOAT, price_usd FLOAT, timestamp DATETIME, "
+                "updated_at DATETIME, PRIMARY KEY (id, timestamp))"
+            )
+        )
+    return Target(name, replica_engine, sessionmaker(bind=replica_engine))
+
+
+def test_round_robin_and_primary_reads(tmp_path):
+    replicas = [sqlite_target(tmp_path, "rr1"), sqlite_target(tmp_path, "rr2")]
+    router = ReadRouter(
+        Target(PRIMARY, engine, SessionLocal), replicas, ROUND_ROBIN, "t_rr"
+    )
+    try:
+        assert [router.choose().name for _ in range(4)] == ["rr1", "rr2", "rr1", "rr2"]
+        for primary in (False, True, False):
+            router.session(primary=primary).close()
+        reads = metrics.snapshot()["db_read_sessions_total"]
+        assert reads["t_rr rr1"] == 1
+        assert reads["t_rr rr2"] == 1
+        assert reads["t_rr primary"] == 1
+    finally:
+        for replica in replicas:
+            replica.engine.dispose()
+
+
+def test_least_connections(tmp_path):
+    replicas = [sqlite_target(tmp_path, "lc1"), sqlite_target(tmp_path, "lc2")]
+    router = ReadRouter(
+        Target(PRIMARY, engine, SessionLocal), replicas, LEAST_CONNECTIONS
+    )
+    try:
+        # Ties rotate
+        assert {router.choose().name for _ in range(2)} == {"lc1", "lc2"}
+        with replicas[0].engine.connect():
+            assert [router.choose().name for _ in range(3)] == ["lc2"] * 3
+            assert metrics.snapshot()["db_pool_t_lc1_in_use"] == 1
+    finally:
+        for replica in replicas:
+            replica.engine.dispose()
+
+    with pytest.raises(ValueError):
+        ReadRouter(Target(PRIMARY, engine, SessionLocal), replicas, "random")
+
+
+def test_recent_write():
+    now = 1000.0
+    assert recent_write({LAST_WRITE_COOKIE: "998.5"}, 5, lambda: now)
+    assert not recent_write({LAST_WRITE_COOKIE: "990"}, 5, lambda: now)
+    assert not recent_write({LAST_WRITE_COOKIE: "soon"}, 5, lambda: now)
+    assert not recent_write({}, 5, lambda: now)
+
+
+@pytest.fixture
+def primary_schema():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_reads_use_replica_until_client_writes(
+    tmp_path, primary_schema, monkeypatch
+):
+    replica = sqlite_target(tmp_path, "app_replica")
+    with replica.engine.begin() as connection:
+        connection.execute(
+            insert(Transaction).values(
+                id=1000,
+                crypto_name="from-replica",
+                amount=1.0,
+                price_usd=1.0,
+                timestamp=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            )
+        )
+    monkeypatch.setattr(
+        main,
+        "read_router",
+        ReadRouter(Target(PRIMARY, engine, SessionLocal), [replica]),
+    )
+    monkeypatch.setattr(main, "store", main.ThreadedCrud(crud))
+    app.dependency_overrides[main.get_session] = main.get_db
+    app.dependency_overrides[main.get_read_session] = main.get_read_db
+    transport = ASGITransport(app=ReadYourWritesMiddleware(app, window=60))
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            listed = await client.get("/transactions/")
+            assert [t["crypto_name"] for t in listed.json()] == ["from-replica"]
+
+            created = await client.post(
+                "/transactions/",
+                json={"crypto_name": "bitcoin", "amount": 1.0, "price_usd": 2.0},
+            )
+            assert LAST_WRITE_COOKIE in created.cookies
+            transaction_id = created.json()["id"]
+
+            # The writer reads its own write from the primary
+            listed = await client.get("/transactions/")
+            assert [t["crypto_name"] for t in listed.json()] == ["bitcoin"]
+            fetched = await client.get(f"/transactions/{transaction_id}")
+            assert fetched.status_code == 200
+
+        # Other clients keep reading the (lagging) replica
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as other:
+            assert (await other.get("/transactions/1000")).status_code == 200
+            listed = await other.get("/transactions/")
+            assert [t["crypto_name"] for t in listed.json()] == ["from-replica"]
+            failed = await other.put(
+                f"/transactions/{transaction_id + 1}",
+                json={"crypto_name": "x", "amount": 1.0, "price_usd": 1.0},
+            )
+            assert failed.status_code == 404
+            assert LAST_WRITE_COOKIE not in failed.cookies
+    finally:
+        app.dependency_overrides.clear()
+        replica.engine.dispose()
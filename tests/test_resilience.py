@@ -0,0 +1,284 @@
+import asyncio
+from email.utils import formatdate
+import pytest
+import httpx
+from httpx import ASGITransport
+import app.services.gecko as gecko
+from app.services.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimited,
+    ResilientCaller,
+    parse_retry_after,
+)
+from benchmarks.stub_gecko import HANG, StubServer, create_stub_app
+
+
+def status_error(status_code, headers=None):
+    request = httpx.Request("GET", "http://upstream/simple/price")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError("stub", request=request, response=response)
+
+
+def caller(name, clock, sleeps, **kwargs):
+    async def sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    options = dict(
+        rate=0,
+        burst=1,
+        max_attempts=3,
+        backoff_base=0.1,
+        backoff_max=5,
+        failure_threshold=3,
+        reset_timeout=30,
+    )
+    options.update(kwargs)
+    return ResilientCaller(name, clock=clock, sleep=sleep, **options)
+
+
+# Upstream stub that fails the given attempts, then answers
+def flaky(errors):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return fn, calls
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(formatdate(1010, usegmt=True), now=1000) == 10.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_rate_limiter_adapts_to_throttling(clock):
+    limiter = AdaptiveRateLimiter(rate=2, burst=2, recovery=0.25, clock=clock)
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0.5]
+
+    limiter.throttled(retry_after=5)
+    assert limiter.rate == 1
+    assert limiter.blocked_for() == 5
+    clock.now += 5
+    assert limiter.blocked_for() == 0
+
+    limiter.succeeded()
+    assert limiter.rate == 1.5
+    limiter.succeeded()
+    limiter.succeeded()
+    assert limiter.rate == 2
+
+
+def test_circuit_breaker_transitions(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    assert not breaker.failed()
+    assert breaker.failed()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 10
+
+    # One probe after the timeout; a failed probe reopens the circuit
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.failed()
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.succeeded()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_retries_transient_errors_with_backoff(clock):
+    sleeps = []
+    upstream = caller("t_retry", clock, sleeps)
+    fn, calls = flaky([status_error(503), httpx.ConnectError("refused")])
+
+    assert await upstream.call(fn) == "ok"
+    assert len(calls) == 3
+    # Full jitter: each delay is drawn from [0, base * 2^n]
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.1 and 0 <= sleeps[1] <= 0.2
+    assert upstream.breaker.state == CLOSED
+    assert upstream.breaker.failures == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_client_errors_and_exhausted_retries_are_raised(clock):
+    sleeps = []
+    upstream = caller("t_raise", clock, sleeps)
+
+    fn, calls = flaky([status_error(404)])
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(fn)
+    assert len(calls) == 1
+
+    fn, calls = flaky([httpx.ReadTimeout("slow")] * 3)
+    with pytest.raises(httpx.ReadTimeout):
+        await upstream.call(fn)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_breaker_fails_fast_then_probes(clock):
+    sleeps = []
+    upstream = caller("t_breaker", clock, sleeps, failure_threshold=2)
+    fn, calls = flaky([status_error(502)] * 3)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(fn)
+    # Opened on the second failure: no third attempt
+    assert len(calls) == 2
+    assert upstream.describe()["state"] == OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        await upstream.call(fn)
+    assert len(calls) == 2
+    assert error.value.retry_after == pytest.approx(30)
+
+    clock.now += 30
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(fn)
+    assert len(calls) == 3
+    assert upstream.breaker.state == OPEN
+
+    clock.now += 30
+    assert await upstream.call(fn) == "ok"
+    assert upstream.breaker.state == CLOSED
+    assert upstream.opened.value == 2
+    assert upstream.short_circuited.value == 1
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_cancelled_probe_releases_the_breaker(clock):
+    never = asyncio.Event()
+
+    # Waits for a token until cancelled
+    async def sleep(delay):
+        await never.wait()
+
+    upstream = ResilientCaller(
+        "t_cancel_probe",
+        rate=1,
+        burst=1,
+        max_attempts=1,
+        backoff_base=0.1,
+        backoff_max=5,
+        failure_threshold=1,
+        reset_timeout=30,
+        clock=clock,
+        sleep=sleep,
+    )
+    fn, calls = flaky([status_error(503)])
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(fn)
+    assert upstream.breaker.state == OPEN
+
+    clock.now += 30
+    # Leaves the probe waiting for a token
+    upstream.limiter.reserve()
+    probe = asyncio.create_task(upstream.call(fn))
+    await asyncio.sleep(0)
+    assert upstream.breaker.state == HALF_OPEN
+    # e.g. SingleFlight cancelling after its last waiter left
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert len(calls) == 1
+
+    # The next call gets to probe and closes the circuit
+    clock.now += 2
+    assert await upstream.call(fn) == "ok"
+    assert upstream.breaker.state == CLOSED
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_throttling_slows_down_without_opening_the_breaker(clock):
+    sleeps = []
+    upstream = caller("t_429", clock, sleeps, rate=10, burst=10, failure_threshold=1)
+    fn, calls = flaky([status_error(429, {"Retry-After": "2"})])
+
+    assert await upstream.call(fn) == "ok"
+    assert len(calls) == 2
+    assert upstream.breaker.state == CLOSED
+    assert upstream.throttled.value == 1
+    # Halved on the 429, then one recovery step on success
+    assert upstream.limiter.rate == 6
+
+    # A Retry-After beyond the backoff budget is not waited out
+    fn, calls = flaky([status_error(429, {"Retry-After": "60"})])
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(fn)
+    with pytest.raises(RateLimited) as error:
+        await upstream.call(fn)
+    assert len(calls) == 1
+    assert error.value.retry_after == 60
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_endpoint_retries_through_stub_faults(no_persist, get):
+    stub = create_stub_app()
+    stub.state.faults.extend([503, (429, 0)])
+    await gecko.start_client(transport=ASGITransport(app=stub))
+    try:
+        response = await get("/crypto/bitcoin")
+        upstream = (await get("/upstream")).json()["gecko"]
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 200
+    assert response.json()["source"] == "live"
+    assert stub.state.requests == 3
+    assert upstream["state"] == CLOSED
+    assert upstream["rate_limit"] < upstream["max_rate_limit"]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_open_circuit_returns_503(no_persist, monkeypatch, get):
+    monkeypatch.setattr(gecko.upstream, "max_attempts", 1)
+    stub = create_stub_app(error_rate=1.0)
+    await gecko.start_client(transport=ASGITransport(app=stub))
+    try:
+        for coin in ("a", "b", "c", "d", "e"):
+            assert (await get(f"/crypto/{coin}")).status_code == 503
+        response = await get("/crypto/bitcoin")
+        upstream = (await get("/upstream")).json()["gecko"]
+    finally:
+        await gecko.close_client()
+
+    assert response.status_code == 503
+    assert "circuit open" in response.json()["detail"]
+    assert int(response.headers["Retry-After"]) > 0
+    assert stub.state.requests == gecko.GECKO_BREAKER_THRESHOLD
+    assert upstream["state"] == OPEN
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_retries_read_timeout_against_live_stub(no_persist, monkeypatch, get):
+    monkeypatch.setattr(gecko, "GECKO_READ_TIMEOUT", 0.2)
+    with StubServer() as stub:
+        stub.app.state.faults.append(HANG)
+        stub.app.state.hang = 1.0
+        monkeypatch.setattr(gecko, "GECKO_BASE_URL", stub.base_url)
+        await gecko.start_client()
+        try:
+            response = await get("/crypto/bitcoin")
+        finally:
+            await gecko.close_client()
+
+    assert response.status_code == 200
+    assert stub.requests == 2
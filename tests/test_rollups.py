@@ -0,0 +1,228 @@
+# test_rollups.py
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import Session
+import app.crud as crud
+import app.services.rollups as rollups
+from app.databases.db import SessionLocal
+from app.models.model import PriceRollup
+
+T0 = datetime(2026, 1, 5, 12, 0, 10, tzinfo=timezone.utc)
+
+
+def row(seconds, price, amount=1.0, crypto_name="bitcoin"):
+    return {
+        "crypto_name": crypto_name,
+        "amount": amount,
+        "price_usd": price,
+        "timestamp": T0 + timedelta(seconds=seconds),
+    }
+
+
+def stored(db: Session):
+    return {
+        (r.crypto_name, r.resolution, r.bucket): (
+            r.open,
+            r.high,
+            r.low,
+            r.close,
+            r.volume,
+            r.count,
+        )
+        for r in db.scalars(select(PriceRollup))
+    }
+
+
+# Candles recomputed from scratch, to compare the incremental ones against
+def recomputed(db: Session):
+    query = rollups.candles_query(
+        ["bitcoin", "ethereum"],
+        T0 - timedelta(days=1),
+        datetime.now(timezone.utc) + timedelta(days=1),
+    )
+    return {(r[0], r[1], r[2]): tuple(r[3:9]) for r in db.execute(query)}
+
+
+def test_bucket_start():
+    ts = datetime(2026, 1, 5, 14, 30, 45, 123, tzinfo=timezone(timedelta(hours=2)))
+    assert rollups.bucket_start(ts, "minute") == datetime(
+        2026, 1, 5, 12, 30, tzinfo=timezone.utc
+    )
+    assert rollups.bucket_start(ts, "hour") == datetime(
+        2026, 1, 5, 12, tzinfo=timezone.utc
+    )
+    assert rollups.bucket_start(ts, "day") == datetime(2026, 1, 5, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        rollups.bucket_start(ts, "week")
+
+
+def test_aggregate_orders_by_timestamp_then_id():
+    rows = [
+        SimpleNamespace(
+            id=2, crypto_name="bitcoin", amount=1.0, price_usd=12.0, timestamp=T0
+        ),
+        SimpleNamespace(
+            id=1, crypto_name="bitcoin", amount=2.0, price_usd=10.0, timestamp=T0
+        ),
+        SimpleNamespace(
+            id=3,
+            crypto_name="bitcoin",
+            amount=3.0,
+            price_usd=9.0,
+            timestamp=T0 + timedelta(seconds=5),
+        ),
+    ]
+    candles = {c["resolution"]: c for c in rollups.aggregate(rows)}
+    assert set(candles) == {"minute", "hour", "day"}
+    minute = candles["minute"]
+    ohlc = [minute[field] for field in ("open", "high", "low", "close")]
+    assert ohlc == [10.0, 12.0, 9.0, 9.0]
+    assert (minute["volume"], minute["count"]) == (6.0, 3)
+
+
+def test_rollups_follow_inserts(db_session: Session):
+    crud.create_transactions(
+        db_session, [row(0, 100.0), row(20, 110.0, 2.0), row(70, 90.0)]
+    )
+    crud.create_transactions_returning(
+        db_session, [row(-5, 95.0), row(30, 120.0, crypto_name="ethereum")]
+    )
+    crud.create_transaction(db_session, "bitcoin", 1.0, 105.0)
+
+    candles = stored(db_session)
+    minute = candles[("bitcoin", "minute", T0.replace(second=0))]
+    # The late row at -5s became the open; 70s landed in the next minute
+    assert minute == (95.0, 110.0, 95.0, 110.0, 4.0, 3)
+    hour = candles[("bitcoin", "hour", T0.replace(minute=0, second=0))]
+    assert hour == (95.0, 110.0, 90.0, 90.0, 5.0, 4)
+    assert ("ethereum", "day", T0.replace(hour=0, minute=0, second=0)) in candles
+    assert candles == recomputed(db_session)
+
+
+def test_rollups_rebuilt_after_update_and_delete(db_session: Session):
+    crud.create_transactions(db_session, [row(0, 100.0), row(20, 110.0), row(40, 90.0)])
+    first, second, third = crud.get_transactions(db_session)
+
+    crud.update_transaction(db_session, second.id, price_usd=130.0)
+    crud.update_transaction(db_session, first.id, crypto_name="ethereum")
+    crud.delete_transaction(db_session, third.id)
+
+    candles = stored(db_session)
+    minute = T0.replace(second=0)
+    assert candles[("bitcoin", "minute", minute)] == (130.0,) * 4 + (1.0, 1)
+    assert candles[("ethereum", "minute", minute)] == (100.0,) * 4 + (1.0, 1)
+    assert candles == recomputed(db_session)
+
+    crud.delete_transaction(db_session, second.id)
+    assert ("bitcoin", "minute", minute) not in stored(db_session)
+
+
+def test_concurrent_rebuilds_are_serialised(db_session: Session):
+    crud.create_transactions(db_session, [row(0, 100.0), row(20, 110.0)])
+    db_session.commit()
+    errors = []
+
+    def rebuild():
+        db = SessionLocal()
+        try:
+            crud.rebuild_rollups(db, ["bitcoin"], [T0])
+            db.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    first = SessionLocal()
+    try:
+        crud.rebuild_rollups(first, ["bitcoin"], [T0])
+        other = threading.Thread(target=rebuild)
+        other.start()
+        # Waits for the first rebuild instead of colliding with its candles
+        other.join(timeout=0.5)
+        assert other.is_alive()
+        first.commit()
+    finally:
+        first.close()
+    other.join(timeout=10)
+    assert errors == []
+    assert stored(db_session) == recomputed(db_session)
+
+
+def test_rebuild_touches_only_affected_buckets(db_session: Session):
+    crud.create_transactions(db_session, [row(0, 100.0), row(3600, 110.0)])
+    later_hour = (
+        "bitcoin",
+        "hour",
+        (T0 + timedelta(seconds=3600)).replace(minute=0, second=0),
+    )
+    # Out of line on purpose: a rebuild of the first hour must not read it
+    db_session.execute(
+        update(PriceRollup)
+        .where(
+            tuple_(PriceRollup.crypto_name, PriceRollup.resolution, PriceRollup.bucket)
+            == later_hour
+        )
+        .values(high=999.0)
+    )
+    db_session.commit()
+
+    first, _ = crud.get_transactions(db_session)
+    crud.update_transaction(db_session, first.id, price_usd=105.0)
+
+    candles = stored(db_session)
+    assert candles[later_hour][1] == 999.0
+    minute = ("bitcoin", "minute", T0.replace(second=0))
+    assert candles[minute][:4] == (105.0,) * 4
+    # The day is merged from the stored hours, including the altered one
+    day = candles[("bitcoin", "day", T0.replace(hour=0, minute=0, second=0))]
+    assert day[:4] == (105.0, 999.0, 105.0, 110.0)
+
+
+def test_concurrent_writers_keep_rollups_consistent(db_session: Session):
+    crud.create_transactions(
+        db_session, [row(i * 7, 100.0 + i, float(i % 3 + 1)) for i in range(40)]
+    )
+    ids = [t.id for t in crud.get_transactions(db_session, limit=40)]
+    errors = []
+
+    def writer(worker):
+        db = SessionLocal()
+        try:
+            for i in range(10):
+                transaction_id = ids[(worker * 10 + i) % len(ids)]
+                if worker == 0:
+                    crud.create_transactions(db, [row(i * 11, 90.0 + i, 2.0)])
+                elif worker == 1:
+                    crud.update_transaction(db, transaction_id, price_usd=200.0 + i)
+                elif worker == 2:
+                    crud.update_transaction(db, transaction_id, amount=float(i + 1))
+                else:
+                    crud.delete_transaction(db, transaction_id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    assert errors == []
+    assert stored(db_session) == recomputed(db_session)
+
+
+def test_get_rollups(db_session: Session):
+    crud.create_transactions(
+        db_session, [row(0, 100.0), row(3600, 110.0), row(7200, 120.0)]
+    )
+    hours = crud.get_rollups(db_session, "bitcoin", "hour", start=T0)
+    assert [r.open for r in hours] == [110.0, 120.0]
+    assert [
+        r.close for r in crud.get_rollups(db_session, "bitcoin", "hour", limit=1)
+    ] == [100.0]
+    assert crud.get_rollups(db_session, "dogecoin", "day") == []
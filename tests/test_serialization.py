@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+import pytest
+import httpx
+from fastapi import FastAPI
+from httpx import ASGITransport
+from app.schemas.schemas import TransactionResponse
+from app.services.serialization import TransactionJSONResponse, encode_transactions
+
+UTC = timezone.utc
+
+# Values around every formatting edge: exponent thresholds, whole floats,
+# microsecond-free timestamps, non-UTC offsets and non-ASCII names
+ROWS = [
+    (1, "bitcoin", 1.0, 50000.0, datetime(2024, 1, 1, 12, 0, tzinfo=UTC)),
+    (2, "ethereum", 0.25, 3000.123456789, datetime(2024, 1, 1, 12, 0, 0, 1230, UTC)),
+    (3, "shiba-inu", 1500000.0, 0.0001, datetime(2024, 2, 29, tzinfo=UTC)),
+    (4, "pepe", 2.5e9, 1.234e-05, datetime(2024, 3, 1, tzinfo=UTC)),
+    (5, "big", 1e16, 9999999999999998.0, datetime(2024, 3, 1, tzinfo=UTC)),
+    (
+        6,
+        'ünïcödé "quoted"  ',
+        0.0,
+        -12.5,
+        datetime(2024, 3, 1, 5, 30, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    ),
+    (7, "whole", 3, 100, datetime(2024, 3, 1, tzinfo=UTC)),
+]
+
+
+# Bodies as response_model serialised them before the fast path
+async def reference_bodies(rows):
+    reference = FastAPI()
+
+    @reference.get("/list", response_model=List[TransactionResponse])
+    async def listed():
+        return [dict(zip(TransactionResponse.model_fields, row)) for row in rows]
+
+    @reference.get("/one/{index}", response_model=TransactionResponse)
+    async def one(index: int):
+        return dict(zip(TransactionResponse.model_fields, rows[index]))
+
+    async with httpx.AsyncClient(
+        transport=ASGITransport(app=reference), base_url="http://test"
+    ) as client:
+        listed_body = (await client.get("/list")).content
+        one_bodies = [
+            (await client.get(f"/one/{index}")).content for index in range(len(rows))
+        ]
+    return listed_body, one_bodies
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_byte_compatible_with_response_model():
+    listed_body, one_bodies = await reference_bodies(ROWS)
+
+    assert encode_transactions(ROWS) == listed_body
+    for row, body in zip(ROWS, one_bodies):
+        assert TransactionJSONResponse(row).body == body
+    # Pages without exponent-notation floats stay on orjson, with the same bytes
+    assert encode_transactions(ROWS[:3]) == (await reference_bodies(ROWS[:3]))[0]
+    assert encode_transactions([]) == b"[]"
+
+
+def test_extra_columns_are_ignored():
+    row = ROWS[0] + ("previous-name",)
+    assert TransactionJSONResponse(row).body == TransactionJSONResponse(ROWS[0]).body
@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+import httpx
+from httpx import ASGITransport
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.prices as prices
+from app.services.singleflight import SingleFlight
+from app.main import app
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("sf_share")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return 42
+
+    results = await asyncio.gather(*(flights.do("bitcoin", fetch) for _ in range(50)))
+
+    assert calls == 1
+    assert [value for value, _ in results] == [42] * 50
+    assert sum(not shared for _, shared in results) == 1
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_failure_propagates_to_every_waiter():
+    flights = SingleFlight("sf_failure")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        *(flights.do("bitcoin", fetch) for _ in range(10)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_waiter_timeout_does_not_cancel_others():
+    flights = SingleFlight("sf_timeout")
+
+    async def fetch():
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    impatient = asyncio.wait_for(flights.do("bitcoin", fetch), timeout=0.01)
+    patient = flights.do("bitcoin", fetch)
+    results = await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert results[1][0] == "ok"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_last_waiter_cancelled_cancels_call():
+    flights = SingleFlight("sf_cancel")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flights.do("bitcoin", fetch))
+    await started.wait()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+    assert len(flights) == 0
+
+
+# Load test: N concurrent requests against a slow stub -> one upstream call
+@pytest.mark.asyncio(loop_scope="function")
+async def test_concurrent_requests_coalesce_upstream(monkeypatch):
+    persisted = []
+    monkeypatch.setattr(
+        crud, "create_transactions", lambda db, rows: persisted.extend(rows)
+    )
+    upstream_calls = 0
+
+    async def slow_stub(request: httpx.Request):
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"bitcoin": {"usd": 50000.0}})
+
+    await gecko.start_client(transport=httpx.MockTransport(slow_stub))
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as async_client:
+            responses = await asyncio.gather(
+                *(async_client.get("/crypto/bitcoin") for _ in range(200))
+            )
+    finally:
+        await gecko.close_client()
+
+    assert upstream_calls == 1
+    assert all(response.status_code == 200 for response in responses)
+    assert {response.json()["price_usd"] for response in responses} == {50000.0}
+    assert len(persisted) == 1
+    assert len(prices.price_flights) == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_concurrent_requests_share_upstream_error(monkeypatch):
+    # One attempt, so every caller shares exactly one upstream request
+    monkeypatch.setattr(gecko.upstream, "max_attempts", 1)
+    upstream_calls = 0
+
+    async def failing_stub(request: httpx.Request):
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(429)
+
+    await gecko.start_client(transport=httpx.MockTransport(failing_stub))
+    try:
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as async_client:
+            responses = await asyncio.gather(
+                *(async_client.get("/crypto/bitcoin") for _ in range(20))
+            )
+    finally:
+        await gecko.close_client()
+
+    assert upstream_calls == 1
+    assert {response.status_code for response in responses} == {429}
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import pytest
+from starlette.testclient import TestClient
+import app.main as main
+import app.services.gecko as gecko
+import app.services.prices as prices
+from app.main import app
+from app.services.stream import (
+    PriceBroadcaster,
+    Subscriber,
+    TooManySubscribers,
+    broadcaster,
+)
+
+
+@pytest.fixture
+def upstream(monkeypatch, no_persist, stub_transport):
+    monkeypatch.setattr(broadcaster, "interval", 0.05)
+    calls, quotes = [], {"bitcoin": 100.0, "ethereum": 10.0}
+    monkeypatch.setattr(
+        gecko, "_client", gecko.build_client(stub_transport(calls, quotes=quotes))
+    )
+    yield calls, quotes
+    assert len(broadcaster) == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_subscriber_buffer_is_bounded():
+    subscriber = Subscriber(set(), buffer_size=2)
+    assert [subscriber.push(m) for m in ("a", "b", "c")] == [False, False, True]
+    assert subscriber.dropped == 1
+    assert await subscriber.get() == "b"
+    assert await subscriber.get() == "c"
+    assert await subscriber.get(timeout=0.01) is None
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_updates_fan_out_only_on_change(upstream):
+    calls, quotes = upstream
+    stream = PriceBroadcaster(interval=60, buffer_size=3, name="t_stream")
+    first = stream.subscribe([("bitcoin", "usd")])
+    second = stream.subscribe([("bitcoin", "usd"), ("ethereum", "usd")])
+    try:
+        await stream.tick()
+        assert json.loads(await first.get())["price"] == 100.0
+        assert {json.loads(m)["crypto_name"] for m in second.buffer} == {
+            "bitcoin",
+            "ethereum",
+        }
+        second.buffer.clear()
+
+        # Unchanged prices are not re-sent
+        prices.price_cache.clear()
+        quotes["ethereum"] = 11.0
+        await stream.tick()
+        assert len(first.buffer) == 0
+        update = json.loads(await second.get())
+        assert (update["crypto_name"], update["price"]) == ("ethereum", 11.0)
+        assert update["source"] == "live"
+
+        # A late subscriber starts from the last known price
+        late = stream.subscribe([("ethereum", "usd")])
+        assert json.loads(await late.get())["price"] == 11.0
+
+        # A consumer that stops reading keeps only the newest updates
+        for price in range(10):
+            stream.publish(("bitcoin", "usd"), float(price), "live")
+        assert len(first.buffer) == 3
+        assert json.loads(first.buffer[-1])["price"] == 9.0
+        assert first.dropped == 7
+        assert stream.dropped.value == 14
+    finally:
+        for subscriber in list(stream.subscribers):
+            stream.unsubscribe(subscriber)
+    assert not stream.running
+    assert stream._by_key == {}
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_subscriber_limit():
+    stream = PriceBroadcaster(max_subscribers=1, name="t_stream_limit")
+    subscriber = stream.subscribe([])
+    with pytest.raises(TooManySubscribers):
+        stream.subscribe([])
+    stream.unsubscribe(subscriber)
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_sse_stream(upstream):
+    response = await main.stream_prices(ids="bitcoin,ethereum")
+    assert response.media_type == "text/event-stream"
+    events = response.body_iterator
+    try:
+        received = [await events.__anext__() for _ in range(2)]
+    finally:
+        await events.aclose()
+
+    assert all(event.startswith("event: price\ndata: ") for event in received)
+    payloads = [json.loads(event.split("data: ", 1)[1]) for event in received]
+    assert {p["crypto_name"]: p["price"] for p in payloads} == {
+        "bitcoin": 100.0,
+        "ethereum": 10.0,
+    }
+
+
+# The client is gone before the response starts, so the event generator never
+# runs; the subscription must still be released
+@pytest.mark.asyncio(loop_scope="function")
+async def test_sse_disconnect_before_first_event(upstream):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/stream/prices",
+        "raw_path": b"/stream/prices",
+        "root_path": "",
+        "query_string": b"ids=bitcoin",
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    # Yields like a server writing to its socket
+    async def send(message):
+        await asyncio.sleep(0)
+        sent.append(message)
+
+    try:
+        await app(scope, receive, send)
+        assert not any(m["type"] == "http.response.body" for m in sent)
+        assert len(broadcaster) == 0
+        assert not broadcaster.running
+    finally:
+        # The poll task may be stopped mid-tick; drop its queued lookup before
+        # this event loop closes
+        await prices.price_batcher.close()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_sse_rejects_bad_subscriptions(get):
+    response = await get("/stream/prices?ids=%20,%20")
+    assert response.status_code == 400
+
+
+def test_websocket_stream(upstream):
+    calls, quotes = upstream
+    client = TestClient(app)
+    with client.websocket_connect("/ws/prices?ids=bitcoin") as websocket:
+        update = websocket.receive_json()
+        assert (update["crypto_name"], update["price"]) == ("bitcoin", 100.0)
+
+        websocket.send_json({"action": "subscribe", "ids": "ethereum"})
+        update = websocket.receive_json()
+        assert (update["crypto_name"], update["price"]) == ("ethereum", 10.0)
+
+        websocket.send_json({"action": "resubscribe", "ids": "ethereum"})
+        assert "error" in websocket.receive_json()
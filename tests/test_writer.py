@@ -0,0 +1,152 @@
+import asyncio
+import pytest
+import httpx
+from httpx import ASGITransport
+import app.crud as crud
+import app.services.gecko as gecko
+import app.services.metrics as metrics
+import app.services.prices as prices
+from app.services.writer import WriteBehindQueue
+from app.main import app
+
+
+def row(i):
+    return {"crypto_name": f"coin{i}", "amount": 1.0, "price_usd": float(i)}
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, rows):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append(list(rows))
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_flushes_on_batch_size_and_drains_on_stop():
+    recorder = Recorder()
+    writer = WriteBehindQueue(
+        recorder, max_size=100, batch_size=10, flush_interval=10, name="w_size"
+    )
+    writer.start()
+    for i in range(25):
+        assert await writer.put(row(i))
+    await asyncio.sleep(0.05)
+    assert [len(batch) for batch in recorder.batches] == [10, 10]
+
+    await writer.stop()
+    assert [len(batch) for batch in recorder.batches] == [10, 10, 5]
+    assert sum(recorder.batches, []) == [row(i) for i in range(25)]
+    assert metrics.snapshot()["w_size_written_total"] == 25
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_flushes_on_interval():
+    recorder = Recorder()
+    writer = WriteBehindQueue(
+        recorder, batch_size=100, flush_interval=0.02, name="w_interval"
+    )
+    writer.start()
+    try:
+        for i in range(3):
+            await writer.put(row(i))
+        await asyncio.sleep(0.1)
+        assert recorder.batches == [[row(0), row(1), row(2)]]
+        assert metrics.snapshot()["w_interval_flush_seconds"]["count"] == 1
+    finally:
+        await writer.stop()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_drop_policy():
+    recorder = Recorder()
+    writer = WriteBehindQueue(recorder, max_size=5, policy="drop", name="w_drop")
+    writer.start()
+    # The worker has not run yet, so the queue fills up
+    accepted = [await writer.put(row(i)) for i in range(8)]
+    assert accepted == [True] * 5 + [False] * 3
+    assert writer.depth() == 5
+    await writer.stop()
+
+    assert len(sum(recorder.batches, [])) == 5
+    assert metrics.snapshot()["w_drop_dropped_total"] == 3
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_sample_policy():
+    writer = WriteBehindQueue(
+        Recorder(), max_size=10, policy="sample", sample_rate=0.0, name="w_sample"
+    )
+    writer.start()
+    accepted = [await writer.put(row(i)) for i in range(8)]
+    await writer.stop()
+
+    assert accepted == [True] * 5 + [False] * 3
+    assert metrics.snapshot()["w_sample_sampled_out_total"] == 3
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_block_policy():
+    recorder = Recorder()
+    writer = WriteBehindQueue(
+        recorder, max_size=2, batch_size=2, flush_interval=0.01, policy="block"
+    )
+    writer.start()
+    accepted = await asyncio.gather(*(writer.put(row(i)) for i in range(10)))
+    await writer.stop()
+
+    assert all(accepted)
+    assert len(sum(recorder.batches, [])) == 10
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_flush_errors_do_not_stop_worker():
+    recorder = Recorder(fail=True)
+    writer = WriteBehindQueue(
+        recorder, batch_size=1, flush_interval=0.01, name="w_errors"
+    )
+    writer.start()
+    await writer.put(row(0))
+    await asyncio.sleep(0.05)
+    recorder.fail = False
+    await writer.put(row(1))
+    await writer.stop()
+
+    assert recorder.batches == [[row(1)]]
+    assert metrics.snapshot()["w_errors_flush_errors_total"] == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        WriteBehindQueue(Recorder(), policy="retry")
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_crypto_endpoint_persists_in_background(monkeypatch):
+    persisted = []
+    monkeypatch.setattr(
+        crud, "create_transactions", lambda db, rows: persisted.append(rows)
+    )
+
+    def handler(request: httpx.Request):
+        ids = request.url.params["ids"].split(",")
+        return httpx.Response(200, json={coin: {"usd": 10.0} for coin in ids})
+
+    await gecko.start_client(transport=httpx.MockTransport(handler))
+    async with app.router.lifespan_context(app):
+        assert prices.price_writer.running
+        async with httpx.AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as async_client:
+            await asyncio.gather(
+                async_client.get("/crypto/bitcoin"),
+                async_client.get("/crypto?ids=ethereum,solana"),
+            )
+    # Shutdown flushed the queue in one batch
+    assert not prices.price_writer.running
+    assert [sorted(r["crypto_name"] for r in rows) for rows in persisted] == [
+        ["bitcoin", "ethereum", "solana"]
+    ]